@@ -39,8 +39,13 @@ import backend.app.entidades.producto  # noqa: F401
 import backend.app.entidades.proveedor  # noqa: F401
 import backend.app.entidades.stripe_checkout  # noqa: F401
 import backend.app.entidades.usuario  # noqa: F401
+import backend.app.entidades.venta_diaria  # noqa: F401
+import backend.app.entidades.rfm_cliente  # noqa: F401
+import backend.app.entidades.llm_cache  # noqa: F401
 import backend.app.entidades.configuracion  # noqa: F401
 import backend.app.entidades.incidencia  # noqa: F401
+import backend.app.entidades.job_lease  # noqa: F401
+import backend.app.entidades.email_outbox  # noqa: F401
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,44 @@
+"""email_outbox table (persistent outgoing email queue)
+Revision ID: 0utb0x3m41l
+Revises: j0bl34s3s01
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0utb0x3m41l"
+down_revision = "j0bl34s3s01"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("destinatario", sa.String(length=320), nullable=False),
+        sa.Column("asunto", sa.String(length=500), nullable=False),
+        sa.Column("cuerpo_html", sa.Text(), nullable=False),
+        sa.Column("adjunto", sa.LargeBinary(), nullable=True),
+        sa.Column("adjunto_nombre", sa.String(length=255), nullable=True),
+        sa.Column(
+            "estado", sa.String(length=20), nullable=False, server_default="PENDIENTE"
+        ),
+        sa.Column("intentos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("proximo_intento", sa.DateTime(), nullable=False),
+        sa.Column("bloqueado_por", sa.String(length=64), nullable=True),
+        sa.Column("bloqueado_hasta", sa.DateTime(), nullable=True),
+        sa.Column("ultimo_error", sa.Text(), nullable=True),
+        sa.Column("creado", sa.DateTime(), nullable=False),
+        sa.Column("enviado", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_email_outbox_id", "email_outbox", ["id"])
+    op.create_index(
+        "ix_email_outbox_estado_proximo", "email_outbox", ["estado", "proximo_intento"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_email_outbox_estado_proximo", table_name="email_outbox")
+    op.drop_index("ix_email_outbox_id", table_name="email_outbox")
+    op.drop_table("email_outbox")
@@ -0,0 +1,23 @@
+"""add actualizado to configuracion (config snapshot change detection)
+Revision ID: c0nf1gst4mp
+Revises: cl13nt3s5rch
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c0nf1gst4mp"
+down_revision = "cl13nt3s5rch"
+
+
+def upgrade() -> None:
+    op.add_column(
+        "configuracion",
+        sa.Column("actualizado", sa.DateTime(), nullable=True),
+    )
+    op.execute("UPDATE configuracion SET actualizado = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    op.drop_column("configuracion", "actualizado")
@@ -0,0 +1,74 @@
+"""clientes search index (pg_trgm GIN on PostgreSQL, FTS5 on SQLite)
+Revision ID: cl13nt3s5rch
+Revises: k3ys3tp4g1n4
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+revision = "cl13nt3s5rch"
+down_revision = "k3ys3tp4g1n4"
+
+# DDL frozen at this revision. The index expressions match the ones the
+# search query uses (entidades/cliente.py) so the planner can use them.
+_FOLD_FROM = "áàäâéèëêíìïîóòöôúùüûñç"
+_FOLD_TO = "aaaaeeeeiiiioooouuuunc"
+
+PG_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_busqueda_trgm ON clientes "
+    "USING gin ((translate(lower("
+    "coalesce(nombre, '') || ' ' || coalesce(apellidos, '') || ' ' || "
+    "coalesce(dni, '') || ' ' || coalesce(email, '') || ' ' || "
+    "coalesce(telefono1, '') || ' ' || coalesce(telefono2, '') || ' ' || "
+    f"coalesce(ciudad, '')), '{_FOLD_FROM}', '{_FOLD_TO}')) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_nombre_trgm ON clientes "
+    "USING gin ((translate(lower(nombre || ' ' || apellidos), "
+    f"'{_FOLD_FROM}', '{_FOLD_TO}')) gin_trgm_ops)",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5("
+    "nombre, apellidos, dni, email, telefono1, telefono2, ciudad, "
+    "content='clientes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN "
+    "INSERT INTO clientes_fts(rowid, nombre, apellidos, dni, email, telefono1, "
+    "telefono2, ciudad) VALUES (new.id, new.nombre, new.apellidos, new.dni, "
+    "new.email, new.telefono1, new.telefono2, new.ciudad); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN "
+    "INSERT INTO clientes_fts(clientes_fts, rowid, nombre, apellidos, dni, email, "
+    "telefono1, telefono2, ciudad) VALUES ('delete', old.id, old.nombre, "
+    "old.apellidos, old.dni, old.email, old.telefono1, old.telefono2, "
+    "old.ciudad); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE ON clientes BEGIN "
+    "INSERT INTO clientes_fts(clientes_fts, rowid, nombre, apellidos, dni, email, "
+    "telefono1, telefono2, ciudad) VALUES ('delete', old.id, old.nombre, "
+    "old.apellidos, old.dni, old.email, old.telefono1, old.telefono2, "
+    "old.ciudad); "
+    "INSERT INTO clientes_fts(rowid, nombre, apellidos, dni, email, telefono1, "
+    "telefono2, ciudad) VALUES (new.id, new.nombre, new.apellidos, new.dni, "
+    "new.email, new.telefono1, new.telefono2, new.ciudad); END",
+    "INSERT INTO clientes_fts(clientes_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for ddl in PG_DDL:
+            op.execute(ddl)
+    elif dialect == "sqlite":
+        for ddl in SQLITE_DDL:
+            op.execute(ddl)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_clientes_nombre_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_clientes_busqueda_trgm")
+    elif dialect == "sqlite":
+        for trigger in ("clientes_fts_ai", "clientes_fts_ad", "clientes_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS clientes_fts")
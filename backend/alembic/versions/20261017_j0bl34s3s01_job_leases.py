@@ -0,0 +1,25 @@
+"""job_leases table (single-runner lease for scheduled jobs)
+Revision ID: j0bl34s3s01
+Revises: c0nf1gst4mp
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "j0bl34s3s01"
+down_revision = "c0nf1gst4mp"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_leases",
+        sa.Column("nombre", sa.String(length=100), nullable=False),
+        sa.Column("propietario", sa.String(length=200), nullable=False),
+        sa.Column("expira", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("nombre"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_leases")
@@ -0,0 +1,27 @@
+"""albaranes listing indexes (keyset pagination)
+Revision ID: k3ys3tp4g1n4
+Revises: llmc4ch3r3sp
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+revision = "k3ys3tp4g1n4"
+down_revision = "llmc4ch3r3sp"
+
+_INDEXES = {
+    "ix_albaranes_fecha_id": ["fecha", "id"],
+    "ix_albaranes_total_id": ["total", "id"],
+    "ix_albaranes_estado_fecha_id": ["estado", "fecha", "id"],
+    "ix_albaranes_cliente_fecha_id": ["cliente_id", "fecha", "id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in _INDEXES.items():
+        op.create_index(name, "albaranes", columns)
+
+
+def downgrade() -> None:
+    for name in _INDEXES:
+        op.drop_index(name, table_name="albaranes")
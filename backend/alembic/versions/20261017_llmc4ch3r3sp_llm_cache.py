@@ -0,0 +1,29 @@
+"""llm_cache response table
+Revision ID: llmc4ch3r3sp
+Revises: rfm5n4p5h0t1
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "llmc4ch3r3sp"
+down_revision = "rfm5n4p5h0t1"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_cache",
+        sa.Column("clave", sa.String(length=64), nullable=False),
+        sa.Column("modelo", sa.String(length=100), nullable=False),
+        sa.Column("respuesta", sa.Text(), nullable=False),
+        sa.Column("creado", sa.DateTime(), nullable=False),
+        sa.Column("ultimo_uso", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("clave"),
+    )
+    op.create_index("ix_llm_cache_ultimo_uso", "llm_cache", ["ultimo_uso"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_cache_ultimo_uso", table_name="llm_cache")
+    op.drop_table("llm_cache")
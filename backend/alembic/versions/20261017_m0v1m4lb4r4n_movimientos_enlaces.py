@@ -0,0 +1,139 @@
+"""add albaran_id / camion_id / clase to movimientos and backfill them
+Revision ID: m0v1m4lb4r4n
+Revises: 0utb0x3m41l
+Create Date: 2026-10-17
+
+Deposits, charges and truck settlements used to be found by their concepto
+text (exact match or LIKE prefix), which no index can serve. The new columns
+are filled here by parsing the concepto of existing rows; ids of delivery
+notes that no longer exist are left NULL.
+"""
+
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "m0v1m4lb4r4n"
+down_revision = "0utb0x3m41l"
+
+BATCH = 1000
+
+# (tipo, pattern, kind, column holding the captured id); first match wins
+_PATTERNS = [
+    ("INGRESO", re.compile(r"^Fianza albar[aá]n #(\d+)\b"), "FIANZA", "albaran_id"),
+    (
+        "INGRESO",
+        re.compile(r"^Cobro transporte albar[aá]n #(\d+)\b"),
+        "COBRO_TRANSPORTE",
+        "albaran_id",
+    ),
+    (
+        "INGRESO",
+        re.compile(r"^Cobro (?:pendiente )?albar[aá]n #(\d+)\b"),
+        "COBRO",
+        "albaran_id",
+    ),
+    ("EGRESO", re.compile(r"^Transporte camion (\d+)\b"), "TRANSPORTE", "camion_id"),
+    (
+        "INGRESO",
+        re.compile(r"^Ingreso ruta camion (\d+)\b"),
+        "INGRESO_RUTA",
+        "camion_id",
+    ),
+]
+
+
+def _classify(tipo: str, concepto: str):
+    for expected_tipo, pattern, kind, column in _PATTERNS:
+        match = pattern.match(concepto or "")
+        if match and tipo == expected_tipo:
+            return kind, column, int(match.group(1))
+    return None
+
+
+_SELECT = sa.text(
+    "SELECT id, tipo, concepto FROM movimientos "
+    "WHERE id > :after AND (concepto LIKE 'Fianza albar%' "
+    "OR concepto LIKE 'Cobro %' OR concepto LIKE 'Transporte camion %' "
+    "OR concepto LIKE 'Ingreso ruta camion %') "
+    "ORDER BY id LIMIT :limit"
+)
+_EXISTING = sa.text("SELECT id FROM albaranes WHERE id IN :ids").bindparams(
+    sa.bindparam("ids", expanding=True)
+)
+_UPDATE = sa.text(
+    "UPDATE movimientos SET albaran_id = :albaran_id, camion_id = :camion_id, "
+    "clase = :clase WHERE id = :id"
+)
+
+
+def _backfill() -> None:
+    """Pages through movimientos by id, BATCH rows at a time."""
+    conn = op.get_bind()
+    after = 0
+    while True:
+        rows = conn.execute(_SELECT, {"after": after, "limit": BATCH}).fetchall()
+        if not rows:
+            return
+        after = rows[-1][0]
+        parsed = [
+            (movement_id, result)
+            for movement_id, tipo, concepto in rows
+            if (result := _classify(tipo, concepto)) is not None
+        ]
+        note_ids = {ref for _, (_, column, ref) in parsed if column == "albaran_id"}
+        existing = (
+            {row[0] for row in conn.execute(_EXISTING, {"ids": list(note_ids)})}
+            if note_ids
+            else set()
+        )
+        batch = []
+        for movement_id, (kind, column, ref) in parsed:
+            values = {
+                "id": movement_id,
+                "clase": kind,
+                "albaran_id": None,
+                "camion_id": None,
+            }
+            # Ids of delivery notes that no longer exist stay NULL (FK)
+            if column == "camion_id" or ref in existing:
+                values[column] = ref
+            batch.append(values)
+        if batch:
+            conn.execute(_UPDATE, batch)
+
+
+def upgrade() -> None:
+    # Batch mode: SQLite cannot ALTER a constraint in, so the table is rebuilt
+    # there; PostgreSQL gets plain ALTER TABLE statements
+    with op.batch_alter_table("movimientos") as batch:
+        batch.add_column(sa.Column("albaran_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("camion_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("clase", sa.String(length=20), nullable=True))
+        batch.create_foreign_key(
+            "fk_movimientos_albaran_id",
+            "albaranes",
+            ["albaran_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+
+    _backfill()
+
+    op.create_index(
+        "ix_movimientos_albaran_clase", "movimientos", ["albaran_id", "clase"]
+    )
+    op.create_index(
+        "ix_movimientos_camion_clase", "movimientos", ["camion_id", "clase"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_movimientos_camion_clase", table_name="movimientos")
+    op.drop_index("ix_movimientos_albaran_clase", table_name="movimientos")
+    with op.batch_alter_table("movimientos") as batch:
+        batch.drop_constraint("fk_movimientos_albaran_id", type_="foreignkey")
+        batch.drop_column("clase")
+        batch.drop_column("camion_id")
+        batch.drop_column("albaran_id")
@@ -0,0 +1,37 @@
+"""rfm_clientes snapshot table
+Revision ID: rfm5n4p5h0t1
+Revises: v3nt4sd14r14
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "rfm5n4p5h0t1"
+down_revision = "v3nt4sd14r14"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rfm_clientes",
+        sa.Column("cliente_id", sa.Integer(), nullable=False),
+        sa.Column("ultima_fecha", sa.Date(), nullable=False),
+        sa.Column("frecuencia", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("monetario", sa.Float(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["cliente_id"], ["clientes.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("cliente_id"),
+    )
+    # Backfill from the existing delivery notes
+    op.execute(
+        """
+        INSERT INTO rfm_clientes (cliente_id, ultima_fecha, frecuencia, monetario)
+        SELECT cliente_id, MAX(fecha), COUNT(id), COALESCE(SUM(total), 0)
+        FROM albaranes
+        WHERE cliente_id IS NOT NULL
+        GROUP BY cliente_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rfm_clientes")
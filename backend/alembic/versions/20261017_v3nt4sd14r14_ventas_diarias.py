@@ -0,0 +1,35 @@
+"""ventas_diarias rollup table
+Revision ID: v3nt4sd14r14
+Revises: f1anz4p4g4d4
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "v3nt4sd14r14"
+down_revision = "f1anz4p4g4d4"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ventas_diarias",
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("pedidos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("ingresos", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("clientes", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("dia"),
+    )
+    # Backfill from the existing delivery notes
+    op.execute(
+        """
+        INSERT INTO ventas_diarias (dia, pedidos, ingresos, clientes)
+        SELECT fecha, COUNT(id), COALESCE(SUM(total), 0), COUNT(DISTINCT cliente_id)
+        FROM albaranes
+        GROUP BY fecha
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ventas_diarias")
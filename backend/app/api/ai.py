@@ -5,22 +5,18 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Annotated, Optional, Dict, Any, List, Literal
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 import json
 import re
 import logging
 
 from backend.app.database import get_db
 from backend.app.api.analytics import (
-    sales_by_day,
-    top_products,
-    averages,
-    basket_pairs,
-    rfm_segments,
+    MetricsBundle,
     daterange_defaults,
-    to_iso,
+    previous_range,
 )
-from backend.app.utils.groq_llm import groq_chat
+from backend.app.utils.groq_llm import groq_chat, llm_stats
 from backend.app.dependencies import get_current_user
 
 router = APIRouter(prefix="/ai", tags=["ai"], dependencies=[Depends(get_current_user)])
@@ -156,15 +152,10 @@ def fallback_answer(metrics: Dict[str, Any], question: str) -> str:
     )
 
 
-def build_metrics(db: Session, dfrom: date, dto: date) -> Dict[str, Any]:
-    return {
-        "range": {"from": to_iso(dfrom), "to": to_iso(dto)},
-        "sales_by_day": sales_by_day(db, dfrom, dto),
-        "top_products": top_products(db, dfrom, dto, limit=10),
-        "averages": averages(db, dfrom, dto),
-        "basket_pairs": basket_pairs(db, dfrom, dto, min_support=2, limit=10),
-        "rfm": rfm_segments(db, dto),
-    }
+def build_metrics(
+    db: Session, dfrom: date, dto: date, bundle: Optional[MetricsBundle] = None
+) -> Dict[str, Any]:
+    return (bundle or MetricsBundle(db)).metrics(dfrom, dto)
 
 
 def call_llm_ask(
@@ -247,15 +238,11 @@ def chat(payload: ChatPayload, db: Annotated[Session, Depends(get_db)]):
 
     if payload.mode == "analytics":
         dfrom, dto = daterange_defaults(payload.date_from, payload.date_to)
-        m_full = build_metrics(db, dfrom, dto)
-        m = _metrics_for_chat(m_full)
-
-        # Previous period for growth/comparison questions
-        days = (dto - dfrom).days + 1
-        prev_to = dfrom - timedelta(days=1)
-        prev_from = prev_to - timedelta(days=days - 1)
-        prev_full = build_metrics(db, prev_from, prev_to)
-        prev_m = _metrics_for_chat(prev_full)
+        # Previous period for growth/comparison questions, loaded in the same batch
+        prev_from, prev_to = previous_range(dfrom, dto)
+        bundle = MetricsBundle(db, [(dfrom, dto), (prev_from, prev_to)])
+        m = _metrics_for_chat(build_metrics(db, dfrom, dto, bundle))
+        prev_m = _metrics_for_chat(build_metrics(db, prev_from, prev_to, bundle))
 
         ctx = (
             "Eres analista de datos retail de una tienda de muebles. "
@@ -280,3 +267,9 @@ def chat(payload: ChatPayload, db: Annotated[Session, Depends(get_db)]):
             "Inténtalo de nuevo en unos segundos."
         )
     return {"answer": answer}
+
+
+@router.get("/llm/stats")
+def ai_llm_stats():
+    """Latency/token counters and circuit state of the Groq client, for monitoring."""
+    return llm_stats()
@@ -1,25 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    BackgroundTasks,
+    Query,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session, selectinload
-from typing import Annotated, List, Optional
+from typing import Annotated, List, Literal, Optional
 from backend.app.database import get_db, SessionLocal
 from backend.app.entidades.albaran import (
     DeliveryNote,
+    DeliveryNoteCreateFull,
     DeliveryNoteDB,
     DeliveryNoteItemCreate,
     DeliveryNoteStatus,
 )
 from backend.app.entidades.linea_albaran import DeliveryNoteLineDB
-from backend.app.entidades.cliente import CustomerDB, CustomerCreate
+from backend.app.entidades.cliente import CustomerDB
 from backend.app.entidades.producto import ProductDB
 from backend.app.entidades.movimiento import MovementDB
 from backend.app.entidades.albaran_ruta import DeliveryNoteRouteDB
-from sqlalchemy import func
+from sqlalchemy import func, insert
 
-from backend.app.utils.emailer import send_email_with_pdf
-from backend.app.utils.albaran_pdf import generate_delivery_note_pdf
+from backend.app.utils.email_outbox import enqueue as enqueue_email
 from backend.app.utils.templates import render
 from backend.app.dependencies import get_current_user
 from backend.app.api.configuracion import get_value as get_cfg
+from backend.app.utils import config_cache, pdf_cache
+from backend.app.services import (
+    albaranes_service,
+    pdf_render_service,
+    rfm_service,
+    ventas_diarias_service,
+)
 
 from pydantic import BaseModel
 from datetime import date
@@ -29,23 +44,6 @@ router = APIRouter(dependencies=[Depends(get_current_user)])
 log = logging.getLogger("albaranes")
 
 
-class DeliveryNoteCreateFull(BaseModel):
-    """
-    Full payload for creating a delivery note. Accepts a new customer (object)
-    or an existing customer (customer_id). The deposit_amount field is optional:
-    if not provided, it defaults to 30% of the total.
-    """
-
-    date: date
-    description: Optional[str] = None
-    customer_id: Optional[int] = None
-    customer: Optional[CustomerCreate] = None
-    items: List[DeliveryNoteItemCreate]
-    status: DeliveryNoteStatus = "FIANZA"
-    register_deposit: bool = True
-    deposit_amount: Optional[float] = None
-
-
 class StatusUpdate(BaseModel):
     status: DeliveryNoteStatus
 
@@ -59,6 +57,92 @@ class DeliveryNoteUpdate(BaseModel):
     status: Optional[DeliveryNoteStatus] = None
 
 
+def _enriched_lines(db: Session, delivery_note: DeliveryNoteDB) -> tuple[list, float]:
+    """Lines of the delivery note with product names and formatted amounts."""
+    lines = (
+        db.query(DeliveryNoteLineDB)
+        .filter(DeliveryNoteLineDB.delivery_note_id == delivery_note.id)
+        .order_by(DeliveryNoteLineDB.id)
+        .all()
+    )
+    prods = {}
+    if lines:
+        prod_ids = {ln.product_id for ln in lines}
+        for p in db.query(ProductDB).filter(ProductDB.id.in_(prod_ids)).all():
+            prods[p.id] = p
+
+    enriched_lines = []
+    total = 0.0
+    for ln in lines:
+        subtotal = (ln.quantity or 0) * (ln.unit_price or 0.0)
+        total += subtotal
+        name = (
+            prods.get(ln.product_id).name
+            if prods.get(ln.product_id)
+            else f"Producto {ln.product_id}"
+        )
+        enriched_lines.append(
+            {
+                "producto_nombre": name,
+                "cantidad": ln.quantity,
+                "precio_unitario": ln.unit_price,
+                "p_unit_eur": f"{ln.unit_price:.2f} €",
+                "subtotal": subtotal,
+                "subtotal_eur": f"{subtotal:.2f} €",
+            }
+        )
+    return enriched_lines, total
+
+
+def _delivery_note_pdf_key(
+    delivery_note: DeliveryNoteDB,
+    customer: Optional[CustomerDB],
+    enriched_lines: list,
+    store_name: str,
+    logo_bytes: Optional[bytes],
+) -> str:
+    """Hash of everything printed on the PDF; also the download ETag."""
+    return pdf_cache.content_key(
+        "albaran",
+        pdf_cache.row_values(delivery_note),
+        pdf_cache.row_values(customer),
+        enriched_lines,
+        store_name,
+        pdf_cache.digest(logo_bytes),
+    )
+
+
+def _delivery_note_pdf(
+    db: Session,
+    delivery_note: DeliveryNoteDB,
+    customer: Optional[CustomerDB],
+    enriched_lines: list,
+    store_name: str,
+    block: bool = False,
+) -> bytes:
+    """
+    Rendered PDF, served from pdf_cache when nothing on the page changed.
+    Misses go to the render worker processes; block=True waits for a free
+    slot instead of failing with 503 when they are saturated.
+    """
+    logo_bytes = config_cache.logo(db)
+    key = _delivery_note_pdf_key(
+        delivery_note, customer, enriched_lines, store_name, logo_bytes
+    )
+    return pdf_cache.cache.get_or_render(
+        key,
+        lambda: pdf_render_service.render(
+            "albaran",
+            block=block,
+            albaran=pdf_cache.row_values(delivery_note),
+            cliente=pdf_cache.row_values(customer),
+            lineas=enriched_lines,
+            tienda_nombre=store_name,
+            logo_bytes=logo_bytes,
+        ),
+    )
+
+
 def _send_delivery_note_email_task(delivery_note_id: int):
     """
     Background task: generates the delivery note PDF and sends it by email to the customer.
@@ -88,40 +172,8 @@ def _send_delivery_note_email_task(delivery_note_id: int):
             )
             return
 
-        lines = (
-            db.query(DeliveryNoteLineDB)
-            .filter(DeliveryNoteLineDB.delivery_note_id == delivery_note.id)
-            .all()
-        )
-        prods = {}
-        if lines:
-            prod_ids = {ln.product_id for ln in lines}
-            for p in db.query(ProductDB).filter(ProductDB.id.in_(prod_ids)).all():
-                prods[p.id] = p
-
-        enriched_lines = []
-        total = 0.0
-        for ln in lines:
-            subtotal = (ln.quantity or 0) * (ln.unit_price or 0.0)
-            total += subtotal
-            name = (
-                prods.get(ln.product_id).name
-                if prods.get(ln.product_id)
-                else f"Producto {ln.product_id}"
-            )
-            enriched_lines.append(
-                {
-                    "producto_nombre": name,
-                    "cantidad": ln.quantity,
-                    "precio_unitario": ln.unit_price,
-                    "p_unit_eur": f"{ln.unit_price:.2f} €",
-                    "subtotal": subtotal,
-                    "subtotal_eur": f"{subtotal:.2f} €",
-                }
-            )
-
+        enriched_lines, total = _enriched_lines(db, delivery_note)
         store_name = get_cfg(db, "tienda_nombre")
-        logo_base64 = get_cfg(db, "logo_empresa") or None
         email_signature = get_cfg(db, "firma_email")
 
         html = render(
@@ -135,26 +187,23 @@ def _send_delivery_note_email_task(delivery_note_id: int):
             firma_email=email_signature,
         )
 
-        pdf_bytes = generate_delivery_note_pdf(
-            delivery_note,
-            customer,
-            enriched_lines,
-            tienda_nombre=store_name,
-            logo_base64=logo_base64,
+        pdf_bytes = _delivery_note_pdf(
+            db, delivery_note, customer, enriched_lines, store_name, block=True
         )
         customer_name = f"{getattr(customer, 'name', '')} {getattr(customer, 'surnames', '')}".strip()
         subject = f"Albarán #{delivery_note.id} - {customer_name}"
         filename = f"albaran_{delivery_note.id}.pdf"
 
-        send_email_with_pdf(
+        enqueue_email(
+            db,
             to_email=customer.email,
             subject=subject,
             html_body=html,
-            pdf_bytes=pdf_bytes,
-            pdf_filename=filename,
+            attachment=pdf_bytes,
+            attachment_name=filename,
         )
         log.info(
-            "[email] Send OK to customer %s for delivery note #%s",
+            "[email] Queued for customer %s for delivery note #%s",
             customer.email,
             delivery_note.id,
         )
@@ -197,26 +246,42 @@ def _resolve_customer_id(db: Session, payload: DeliveryNoteCreateFull) -> int:
     return new_customer.id
 
 
+def _line_rows(
+    db: Session, items: List[DeliveryNoteItemCreate]
+) -> tuple[list[dict], float]:
+    """
+    Resolves the unit price of every item with a single IN query and returns
+    the rows to insert (without delivery_note_id) and the total price.
+    """
+    product_ids = {it.product_id for it in items}
+    prices = (
+        dict(
+            db.query(ProductDB.id, ProductDB.price)
+            .filter(ProductDB.id.in_(product_ids))
+            .all()
+        )
+        if product_ids
+        else {}
+    )
+    return albaranes_service.price_lines(items, prices)
+
+
+def _insert_lines(db: Session, delivery_note_id: int, rows: list[dict]) -> None:
+    """Inserts all the lines of a delivery note in one executemany."""
+    if rows:
+        db.execute(
+            insert(DeliveryNoteLineDB),
+            [{**row, "delivery_note_id": delivery_note_id} for row in rows],
+        )
+
+
 def _build_delivery_note_lines(
     db: Session, delivery_note: DeliveryNoteDB, items: List[DeliveryNoteItemCreate]
 ) -> float:
     """Adds delivery note lines to the DB and returns the total price."""
-    total = 0.0
-    for it in items:
-        prod = db.query(ProductDB).filter(ProductDB.id == it.product_id).first()
-        if not prod:
-            raise HTTPException(404, f"Producto {it.product_id} no existe")
-        unit_price = it.unit_price if it.unit_price is not None else prod.price
-        db.add(
-            DeliveryNoteLineDB(
-                delivery_note_id=delivery_note.id,
-                product_id=it.product_id,
-                quantity=it.quantity,
-                unit_price=unit_price,
-            )
-        )
-        total += unit_price * it.quantity
-    return round(total, 2)
+    rows, total = _line_rows(db, items)
+    _insert_lines(db, delivery_note.id, rows)
+    return total
 
 
 @router.post(
@@ -231,58 +296,73 @@ def create_delivery_note(
     """
     Creates a full delivery note: customer (new or existing), order lines and
     deposit movement (30% of total by default).
+    Everything is written in one transaction with a fixed number of queries,
+    whatever the number of lines: one price lookup, one insert for the note,
+    one bulk insert for the lines and a single commit.
     """
     customer_id = _resolve_customer_id(db, payload)
+    rows, total = _line_rows(db, payload.items)
 
+    deposit_amount = albaranes_service.deposit_for(payload, total)
     delivery_note = DeliveryNoteDB(
         date=payload.date,
         description=payload.description or "",
         customer_id=customer_id,
-        total=0.0,
+        total=total,
         status=payload.status or "FIANZA",
+        fianza_pagada=float(deposit_amount) if payload.register_deposit else 0.0,
     )
     db.add(delivery_note)
     db.flush()
 
-    delivery_note.total = _build_delivery_note_lines(db, delivery_note, payload.items)
-    db.commit()
-    db.refresh(delivery_note)
-
-    deposit_description = f"Fianza albaran #{delivery_note.id}"
-    existing = (
-        db.query(MovementDB)
-        .filter(
-            MovementDB.type == "INGRESO",
-            MovementDB.date == delivery_note.date,
-            MovementDB.description == deposit_description,
-        )
-        .first()
-    )
-    if not existing:
-        deposit_amount = payload.deposit_amount
-        if deposit_amount is None:
-            deposit_amount = round((delivery_note.total or 0) * 0.30, 2)
-        mov = MovementDB(
+    _insert_lines(db, delivery_note.id, rows)
+    # The note is new, so it cannot have a deposit movement yet
+    db.add(
+        MovementDB(
             date=delivery_note.date,
-            description=deposit_description,
+            description=f"Fianza albaran #{delivery_note.id}",
             amount=float(deposit_amount),
             type="INGRESO",
+            delivery_note_id=delivery_note.id,
+            kind="FIANZA",
         )
-        db.add(mov)
-        # Persist the deposit amount on the delivery note
-        delivery_note.fianza_pagada = (
-            float(deposit_amount) if payload.register_deposit else 0.0
-        )
-        db.commit()
-    else:
-        delivery_note.fianza_pagada = (
-            float(existing.amount) if payload.register_deposit else 0.0
-        )
-        db.commit()
-
+    )
+    ventas_diarias_service.refresh_days(db, [delivery_note.date])
+    rfm_service.refresh_customers(db, [customer_id])
+    db.commit()
+    db.refresh(delivery_note)
     return delivery_note
 
 
+@router.post(
+    "/albaranes/bulk",
+    responses={415: {"description": "Unsupported format"}},
+)
+async def bulk_import_delivery_notes(
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    import_format: Annotated[
+        Optional[albaranes_service.ImportFormat], Query(alias="format")
+    ] = None,
+):
+    """
+    Imports many delivery notes from an NDJSON (one DeliveryNoteCreateFull per
+    line) or CSV (one line item per row, grouped by `ref`) body, read as a
+    stream. The format comes from `format` or the Content-Type. Returns the
+    ids created and a per-row error report; invalid rows are skipped.
+    """
+    fmt = import_format
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            fmt = "csv"
+        elif "json" in content_type:
+            fmt = "ndjson"
+        else:
+            raise HTTPException(415, "Formato no soportado: usa NDJSON o CSV")
+    return await albaranes_service.import_stream(db, request.stream(), fmt)
+
+
 @router.post(
     "/albaranes/{delivery_note_id}/send-email",
     responses={404: {"description": "Not found"}},
@@ -307,6 +387,40 @@ def list_delivery_notes(db: Annotated[Session, Depends(get_db)]):
     return db.query(DeliveryNoteDB).all()
 
 
+@router.get("/albaranes/list", responses={400: {"description": "Bad request"}})
+def list_delivery_notes_page(
+    db: Annotated[Session, Depends(get_db)],
+    status: Annotated[Optional[List[DeliveryNoteStatus]], Query()] = None,
+    date_from: Annotated[Optional[date], Query()] = None,
+    date_to: Annotated[Optional[date], Query()] = None,
+    customer_id: Annotated[Optional[int], Query()] = None,
+    total_min: Annotated[Optional[float], Query()] = None,
+    total_max: Annotated[Optional[float], Query()] = None,
+    sort: Annotated[albaranes_service.ListingSort, Query()] = "-date",
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    cursor: Annotated[Optional[str], Query()] = None,
+    include: Annotated[Optional[List[Literal["items"]]], Query()] = None,
+):
+    """
+    Cursor-paginated listing with filters (``status`` repeated, date and total
+    ranges, customer). Pass the returned ``next_cursor`` to get the next page;
+    ``include=items`` adds the lines of every note.
+    """
+    return albaranes_service.list_page(
+        db,
+        statuses=status,
+        date_from=date_from,
+        date_to=date_to,
+        customer_id=customer_id,
+        total_min=total_min,
+        total_max=total_max,
+        sort=sort,
+        limit=limit,
+        cursor=cursor,
+        include_items=bool(include and "items" in include),
+    )
+
+
 @router.get(
     "/albaranes/get/{delivery_note_id}",
     response_model=DeliveryNote,
@@ -370,8 +484,8 @@ def update_status(
     deposit = (
         db.query(func.coalesce(func.sum(MovementDB.amount), 0.0))
         .filter(
-            MovementDB.type == "INGRESO",
-            MovementDB.description == f"Fianza albaran #{delivery_note.id}",
+            MovementDB.delivery_note_id == delivery_note.id,
+            MovementDB.kind == "FIANZA",
         )
         .scalar()
         or 0.0
@@ -392,6 +506,8 @@ def update_status(
             description=f"Cobro albaran #{delivery_note.id} (pendiente)",
             amount=float(remaining),
             type="INGRESO",
+            delivery_note_id=delivery_note.id,
+            kind="COBRO",
         )
         db.add(mov)
         db.commit()
@@ -415,12 +531,16 @@ def update_delivery_note(
     )
     if not delivery_note:
         raise HTTPException(404, "Albaran no encontrado")
+    previous_date = delivery_note.date
     if payload.date is not None:
         delivery_note.date = payload.date
     if payload.description is not None:
         delivery_note.description = payload.description
     if payload.status is not None:
         delivery_note.status = payload.status
+    if delivery_note.date != previous_date:
+        ventas_diarias_service.refresh_days(db, [previous_date, delivery_note.date])
+        rfm_service.refresh_customers(db, [delivery_note.customer_id])
     db.commit()
     db.refresh(delivery_note)
     return delivery_note
@@ -453,6 +573,8 @@ def replace_items(
         db.delete(item)
     db.flush()
     albaran.total = _build_delivery_note_lines(db, albaran, payload.items)
+    ventas_diarias_service.refresh_days(db, [albaran.date])
+    rfm_service.refresh_customers(db, [albaran.customer_id])
     db.commit()
     albaran = (
         db.query(DeliveryNoteDB)
@@ -468,12 +590,15 @@ def replace_items(
     responses={404: {"description": "Not found"}},
 )
 def download_delivery_note_pdf(
-    delivery_note_id: int, db: Annotated[Session, Depends(get_db)]
+    delivery_note_id: int,
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
 ):
-    """Generates and downloads the PDF for a specific delivery note."""
-    from fastapi.responses import StreamingResponse
-    from io import BytesIO
-
+    """
+    Downloads the PDF for a specific delivery note. Renders are cached by
+    content and carry an ETag, so an unchanged note answers If-None-Match
+    with 304.
+    """
     delivery_note = (
         db.query(DeliveryNoteDB).filter(DeliveryNoteDB.id == delivery_note_id).first()
     )
@@ -483,49 +608,8 @@ def download_delivery_note_pdf(
     customer = (
         db.query(CustomerDB).filter(CustomerDB.id == delivery_note.customer_id).first()
     )
-
-    lines = (
-        db.query(DeliveryNoteLineDB)
-        .filter(DeliveryNoteLineDB.delivery_note_id == delivery_note.id)
-        .all()
-    )
-    prods = {}
-    if lines:
-        prod_ids = {ln.product_id for ln in lines}
-        for p in db.query(ProductDB).filter(ProductDB.id.in_(prod_ids)).all():
-            prods[p.id] = p
-
-    enriched_lines = []
-    total = 0.0
-    for ln in lines:
-        subtotal = (ln.quantity or 0) * (ln.unit_price or 0.0)
-        total += subtotal
-        name = (
-            prods.get(ln.product_id).name
-            if prods.get(ln.product_id)
-            else f"Producto {ln.product_id}"
-        )
-        enriched_lines.append(
-            {
-                "producto_nombre": name,
-                "cantidad": ln.quantity,
-                "precio_unitario": ln.unit_price,
-                "p_unit_eur": f"{ln.unit_price:.2f} €",
-                "subtotal": subtotal,
-                "subtotal_eur": f"{subtotal:.2f} €",
-            }
-        )
-
+    enriched_lines, _ = _enriched_lines(db, delivery_note)
     store_name = get_cfg(db, "tienda_nombre")
-    logo_base64 = get_cfg(db, "logo_empresa") or None
-
-    pdf_bytes = generate_delivery_note_pdf(
-        delivery_note,
-        customer,
-        enriched_lines,
-        tienda_nombre=store_name,
-        logo_base64=logo_base64,
-    )
 
     customer_name = ""
     if customer:
@@ -537,11 +621,22 @@ def download_delivery_note_pdf(
         )
     filename = f"albaran_{delivery_note.id}{customer_name}.pdf"
 
-    return StreamingResponse(
-        BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    key = _delivery_note_pdf_key(
+        delivery_note, customer, enriched_lines, store_name, config_cache.logo(db)
+    )
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        # Always revalidate: the ETag check is cheap and the data can change
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    pdf_bytes = _delivery_note_pdf(
+        db, delivery_note, customer, enriched_lines, store_name
     )
+    return Response(pdf_bytes, media_type="application/pdf", headers=headers)
 
 
 @router.get("/transporte/almacen", response_model=List[DeliveryNote])
@@ -581,5 +676,7 @@ def delete_delivery_note(
     if not albaran:
         raise HTTPException(404, "Albaran no encontrado")
     db.delete(albaran)
+    ventas_diarias_service.refresh_days(db, [albaran.date])
+    rfm_service.refresh_customers(db, [albaran.customer_id])
     db.commit()
     return {"ok": True}
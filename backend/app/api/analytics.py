@@ -1,22 +1,37 @@
 # backend/app/api/analytics.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, or_
 from datetime import date, datetime, timedelta
-from typing import Annotated, Optional, Dict, Any, Tuple
+from typing import Annotated, Callable, Optional, Dict, Any, Iterable, Tuple
+from io import BytesIO
+from bisect import bisect_left, bisect_right
 import json
 import logging
-import math
 
+import numpy as np
+
+from backend.app import database
 from backend.app.database import get_db
 from backend.app.entidades.albaran import DeliveryNoteDB
 from backend.app.entidades.linea_albaran import DeliveryNoteLineDB
 from backend.app.entidades.producto import ProductDB
 from backend.app.entidades.cliente import CustomerDB
+from backend.app.entidades.proveedor import SupplierDB
+from backend.app.entidades.venta_diaria import DailySalesDB
+from backend.app.services import (
+    ai_report_service,
+    basket_service,
+    forecast_service,
+    pdf_jobs_service,
+    pdf_render_service,
+    rfm_service,
+)
 
+from backend.app.utils import analytics_cache
 from backend.app.utils.groq_llm import groq_chat
-from backend.app.utils.tendencias_pdf import generar_pdf_tendencias
 from backend.app.dependencies import get_current_user
 
 router = APIRouter(
@@ -98,15 +113,11 @@ def _metrics_for_llm(metrics: Dict[str, Any]) -> Dict[str, Any]:
 
 # ---------- Cálculos ----------
 def sales_by_day(db: Session, dfrom: date, dto: date):
+    """Daily orders/revenue, read from the ventas_diarias rollup (one row per day)."""
     rows = (
-        db.query(
-            DeliveryNoteDB.date.label("day"),
-            func.count(DeliveryNoteDB.id).label("orders"),
-            func.coalesce(func.sum(DeliveryNoteDB.total), 0.0).label("revenue"),
-        )
-        .filter(DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto)
-        .group_by(DeliveryNoteDB.date)
-        .order_by(DeliveryNoteDB.date)
+        db.query(DailySalesDB.day, DailySalesDB.orders, DailySalesDB.revenue)
+        .filter(DailySalesDB.day >= dfrom, DailySalesDB.day <= dto)
+        .order_by(DailySalesDB.day)
         .all()
     )
     return [
@@ -115,255 +126,252 @@ def sales_by_day(db: Session, dfrom: date, dto: date):
     ]
 
 
-def top_products(db: Session, dfrom: date, dto: date, limit: int = 10):
-    rows = (
-        db.query(
-            DeliveryNoteLineDB.product_id,
-            func.sum(DeliveryNoteLineDB.quantity).label("qty"),
-            func.sum(DeliveryNoteLineDB.quantity * DeliveryNoteLineDB.unit_price).label(
-                "revenue"
-            ),
-        )
-        .join(DeliveryNoteDB, DeliveryNoteDB.id == DeliveryNoteLineDB.delivery_note_id)
-        .filter(DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto)
-        .group_by(DeliveryNoteLineDB.product_id)
-        .order_by(desc("revenue"))
-        .limit(limit)
-        .all()
-    )
-    prod_map = {
-        p.id: p.name
-        for p in db.query(ProductDB)
-        .filter(ProductDB.id.in_([r.product_id for r in rows]))
-        .all()
-    }
+def _top_products(lines: list, limit: int) -> list[dict]:
+    """Top products by revenue from (note_id, date, customer_id, product_id, qty, price) rows."""
+    agg: dict[int, list[float]] = {}
+    for _nid, _d, _cid, pid, qty, price in lines:
+        if pid is None:
+            continue
+        a = agg.setdefault(pid, [0.0, 0.0])
+        a[0] += float(qty or 0)
+        a[1] += float(qty or 0) * float(price or 0.0)
+    ranked = sorted(agg.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
     return [
-        {
-            "product_id": r.product_id,
-            "name": prod_map.get(r.product_id, f"Producto {r.product_id}"),
-            "qty": float(r.qty or 0),
-            "revenue": float(r.revenue or 0.0),
-        }
-        for r in rows
+        {"product_id": pid, "name": None, "qty": qty, "revenue": revenue}
+        for pid, (qty, revenue) in ranked
     ]
 
 
-def averages(db: Session, dfrom: date, dto: date):
-    q = db.query(DeliveryNoteDB).filter(
-        DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto
-    )
-    orders = q.count()
-    total = float(
-        db.query(func.coalesce(func.sum(DeliveryNoteDB.total), 0.0))
-        .filter(DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto)
-        .scalar()
-        or 0.0
-    )
-    aov = total / orders if orders else 0.0
+def _merge_ranges(ranges: Iterable[Tuple[date, date]]) -> list[Tuple[date, date]]:
+    """Sorted, disjoint ranges covering the same days (adjacent ones joined)."""
+    merged: list[Tuple[date, date]] = []
+    for dfrom, dto in sorted(ranges):
+        if merged and dfrom <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], dto))
+        else:
+            merged.append((dfrom, dto))
+    return merged
 
-    rows = (
-        db.query(
-            DeliveryNoteDB.customer_id,
-            func.coalesce(func.sum(DeliveryNoteDB.total), 0.0).label("spent"),
+
+class MetricsBundle:
+    """
+    Single analytics engine. Computes the metrics dict (range, sales_by_day,
+    top_products, averages, basket_pairs, rfm) for one or more date ranges.
+
+    All pending ranges are loaded together: one rollup query over their span,
+    one delivery-note/line query limited to the ranges themselves (the gap of
+    a year-over-year compare is not read), one product-name
+    query, plus the RFM query per range. Results are kept, so asking again
+    for a range (summary + compare + PDF export) costs nothing.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        ranges: Iterable[Tuple[date, date]] = (),
+        top_limit: int = 10,
+        basket_min_support: int = 2,
+        basket_limit: int = 10,
+    ):
+        self.db = db
+        self.top_limit = top_limit
+        self.basket_min_support = basket_min_support
+        self.basket_limit = basket_limit
+        self._pending: list[Tuple[date, date]] = []
+        self._results: Dict[Tuple[date, date], Dict[str, Any]] = {}
+        for dfrom, dto in ranges:
+            self.add(dfrom, dto)
+
+    def _cache_params(self, dfrom: date, dto: date) -> tuple:
+        return (
+            dfrom,
+            dto,
+            self.top_limit,
+            self.basket_min_support,
+            self.basket_limit,
         )
-        .filter(DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto)
-        .group_by(DeliveryNoteDB.customer_id)
-        .all()
-    )
-    avg_per_customer = (sum(float(r.spent) for r in rows) / len(rows)) if rows else 0.0
-    return {
-        "orders": orders,
-        "revenue": total,
-        "aov": aov,
-        "avg_per_customer": avg_per_customer,
-    }
 
+    def add(self, dfrom: date, dto: date) -> "MetricsBundle":
+        """Registers a range to be computed in the next batch."""
+        key = (dfrom, dto)
+        if key in self._results or key in self._pending:
+            return self
+        _, hit = analytics_cache.lookup("metrics", self._cache_params(dfrom, dto))
+        if hit is not None:
+            self._results[key] = hit
+        else:
+            self._pending.append(key)
+        return self
+
+    def metrics(self, dfrom: date, dto: date) -> Dict[str, Any]:
+        self.add(dfrom, dto)
+        if self._pending:
+            self._load()
+        return self._results[(dfrom, dto)]
+
+    def _load(self) -> None:
+        ranges, self._pending = self._pending, []
+        # Results are stored under the version seen before reading the data
+        version = analytics_cache.data_version()
+        lo = min(r[0] for r in ranges)
+        hi = max(r[1] for r in ranges)
+
+        daily = sales_by_day(self.db, lo, hi)
+        day_keys = [d["date"] for d in daily]
+        lines = (
+            self.db.query(
+                DeliveryNoteDB.id,
+                DeliveryNoteDB.date,
+                DeliveryNoteDB.customer_id,
+                DeliveryNoteLineDB.product_id,
+                DeliveryNoteLineDB.quantity,
+                DeliveryNoteLineDB.unit_price,
+            )
+            .outerjoin(
+                DeliveryNoteLineDB,
+                DeliveryNoteLineDB.delivery_note_id == DeliveryNoteDB.id,
+            )
+            .filter(
+                or_(
+                    *(
+                        DeliveryNoteDB.date.between(dfrom, dto)
+                        for dfrom, dto in _merge_ranges(ranges)
+                    )
+                )
+            )
+            .order_by(DeliveryNoteDB.date)
+            .all()
+        )
+        line_days = [r[1] for r in lines]
+        note_ids = np.fromiter((r[0] for r in lines), dtype=np.int64, count=len(lines))
+        product_ids = np.fromiter(
+            (-1 if r[3] is None else r[3] for r in lines),
+            dtype=np.int64,
+            count=len(lines),
+        )
 
-def basket_pairs(
-    db: Session, dfrom: date, dto: date, min_support: int = 2, limit: int = 10
-):
-    rows = (
-        db.query(DeliveryNoteLineDB.delivery_note_id, DeliveryNoteLineDB.product_id)
-        .join(DeliveryNoteDB, DeliveryNoteDB.id == DeliveryNoteLineDB.delivery_note_id)
-        .filter(DeliveryNoteDB.date >= dfrom, DeliveryNoteDB.date <= dto)
-        .all()
-    )
-    from collections import defaultdict
-    from itertools import combinations
-
-    by_alb = defaultdict(list)
-    for r in rows:
-        by_alb[r.delivery_note_id].append(r.product_id)
-
-    pair_count, prod_count = defaultdict(int), defaultdict(int)
-    for prods in by_alb.values():
-        uniq = sorted(set(prods))
-        for p in uniq:
-            prod_count[p] += 1
-        for a, b in combinations(uniq, 2):
-            pair_count[(a, b)] += 1
-
-    prod_ids = list({p for pair in pair_count for p in pair})
-    name_map = {
-        p.id: p.name
-        for p in db.query(ProductDB).filter(ProductDB.id.in_(prod_ids)).all()
-    }
+        computed = {}
+        for dfrom, dto in ranges:
+            sales = daily[
+                bisect_left(day_keys, to_iso(dfrom)) : bisect_right(
+                    day_keys, to_iso(dto)
+                )
+            ]
+            i, j = bisect_left(line_days, dfrom), bisect_right(line_days, dto)
+            rows = lines[i:j]
+            orders = sum(d["orders"] for d in sales)
+            revenue = float(sum(d["revenue"] for d in sales))
+            customers = len({r[2] for r in rows if r[2] is not None})
+            computed[(dfrom, dto)] = {
+                "range": {"from": to_iso(dfrom), "to": to_iso(dto)},
+                "sales_by_day": sales,
+                "top_products": _top_products(rows, self.top_limit),
+                "averages": {
+                    "orders": orders,
+                    "revenue": revenue,
+                    "aov": revenue / orders if orders else 0.0,
+                    "avg_per_customer": revenue / customers if customers else 0.0,
+                },
+                "basket_pairs": basket_service.basket_pairs(
+                    note_ids[i:j],
+                    product_ids[i:j],
+                    self.basket_min_support,
+                    self.basket_limit,
+                ),
+                "rfm": rfm_segments(self.db, dto),
+            }
 
-    pairs = []
-    for (a, b), supp in pair_count.items():
-        if supp < min_support:
-            continue
-        conf = supp / prod_count[a] if prod_count[a] else 0.0
-        lift = conf / (prod_count[b] / max(1, len(by_alb))) if len(by_alb) else 0.0
-        pairs.append(
+        ids = set()
+        for m in computed.values():
+            ids.update(t["product_id"] for t in m["top_products"])
+            for p in m["basket_pairs"]:
+                ids.update((p["a_id"], p["b_id"]))
+        names = (
             {
-                "a_id": a,
-                "a_name": name_map.get(a, f"Producto {a}"),
-                "b_id": b,
-                "b_name": name_map.get(b, f"Producto {b}"),
-                "support": int(supp),
-                "confidence": conf,
-                "lift": lift,
+                p.id: p.name
+                for p in self.db.query(ProductDB.id, ProductDB.name).filter(
+                    ProductDB.id.in_(ids)
+                )
             }
+            if ids
+            else {}
         )
-    pairs.sort(key=lambda x: (x["support"], x["confidence"]), reverse=True)
-    return pairs[:limit]
+        for m in computed.values():
+            for t in m["top_products"]:
+                t["name"] = names.get(t["product_id"], f"Producto {t['product_id']}")
+            for p in m["basket_pairs"]:
+                p["a_name"] = names.get(p["a_id"], f"Producto {p['a_id']}")
+                p["b_name"] = names.get(p["b_id"], f"Producto {p['b_id']}")
+        self._results.update(computed)
+        for (dfrom, dto), m in computed.items():
+            analytics_cache.store("metrics", version, self._cache_params(dfrom, dto), m)
 
 
 def rfm_segments(db: Session, ref_date: date):
-    rows = (
-        db.query(
-            CustomerDB.id.label("cid"),
-            func.max(DeliveryNoteDB.date).label("last_date"),
-            func.count(DeliveryNoteDB.id).label("freq"),
-            func.coalesce(func.sum(DeliveryNoteDB.total), 0.0).label("monetary"),
-        )
-        .join(DeliveryNoteDB, DeliveryNoteDB.customer_id == CustomerDB.id)
-        .filter(DeliveryNoteDB.date <= ref_date)
-        .group_by(CustomerDB.id)
-        .all()
-    )
-    if not rows:
-        return {"summary": {}, "by_customer": []}
-
-    recencies = []
-    for r in rows:
-        rec_days = (ref_date - r.last_date).days if r.last_date else 99999
-        recencies.append(rec_days)
-
-    import numpy as np
-
-    def quantiles(series):
-        if len(series) >= 4:
-            return np.quantile(series, [0.25, 0.5, 0.75]).tolist()
-        return [min(series), float(np.median(series)), max(series)]
-
-    Rq = quantiles(recencies)
-    Fq = quantiles([float(r.freq) for r in rows])
-    Mq = quantiles([float(r.monetary) for r in rows])
-
-    def score_r(rec_days):
-        if rec_days <= Rq[0]:
-            return 4
-        if rec_days <= Rq[1]:
-            return 3
-        if rec_days <= Rq[2]:
-            return 2
-        return 1
-
-    def score(val, qs):
-        if val <= qs[0]:
-            return 1
-        if val <= qs[1]:
-            return 2
-        if val <= qs[2]:
-            return 3
-        return 4
-
-    by_customer = []
-    for r in rows:
-        rec_days = (ref_date - r.last_date).days if r.last_date else 99999
-        sR, sF, sM = (
-            score_r(rec_days),
-            score(float(r.freq), Fq),
-            score(float(r.monetary), Mq),
-        )
-        seg = (
-            "VIP"
-            if (sR >= 3 and sF == 4 and sM == 4)
-            else "En crecimiento"
-            if (sF >= 3 and sM >= 3)
-            else "En riesgo"
-            if (sR == 1 and sF <= 2)
-            else "Ocasional"
-        )
-        by_customer.append(
-            {
-                "cliente_id": r.cid,
-                "recency_days": rec_days,
-                "frequency": int(r.freq),
-                "monetary": float(r.monetary),
-                "R": sR,
-                "F": sF,
-                "M": sM,
-                "segment": seg,
-            }
-        )
-    seg_summary = {}
-    for c in by_customer:
-        seg_summary[c["segment"]] = seg_summary.get(c["segment"], 0) + 1
-    return {"summary": seg_summary, "by_customer": by_customer}
+    return rfm_service.rfm_segments(db, ref_date)
 
 
 # ---------- IA: informe narrativo (Groq) ----------
+def _report_messages(metrics_full: Dict[str, Any]) -> list[dict]:
+    metrics_small = _metrics_for_llm(metrics_full)
+
+    prompt = (
+        "Eres analista de datos retail de una tienda de muebles. "
+        "Con el JSON de métricas (compacto) redacta un informe MUY detallado en español, "
+        "claro y accionable, con secciones y bullets. Incluye:\n"
+        "- evolución/estacionalidad, anomalías y posibles causas\n"
+        "- ticket medio y palancas para mejorarlo\n"
+        "- productos estrella y productos con potencial\n"
+        "- oportunidades de cross-sell usando pares co-comprados\n"
+        "- lectura de RFM y acciones por segmento\n"
+        "- un plan de 5 acciones priorizadas (impacto/esfuerzo)\n\n"
+        f"MÉTRICAS JSON:\n{_json_compact(metrics_small)}"
+    )
+
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Eres un experto en analítica de retail de una tienda de muebles. "
+                "Responde siempre en español con el informe formateado en HTML usando "
+                "solo estas etiquetas: <h3>, <h4>, <strong>, <ul>, <li>, <ol>, <p>, <br>. "
+                "No uses Markdown ni ningún otro formato."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _basic_report(m: Dict[str, Any]) -> str:
+    """Informe sin IA, usado cuando Groq no está disponible."""
+    top = m.get("top_products", [])[:5]
+    top_txt = ", ".join([f"{t['name']} ({t['revenue']:.2f}€)" for t in top]) or "—"
+    seg = (m.get("rfm") or {}).get("summary", {})
+    seg_txt = ", ".join([f"{k}: {v}" for k, v in seg.items()]) or "—"
+    return (
+        "Informe de tendencias (básico):\n"
+        f"- Ventas totales: {m['averages']['revenue']:.2f} € en {m['averages']['orders']} pedidos.\n"
+        f"- Ticket medio (AOV): {m['averages']['aov']:.2f} €; gasto medio por cliente: {m['averages']['avg_per_customer']:.2f} €.\n"
+        f"- Top productos por facturación: {top_txt}.\n"
+        f"- Segmentación RFM: {seg_txt}.\n"
+        "- Sugerencias: potenciar bundles de los top productos y campañas a clientes 'En riesgo'."
+    )
+
+
 def generate_ai_report(metrics_full: Dict[str, Any]) -> str:
     """Genera informe narrativo usando Groq, evitando payloads gigantes (413)."""
     try:
-        metrics_small = _metrics_for_llm(metrics_full)
-
-        prompt = (
-            "Eres analista de datos retail de una tienda de muebles. "
-            "Con el JSON de métricas (compacto) redacta un informe MUY detallado en español, "
-            "claro y accionable, con secciones y bullets. Incluye:\n"
-            "- evolución/estacionalidad, anomalías y posibles causas\n"
-            "- ticket medio y palancas para mejorarlo\n"
-            "- productos estrella y productos con potencial\n"
-            "- oportunidades de cross-sell usando pares co-comprados\n"
-            "- lectura de RFM y acciones por segmento\n"
-            "- un plan de 5 acciones priorizadas (impacto/esfuerzo)\n\n"
-            f"MÉTRICAS JSON:\n{_json_compact(metrics_small)}"
-        )
-
-        return groq_chat(
-            [
-                {
-                    "role": "system",
-                    "content": (
-                        "Eres un experto en analítica de retail de una tienda de muebles. "
-                        "Responde siempre en español con el informe formateado en HTML usando "
-                        "solo estas etiquetas: <h3>, <h4>, <strong>, <ul>, <li>, <ol>, <p>, <br>. "
-                        "No uses Markdown ni ningún otro formato."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-        )
+        return groq_chat(_report_messages(metrics_full), temperature=0.2)
     except Exception as e:
         log.warning("IA no disponible (%s). Usando informe básico.", e)
-        m = metrics_full
-        top = m.get("top_products", [])[:5]
-        top_txt = ", ".join([f"{t['name']} ({t['revenue']:.2f}€)" for t in top]) or "—"
-        seg = (m.get("rfm") or {}).get("summary", {})
-        seg_txt = ", ".join([f"{k}: {v}" for k, v in seg.items()]) or "—"
-        return (
-            "Informe de tendencias (básico):\n"
-            f"- Ventas totales: {m['averages']['revenue']:.2f} € en {m['averages']['orders']} pedidos.\n"
-            f"- Ticket medio (AOV): {m['averages']['aov']:.2f} €; gasto medio por cliente: {m['averages']['avg_per_customer']:.2f} €.\n"
-            f"- Top productos por facturación: {top_txt}.\n"
-            f"- Segmentación RFM: {seg_txt}.\n"
-            "- Sugerencias: potenciar bundles de los top productos y campañas a clientes 'En riesgo'."
-        )
+        return _basic_report(metrics_full)
+
+
+def start_ai_report(metrics_full: Dict[str, Any]) -> str:
+    """Lanza el informe narrativo en segundo plano y devuelve su id."""
+    return ai_report_service.start_report(
+        _report_messages(metrics_full), lambda: _basic_report(metrics_full)
+    ).id
 
 
 def _pct(diff: float, prev: float) -> str:
@@ -372,28 +380,25 @@ def _pct(diff: float, prev: float) -> str:
     return f"{(diff / prev) * 100:.1f}%"
 
 
-def compare_periods(db: Session, dfrom: date, dto: date) -> Dict[str, Any]:
-    """Compara el rango actual con el periodo anterior de la misma duración."""
+def previous_range(dfrom: date, dto: date) -> Tuple[date, date]:
+    """Periodo anterior de la misma duración que [dfrom, dto]."""
     days = (dto - dfrom).days + 1
     prev_to = dfrom - timedelta(days=1)
-    prev_from = prev_to - timedelta(days=days - 1)
-
-    current = {
-        "range": {"from": to_iso(dfrom), "to": to_iso(dto)},
-        "sales_by_day": sales_by_day(db, dfrom, dto),
-        "top_products": top_products(db, dfrom, dto, limit=10),
-        "averages": averages(db, dfrom, dto),
-        "basket_pairs": basket_pairs(db, dfrom, dto, min_support=2, limit=10),
-        "rfm": rfm_segments(db, dto),
-    }
-    previous = {
-        "range": {"from": to_iso(prev_from), "to": to_iso(prev_to)},
-        "sales_by_day": sales_by_day(db, prev_from, prev_to),
-        "top_products": top_products(db, prev_from, prev_to, limit=10),
-        "averages": averages(db, prev_from, prev_to),
-        "basket_pairs": basket_pairs(db, prev_from, prev_to, min_support=2, limit=10),
-        "rfm": rfm_segments(db, prev_to),
-    }
+    return prev_to - timedelta(days=days - 1), prev_to
+
+
+def compare_periods(
+    db: Session, dfrom: date, dto: date, bundle: Optional[MetricsBundle] = None
+) -> Dict[str, Any]:
+    """Compara el rango actual con el periodo anterior de la misma duración.
+
+    Si se pasa un MetricsBundle, se reutilizan las métricas ya calculadas.
+    """
+    prev_from, prev_to = previous_range(dfrom, dto)
+    bundle = bundle or MetricsBundle(db)
+    bundle.add(dfrom, dto).add(prev_from, prev_to)
+    current = bundle.metrics(dfrom, dto)
+    previous = bundle.metrics(prev_from, prev_to)
 
     ca, pa = current["averages"], previous["averages"]
     delta = {
@@ -480,7 +485,12 @@ def monthly_sales(db: Session, from_date: date, to_date: date) -> list:
     return sorted(buckets.values(), key=lambda x: x["month"])
 
 
-def _holt_forecast(values: list, n_ahead: int, alpha: float = 0.3, beta: float = 0.1):
+def _holt_forecast(
+    values: list,
+    n_ahead: int,
+    alpha: Optional[float] = None,
+    beta: Optional[float] = None,
+):
     """
     Holt's double exponential smoothing (trend model), equivalent to ARIMA(0,1,1)+drift.
 
@@ -488,8 +498,8 @@ def _holt_forecast(values: list, n_ahead: int, alpha: float = 0.3, beta: float =
     ----------
     values  : historical observations (monthly revenue), oldest first
     n_ahead : number of future steps to forecast
-    alpha   : level smoothing factor  (0 < α < 1)
-    beta    : trend smoothing factor  (0 < β < 1)
+    alpha   : level smoothing factor  (0 < α < 1); None = grid search
+    beta    : trend smoothing factor  (0 < β < 1); None = grid search
 
     Returns
     -------
@@ -497,48 +507,13 @@ def _holt_forecast(values: list, n_ahead: int, alpha: float = 0.3, beta: float =
     """
     if not values or n_ahead <= 0:
         return [], [], []
-
-    vals = [max(0.0, float(v)) for v in values]
-    n = len(vals)
-
-    if n == 1:
-        fc = [vals[0]] * n_ahead
-        return fc, fc[:], fc[:]
-
-    # Initialization: level = first value, trend = average first-differences
-    L = vals[0]
-    T = (vals[-1] - vals[0]) / (n - 1)
-
-    # Smooth the series to obtain the final level and trend
-    for v in vals[1:]:
-        l_prev, t_prev = L, T
-        L = alpha * v + (1 - alpha) * (l_prev + t_prev)
-        T = beta * (L - l_prev) + (1 - beta) * t_prev
-
-    forecasts = [max(0.0, L + h * T) for h in range(1, n_ahead + 1)]
-
-    # Compute RMSE of one-step-ahead in-sample residuals (for interval width)
-    if n >= 3:
-        l_t = vals[0]
-        t_t = (vals[-1] - vals[0]) / (n - 1)
-        residuals = []
-        for v in vals[1:]:
-            one_step = l_t + t_t
-            residuals.append(v - one_step)
-            l_prev_t = l_t
-            l_t = alpha * v + (1 - alpha) * one_step
-            t_t = beta * (l_t - l_prev_t) + (1 - beta) * t_t
-        rmse = math.sqrt(sum(r**2 for r in residuals) / len(residuals))
-    else:
-        rmse = abs(vals[-1] - vals[0])
-
-    # 80% prediction interval: ±1.28 × RMSE × √h  (uncertainty grows with horizon)
-    lower = [
-        max(0.0, f - 1.28 * rmse * math.sqrt(h)) for h, f in enumerate(forecasts, 1)
-    ]
-    upper = [f + 1.28 * rmse * math.sqrt(h) for h, f in enumerate(forecasts, 1)]
-
-    return forecasts, lower, upper
+    res = forecast_service.holt_batch(
+        [values],
+        n_ahead,
+        None if alpha is None else [alpha],
+        None if beta is None else [beta],
+    )
+    return res.forecast[0].tolist(), res.lower_80[0].tolist(), res.upper_80[0].tolist()
 
 
 def _next_months(last_month_str: str, n: int) -> list:
@@ -567,13 +542,7 @@ def _prediction_data(
     # Sanitize n_months to a fixed safe bound so that allocation and loop sizes
     # are application-controlled and not directly determined by user input.
     n_months = min(max(1, int(n_months)), 12)
-    # Extend history to at least 12 months for a better smoothing baseline
-    if to_date.month > 1:
-        history_from = min(from_date, date(to_date.year - 1, to_date.month, 1))
-    else:
-        history_from = min(from_date, date(to_date.year - 2, 12, 1))
-
-    historical = monthly_sales(db, history_from, to_date)
+    historical = monthly_sales(db, _history_from(from_date, to_date), to_date)
     revenues = [h["revenue"] for h in historical]
 
     if len(revenues) < 2:
@@ -581,9 +550,17 @@ def _prediction_data(
         lo_list = [0.0] * n_months
         hi_list = [0.0] * n_months
         method = "insufficient_data"
+        alpha, beta = 0.3, 0.1
     else:
-        forecasts_list, lo_list, hi_list = _holt_forecast(revenues, n_months)
+        # (alpha, beta) chosen by grid search on the one-step-ahead SSE
+        res = forecast_service.holt_batch([revenues], n_months)
+        forecasts_list, lo_list, hi_list = (
+            res.forecast[0],
+            res.lower_80[0],
+            res.upper_80[0],
+        )
         method = "holt_double_exponential_smoothing"
+        alpha, beta = float(res.alpha[0]), float(res.beta[0])
 
     last_month = historical[-1]["month"] if historical else to_date.strftime("%Y-%m")
     future_months = _next_months(last_month, n_months)
@@ -593,16 +570,163 @@ def _prediction_data(
         "forecast": [
             {
                 "month": future_months[i],
-                "predicted_revenue": round(forecasts_list[i], 2),
-                "lower_80": round(lo_list[i], 2),
-                "upper_80": round(hi_list[i], 2),
+                "predicted_revenue": round(float(forecasts_list[i]), 2),
+                "lower_80": round(float(lo_list[i]), 2),
+                "upper_80": round(float(hi_list[i]), 2),
             }
             for i in range(n_months)
         ],
         "method": method,
         "n_months": n_months,
-        "alpha": 0.3,
-        "beta": 0.1,
+        "alpha": alpha,
+        "beta": beta,
+    }
+
+
+def _history_from(from_date: date, to_date: date) -> date:
+    """At least 12 months of history for a better smoothing baseline."""
+    if to_date.month > 1:
+        return min(from_date, date(to_date.year - 1, to_date.month, 1))
+    return min(from_date, date(to_date.year - 2, 12, 1))
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _monthly_matrix(rows, start: date, end: date) -> tuple[list, np.ndarray]:
+    """
+    (key, day, revenue) rows -> (keys, matrix) with one row per key and one
+    column per month in [start, end]; months without sales are 0.
+    """
+    rows = [r for r in rows if r[2]]
+    keys = sorted({r[0] for r in rows}, key=lambda k: (k is None, k))
+    pos = {k: i for i, k in enumerate(keys)}
+    first = _month_index(start)
+    matrix = np.zeros((len(keys), _month_index(end) - first + 1))
+    if rows:
+        np.add.at(
+            matrix,
+            (
+                np.fromiter((pos[r[0]] for r in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter(
+                    (_month_index(r[1]) - first for r in rows),
+                    dtype=np.int64,
+                    count=len(rows),
+                ),
+            ),
+            np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows)),
+        )
+    return keys, matrix
+
+
+FORECAST_GROUPS = ("total", "product", "supplier", "city")
+
+
+def _group_rows(db: Session, group: str, start: date, end: date) -> tuple[list, dict]:
+    """Daily revenue rows (key, day, revenue) for one grouping, plus key -> name."""
+    if group == "total":
+        rows = (
+            db.query(DailySalesDB.day, DailySalesDB.revenue)
+            .filter(DailySalesDB.day >= start, DailySalesDB.day <= end)
+            .all()
+        )
+        return [("total", d, rev) for d, rev in rows], {"total": "Total"}
+
+    if group == "city":
+        rows = (
+            db.query(
+                CustomerDB.city,
+                DeliveryNoteDB.date,
+                func.sum(DeliveryNoteDB.total),
+            )
+            .join(CustomerDB, CustomerDB.id == DeliveryNoteDB.customer_id)
+            .filter(DeliveryNoteDB.date >= start, DeliveryNoteDB.date <= end)
+            .group_by(CustomerDB.city, DeliveryNoteDB.date)
+            .all()
+        )
+        return rows, {}
+
+    key = ProductDB.id if group == "product" else ProductDB.supplier_id
+    rows = (
+        db.query(
+            key,
+            DeliveryNoteDB.date,
+            func.sum(DeliveryNoteLineDB.quantity * DeliveryNoteLineDB.unit_price),
+        )
+        .join(
+            DeliveryNoteLineDB,
+            DeliveryNoteLineDB.delivery_note_id == DeliveryNoteDB.id,
+        )
+        .join(ProductDB, ProductDB.id == DeliveryNoteLineDB.product_id)
+        .filter(DeliveryNoteDB.date >= start, DeliveryNoteDB.date <= end)
+        .group_by(key, DeliveryNoteDB.date)
+        .all()
+    )
+    ids = {r[0] for r in rows}
+    model = ProductDB if group == "product" else SupplierDB
+    names = (
+        dict(db.query(model.id, model.name).filter(model.id.in_(ids)).all())
+        if ids
+        else {}
+    )
+    return rows, names
+
+
+def _batch_prediction_data(
+    db: Session,
+    from_date: date,
+    to_date: date,
+    n_months: int,
+    groups: Iterable[str],
+    limit: int,
+) -> dict:
+    """
+    Forecasts every series of the requested groupings. All the series of a
+    grouping share the month axis and are forecast in one holt_batch call.
+    """
+    n_months = min(max(1, int(n_months)), 12)
+    start = _history_from(from_date, to_date)
+    months = [
+        f"{m // 12:04d}-{m % 12 + 1:02d}"
+        for m in range(_month_index(start), _month_index(to_date) + 1)
+    ]
+    future_months = _next_months(months[-1], n_months)
+
+    out: Dict[str, Any] = {}
+    for group in dict.fromkeys(groups):
+        rows, names = _group_rows(db, group, start, to_date)
+        keys, matrix = _monthly_matrix(rows, start, to_date)
+        # Largest series first; the limit keeps the payload bounded
+        order = np.argsort(-matrix.sum(axis=1), kind="stable")[:limit]
+        keys, matrix = [keys[i] for i in order], matrix[order]
+        res = forecast_service.holt_batch(matrix, n_months)
+        out[group] = [
+            {
+                "key": k,
+                "name": names.get(k, k if k is not None else "—"),
+                "history": [round(v, 2) for v in matrix[i].tolist()],
+                "forecast": [
+                    {
+                        "month": future_months[h],
+                        "predicted_revenue": round(float(res.forecast[i, h]), 2),
+                        "lower_80": round(float(res.lower_80[i, h]), 2),
+                        "upper_80": round(float(res.upper_80[i, h]), 2),
+                    }
+                    for h in range(n_months)
+                ],
+                "alpha": float(res.alpha[i]),
+                "beta": float(res.beta[i]),
+            }
+            for i, k in enumerate(keys)
+        ]
+
+    return {
+        "months": months,
+        "forecast_months": future_months,
+        "n_months": n_months,
+        "method": "holt_double_exponential_smoothing",
+        "groups": out,
     }
 
 
@@ -612,19 +736,51 @@ def analytics_summary(
     db: Annotated[Session, Depends(get_db)],
     date_from: Annotated[Optional[date], Query()] = None,
     date_to: Annotated[Optional[date], Query()] = None,
+    wait_report: Annotated[bool, Query()] = False,
 ):
+    """
+    Returns the metrics right away. The AI narrative is generated in the
+    background: stream it from /analytics/reports/{report_id}/stream (SSE).
+    With wait_report=true the report is generated inline as ai_report.
+    """
     dfrom, dto = daterange_defaults(date_from, date_to)
 
-    metrics = {
-        "range": {"from": to_iso(dfrom), "to": to_iso(dto)},
-        "sales_by_day": sales_by_day(db, dfrom, dto),
-        "top_products": top_products(db, dfrom, dto, limit=10),
-        "averages": averages(db, dfrom, dto),
-        "basket_pairs": basket_pairs(db, dfrom, dto, min_support=2, limit=10),
-        "rfm": rfm_segments(db, dto),
+    metrics = MetricsBundle(db).metrics(dfrom, dto)
+    if wait_report:
+        return {
+            "metrics": metrics,
+            "report_id": None,
+            "ai_report": generate_ai_report(metrics),
+        }
+    return {
+        "metrics": metrics,
+        "report_id": start_ai_report(metrics),
+        "ai_report": None,
     }
-    report = generate_ai_report(metrics)
-    return {"metrics": metrics, "ai_report": report}
+
+
+@router.get("/reports/{report_id}", responses={404: {"description": "Not found"}})
+def analytics_report(report_id: str):
+    """Estado y texto acumulado de un informe IA (alternativa al stream)."""
+    report = ai_report_service.get_report(report_id)
+    if report is None:
+        raise HTTPException(404, "Informe no encontrado")
+    return report.to_dict()
+
+
+@router.get(
+    "/reports/{report_id}/stream", responses={404: {"description": "Not found"}}
+)
+async def analytics_report_stream(report_id: str):
+    """Server-Sent Events con los tokens del informe IA a medida que llegan."""
+    report = ai_report_service.get_report(report_id)
+    if report is None:
+        raise HTTPException(404, "Informe no encontrado")
+    return StreamingResponse(
+        ai_report_service.sse_events(report),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/compare", responses={400: {"description": "Bad request"}})
@@ -639,23 +795,30 @@ def analytics_compare(
     return compare_obj
 
 
-@router.get("/export/pdf", responses={400: {"description": "Bad request"}})
-def analytics_export_pdf(
-    db: Annotated[Session, Depends(get_db)],
-    date_from: Annotated[Optional[date], Query()] = None,
-    date_to: Annotated[Optional[date], Query()] = None,
-    include_compare: Annotated[bool, Query()] = True,
-):
-    dfrom, dto = daterange_defaults(date_from, date_to)
+def _noop_progress(_pct: int, _stage: str) -> None:
+    return None
 
-    metrics_actual = {
-        "range": {"from": to_iso(dfrom), "to": to_iso(dto)},
-        "sales_by_day": sales_by_day(db, dfrom, dto),
-        "top_products": top_products(db, dfrom, dto, limit=10),
-        "averages": averages(db, dfrom, dto),
-        "basket_pairs": basket_pairs(db, dfrom, dto, min_support=2, limit=10),
-        "rfm": rfm_segments(db, dto),
-    }
+
+def _render_trends_pdf(
+    db: Session,
+    dfrom: date,
+    dto: date,
+    include_compare: bool,
+    progress: Callable[[int, str], None] = _noop_progress,
+    block: bool = False,
+) -> bytes:
+    """
+    Builds the trends PDF (metrics, AI reports, comparison and forecast).
+    The layout itself is rendered by pdf_render_service; background jobs pass
+    block=True to wait for a render slot instead of getting a 503.
+    """
+    progress(5, "metrics")
+    # Both periods are loaded in one batch; compare_periods reuses them.
+    bundle = MetricsBundle(db, [(dfrom, dto)])
+    if include_compare:
+        bundle.add(*previous_range(dfrom, dto))
+    metrics_actual = bundle.metrics(dfrom, dto)
+    progress(20, "ai_report")
     ai_report = generate_ai_report(metrics_actual)
 
     rango_prev = None
@@ -664,19 +827,24 @@ def analytics_export_pdf(
     ai_compare = None
 
     if include_compare:
-        comp = compare_periods(db, dfrom, dto)
+        progress(50, "compare")
+        comp = compare_periods(db, dfrom, dto, bundle=bundle)
         rango_prev = comp["previous"]["range"]
         metrics_prev = comp["previous"]
         delta = comp["delta"]
         ai_compare = generate_ai_compare_report(comp)
 
+    progress(75, "prediction")
     prediction = None
     try:
         prediction = _prediction_data(db, dfrom, dto, n_months=3)
     except Exception as exc:
         log.warning("No se pudo calcular la predicción para el PDF: %s", exc)
 
-    buffer = generar_pdf_tendencias(
+    progress(90, "render")
+    return pdf_render_service.render(
+        "tendencias",
+        block=block,
         tienda_nombre="Tienda",
         rango_actual=metrics_actual["range"],
         metrics_actual=metrics_actual,
@@ -688,14 +856,88 @@ def analytics_export_pdf(
         prediction=prediction,
     )
 
-    filename = f"tendencias_{to_iso(dfrom)}_a_{to_iso(dto)}.pdf"
+
+def _trends_pdf_filename(dfrom: date, dto: date) -> str:
+    return f"tendencias_{to_iso(dfrom)}_a_{to_iso(dto)}.pdf"
+
+
+@router.get("/export/pdf", responses={400: {"description": "Bad request"}})
+def analytics_export_pdf(
+    db: Annotated[Session, Depends(get_db)],
+    date_from: Annotated[Optional[date], Query()] = None,
+    date_to: Annotated[Optional[date], Query()] = None,
+    include_compare: Annotated[bool, Query()] = True,
+):
+    dfrom, dto = daterange_defaults(date_from, date_to)
+    pdf = _render_trends_pdf(db, dfrom, dto, include_compare)
+    filename = _trends_pdf_filename(dfrom, dto)
     return StreamingResponse(
-        buffer,
+        BytesIO(pdf),
         media_type="application/pdf",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
+class PdfExportJobRequest(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    include_compare: bool = True
+
+
+@router.post(
+    "/export/pdf/jobs",
+    status_code=202,
+    responses={400: {"description": "Bad request"}},
+)
+def create_export_pdf_job(payload: PdfExportJobRequest):
+    """
+    Starts the trends PDF in the background and returns the job id. A request
+    for the same range and include_compare while a job is still running gets
+    that job back.
+    """
+    dfrom, dto = daterange_defaults(payload.date_from, payload.date_to)
+    include_compare = payload.include_compare
+
+    def render(progress: Callable[[int, str], None]) -> bytes:
+        # The worker outlives the request: it opens its own session
+        with database.SessionLocal() as db:
+            return _render_trends_pdf(
+                db, dfrom, dto, include_compare, progress, block=True
+            )
+
+    job, created = pdf_jobs_service.submit(
+        ("trends", dfrom, dto, include_compare),
+        _trends_pdf_filename(dfrom, dto),
+        render,
+    )
+    return {**job.to_dict(), "created": created}
+
+
+def _get_job_or_404(job_id: str) -> pdf_jobs_service.PdfJob:
+    job = pdf_jobs_service.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Trabajo de exportación no encontrado")
+    return job
+
+
+@router.get("/export/pdf/jobs/{job_id}", responses={404: {"description": "Not found"}})
+def get_export_pdf_job(job_id: str):
+    return _get_job_or_404(job_id).to_dict()
+
+
+@router.get(
+    "/export/pdf/jobs/{job_id}/download",
+    responses={404: {"description": "Not found"}, 409: {"description": "Conflict"}},
+)
+def download_export_pdf_job(job_id: str):
+    job = _get_job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(409, f"El PDF todavía no está listo ({job.status})")
+    if not job.path.exists():
+        raise HTTPException(404, "El PDF ha caducado")
+    return FileResponse(job.path, media_type="application/pdf", filename=job.filename)
+
+
 @router.get("/predict", responses={400: {"description": "Bad request"}})
 def analytics_predict(
     db: Annotated[Session, Depends(get_db)],
@@ -709,4 +951,39 @@ def analytics_predict(
     with 80% prediction intervals (±1.28 × RMSE × √h).
     """
     dfrom, dto = daterange_defaults(date_from, date_to)
-    return _prediction_data(db, dfrom, dto, n_months)
+    return analytics_cache.cached(
+        "predict",
+        (dfrom, dto, n_months),
+        lambda: _prediction_data(db, dfrom, dto, n_months),
+    )
+
+
+@router.get("/predict/batch", responses={400: {"description": "Bad request"}})
+def analytics_predict_batch(
+    db: Annotated[Session, Depends(get_db)],
+    date_from: Annotated[Optional[date], Query()] = None,
+    date_to: Annotated[Optional[date], Query()] = None,
+    n_months: Annotated[int, Query(ge=1, le=12)] = 3,
+    group_by: Annotated[Optional[list[str]], Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 50,
+):
+    """Holt forecasts for many series at once: total revenue and per product,
+    supplier and/or city (``group_by`` repeated; default: all of them), with
+    (alpha, beta) optimised per series.
+    """
+    dfrom, dto = daterange_defaults(date_from, date_to)
+    groups = tuple(group_by or FORECAST_GROUPS)
+    unknown = [g for g in groups if g not in FORECAST_GROUPS]
+    if unknown:
+        raise HTTPException(400, f"group_by no válido: {', '.join(unknown)}")
+    return analytics_cache.cached(
+        "predict_batch",
+        (dfrom, dto, n_months, groups, limit),
+        lambda: _batch_prediction_data(db, dfrom, dto, n_months, groups, limit),
+    )
+
+
+@router.get("/cache/stats")
+def analytics_cache_stats():
+    """Hit/miss counters of the analytics result cache, for monitoring."""
+    return analytics_cache.stats()
@@ -5,6 +5,7 @@ from typing import Annotated
 from passlib.context import CryptContext
 from backend.app.database import get_db
 from backend.app.entidades.usuario import UserDB, User, UpdateMe
+from backend.app.utils import user_cache
 from backend.app.utils.jwt_utils import create_access_token
 from backend.app.dependencies import get_current_user
 
@@ -33,7 +34,14 @@ def login(
             detail="Credenciales incorrectas",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    token = create_access_token({"sub": user.username, "role": user.role})
+    token = create_access_token(
+        {
+            "sub": user.username,
+            "role": user.role,
+            "uid": user.id,
+            "active": bool(user.is_active),
+        }
+    )
     return {"access_token": token, "token_type": "bearer"}
 
 
@@ -56,20 +64,28 @@ def update_me(
     current_user: Annotated[UserDB, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
-    if not verify_password(data.current_password, current_user.hashed_password):
+    # get_current_user returns a cached, detached snapshot
+    user = db.get(UserDB, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not verify_password(data.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Contraseña actual incorrecta",
         )
 
-    if data.new_username and data.new_username != current_user.username:
+    if data.new_username and data.new_username != user.username:
         clash = db.query(UserDB).filter(UserDB.username == data.new_username).first()
         if clash:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Ese nombre de usuario ya está en uso",
             )
-        current_user.username = data.new_username
+        user.username = data.new_username
 
     if data.new_password:
         if len(data.new_password) < 8:
@@ -77,8 +93,15 @@ def update_me(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="La contraseña debe tener al menos 8 caracteres",
             )
-        current_user.hashed_password = hash_password(data.new_password)
+        user.hashed_password = hash_password(data.new_password)
 
+    # The commit also invalidates the cached users (utils/user_cache.py)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    return user
+
+
+@router.get("/cache/stats")
+def user_cache_stats(_: Annotated[UserDB, Depends(get_current_user)]):
+    """Hit/miss counters of the authenticated-user cache."""
+    return user_cache.stats()
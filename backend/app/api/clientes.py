@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import Annotated, List
 from backend.app.entidades.cliente import Customer, CustomerCreate, CustomerDB
@@ -19,6 +19,15 @@ def list_customers(db: Annotated[Session, Depends(get_db)]):
     return db.query(CustomerDB).all()
 
 
+@router.get("/clientes/search", response_model=List[Customer])
+def search_customers(
+    db: Annotated[Session, Depends(get_db)],
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return clientes_service.search_customers(q, limit, db)
+
+
 @router.get("/clientes/get/{customer_id}", response_model=Customer)
 def get_customer(customer_id: int, db: Annotated[Session, Depends(get_db)]):
     return clientes_service.get_customer_or_404(customer_id, db)
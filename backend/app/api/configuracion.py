@@ -5,6 +5,7 @@ from typing import Annotated, Any
 from backend.app.database import get_db
 from backend.app.entidades.configuracion import ConfigDB, ConfigItem
 from backend.app.dependencies import get_current_user
+from backend.app.utils import config_cache, resumen_semanal
 
 router = APIRouter(
     prefix="/config",
@@ -16,6 +17,7 @@ DEFAULTS: dict[str, str] = {
     "tienda_nombre": "FurniGest",
     "logo_empresa": "",
     "firma_email": "",
+    "almacen_codigo_postal": "28001",
     "resumen_email_destino": "",
     "resumen_intervalo_dias": "7",
     "resumen_fecha_inicio": "",
@@ -25,8 +27,7 @@ DEFAULTS: dict[str, str] = {
 
 
 def get_value(db: Session, key: str) -> str:
-    row = db.query(ConfigDB).filter(ConfigDB.key == key).first()
-    return row.value if row and row.value else DEFAULTS.get(key, "")
+    return config_cache.get(db, key, DEFAULTS.get(key, ""))
 
 
 def set_value(db: Session, key: str, value: str) -> None:
@@ -40,11 +41,7 @@ def set_value(db: Session, key: str, value: str) -> None:
 
 @router.get("")
 def read_config(db: Annotated[Session, Depends(get_db)]) -> dict[str, Any]:
-    rows = db.query(ConfigDB).all()
-    result = dict(DEFAULTS)
-    for r in rows:
-        result[r.key] = r.value or ""
-    return result
+    return {**DEFAULTS, **config_cache.values(db)}
 
 
 @router.put(
@@ -56,4 +53,6 @@ def write_config(key: str, item: ConfigItem, db: Annotated[Session, Depends(get_
     if key not in DEFAULTS:
         raise HTTPException(status_code=400, detail=f"Clave desconocida: {key}")
     set_value(db, key, item.value or "")
+    if key.startswith("resumen_"):
+        resumen_semanal.reschedule()
     return ConfigItem(key=key, value=item.value or "")
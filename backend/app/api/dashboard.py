@@ -0,0 +1,27 @@
+from datetime import date
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from backend.app.database import get_db
+from backend.app.dependencies import get_current_user
+from backend.app.services import dashboard_service
+
+router = APIRouter(
+    prefix="/dashboard", tags=["dashboard"], dependencies=[Depends(get_current_user)]
+)
+
+
+@router.get("/summary", responses={400: {"description": "Bad request"}})
+def dashboard_summary(
+    db: Annotated[Session, Depends(get_db)],
+    date_from: Annotated[Optional[date], Query()] = None,
+    date_to: Annotated[Optional[date], Query()] = None,
+):
+    """
+    Dashboard KPIs: balance, income/expense and delivery notes of the period
+    (default: current month) and the previous one, delivery notes by status,
+    warehouse and route counts, open incidents and new customers.
+    """
+    return dashboard_service.summary(db, date_from, date_to)
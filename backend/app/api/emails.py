@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from backend.app.database import get_db
+from backend.app.dependencies import get_current_user
+from backend.app.entidades.email_outbox import EmailOutboxDB
+from backend.app.utils import email_outbox
+
+router = APIRouter(
+    prefix="/emails", tags=["emails"], dependencies=[Depends(get_current_user)]
+)
+
+
+@router.get("/outbox/stats")
+def outbox_stats(db: Annotated[Session, Depends(get_db)]):
+    """Number of queued emails per status (PENDIENTE, ENVIANDO, ENVIADO, FALLIDO)."""
+    return email_outbox.stats(db)
+
+
+@router.get("/outbox/failed")
+def outbox_failed(
+    db: Annotated[Session, Depends(get_db)],
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+):
+    """Dead-lettered emails, most recent first."""
+    rows = (
+        db.query(EmailOutboxDB)
+        .filter(EmailOutboxDB.status == "FALLIDO")
+        .order_by(EmailOutboxDB.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": r.id,
+            "to_email": r.to_email,
+            "subject": r.subject,
+            "attempts": r.attempts,
+            "last_error": r.last_error,
+            "created_at": r.created_at,
+        }
+        for r in rows
+    ]
+
+
+@router.post(
+    "/outbox/{email_id}/retry",
+    responses={
+        404: {"description": "Not found"},
+        409: {"description": "Email not dead-lettered"},
+    },
+)
+def outbox_retry(email_id: int, db: Annotated[Session, Depends(get_db)]):
+    """Puts a dead-lettered email back in the queue with a fresh attempt count."""
+    row = db.get(EmailOutboxDB, email_id)
+    if row is None:
+        raise HTTPException(404, "Email no encontrado")
+    if row.status != "FALLIDO":
+        raise HTTPException(409, f"El email está en estado {row.status}")
+    row.status = "PENDIENTE"
+    row.attempts = 0
+    row.next_attempt_at = datetime.utcnow()
+    db.commit()
+    email_outbox.wake()
+    return {"id": row.id, "status": row.status}
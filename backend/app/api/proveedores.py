@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from backend.app.entidades.proveedor import Supplier, SupplierCreate, SupplierDB
 from backend.app.database import get_db
 from backend.app.dependencies import get_current_user
+from backend.app.utils.product_index import index as product_index
 from typing import Annotated, List
 
 router = APIRouter(dependencies=[Depends(get_current_user)])
@@ -49,6 +50,7 @@ def update_supplier(
         setattr(supplier, key, value)
     db.commit()
     db.refresh(supplier)
+    product_index.rename_supplier(supplier.id, supplier.name)
     return supplier
 
 
@@ -60,6 +62,9 @@ def delete_supplier(supplier_id: int, db: Annotated[Session, Depends(get_db)]):
     supplier = db.query(SupplierDB).filter(SupplierDB.id == supplier_id).first()
     if not supplier:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+    product_ids = [p.id for p in supplier.products]
     db.delete(supplier)
     db.commit()
+    for product_id in product_ids:
+        product_index.remove(product_id)
     return {"message": f"Proveedor {supplier_id} eliminado"}
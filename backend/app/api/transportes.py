@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Annotated, List, Dict, Any
+from typing import Annotated, List, Dict, Any, Optional
 from io import BytesIO
-from datetime import datetime, date
+from datetime import date
 from pydantic import BaseModel
 
 from backend.app.database import get_db
@@ -11,165 +12,19 @@ from backend.app.dependencies import get_current_user
 from backend.app.entidades.albaran import DeliveryNoteDB, DeliveryNote
 from backend.app.entidades.cliente import CustomerDB
 from backend.app.entidades.albaran_ruta import DeliveryNoteRouteDB
-from backend.app.entidades.movimiento import MovementDB
-
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from backend.app.entidades.linea_albaran import DeliveryNoteLineDB
+from backend.app.entidades.movimiento import MovementDB, ROUTE_KINDS
+from backend.app.api.configuracion import get_value as get_cfg
+from backend.app.services import pdf_render_service, routing_service
+from backend.app.utils import codigos_postales
+from backend.app.utils.pdf_cache import row_values
+from backend.app.utils.zip_stream import stream_zip
 
 router = APIRouter(
     prefix="/transporte", tags=["Transporte"], dependencies=[Depends(get_current_user)]
 )
 
 
-def _eur(n: float) -> str:
-    try:
-        return f"{float(n):.2f} €"
-    except (TypeError, ValueError):
-        return "0.00 €"
-
-
-def _fmt_date(value) -> str:
-    if value is None:
-        return "-"
-    if isinstance(value, (datetime, date)):
-        return value.strftime("%d/%m/%Y")
-    return str(value)
-
-
-def generate_route_invoice_pdf(
-    truck_id: int,
-    delivery_notes: List[DeliveryNoteDB],
-    customers_map: Dict[int, CustomerDB],
-) -> bytes:
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        leftMargin=18 * mm,
-        rightMargin=18 * mm,
-        topMargin=26 * mm,
-        bottomMargin=18 * mm,
-        title=f"Factura Ruta Camion {truck_id}",
-        author="Tienda",
-    )
-
-    styles = getSampleStyleSheet()
-    styles.add(
-        ParagraphStyle(
-            name="H1",
-            parent=styles["Heading1"],
-            fontName="Helvetica-Bold",
-            fontSize=16,
-            leading=18,
-            textColor=colors.HexColor("#111827"),
-            spaceAfter=6,
-        )
-    )
-    styles.add(
-        ParagraphStyle(
-            name="Muted",
-            parent=styles["Normal"],
-            fontName="Helvetica",
-            fontSize=9,
-            leading=12,
-            textColor=colors.HexColor("#6B7280"),
-        )
-    )
-    styles.add(
-        ParagraphStyle(
-            name="Body",
-            parent=styles["Normal"],
-            fontName="Helvetica",
-            fontSize=10,
-            leading=14,
-            textColor=colors.HexColor("#111827"),
-        )
-    )
-
-    total = sum(float(a.total or 0) for a in delivery_notes)
-    commission = total * 0.07
-    net_revenue = total - commission
-
-    story = []
-    story.append(Spacer(1, 10))
-    story.append(Paragraph(f"Factura de ruta - Camion {truck_id}", styles["H1"]))
-    story.append(
-        Paragraph(f"Fecha de emision: {_fmt_date(date.today())}", styles["Muted"])
-    )
-    story.append(Spacer(1, 10))
-
-    summary_table = Table(
-        [
-            ["Total albaranes", _eur(total)],
-            ["Comision transportista (7%)", _eur(commission)],
-            ["Importe tienda (Total - 7%)", _eur(net_revenue)],
-        ],
-        colWidths=[90 * mm, 70 * mm],
-    )
-    summary_table.setStyle(
-        TableStyle(
-            [
-                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor("#E5E7EB")),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#F9FAFB")),
-                ("TEXTCOLOR", (0, 0), (-1, -1), colors.HexColor("#111827")),
-                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ("LEFTPADDING", (0, 0), (-1, -1), 10),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 10),
-                ("TOPPADDING", (0, 0), (-1, -1), 8),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                ("LINEBELOW", (0, 0), (-1, 0), 1, colors.HexColor("#E5E7EB")),
-            ]
-        )
-    )
-    story.append(summary_table)
-    story.append(Spacer(1, 14))
-
-    data = [["Albaran", "Fecha", "Cliente", "Total"]]
-    for a in delivery_notes:
-        c = customers_map.get(a.customer_id)
-        customer_label = (
-            "-"
-            if not c
-            else f"{(c.name or '').strip()} {(c.surnames or '').strip()}".strip()
-            or f"Cliente #{a.customer_id}"
-        )
-        data.append([f"#{a.id}", _fmt_date(a.date), customer_label, _eur(a.total or 0)])
-
-    tbl = Table(data, colWidths=[22 * mm, 28 * mm, 92 * mm, 28 * mm])
-    tbl.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#111827")),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("FONTSIZE", (0, 0), (-1, 0), 9),
-                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor("#E5E7EB")),
-                ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
-                ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-                ("FONTSIZE", (0, 1), (-1, -1), 9),
-                ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111827")),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("ALIGN", (3, 1), (3, -1), "RIGHT"),
-                ("LEFTPADDING", (0, 0), (-1, -1), 8),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-                ("TOPPADDING", (0, 0), (-1, -1), 6),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-            ]
-        )
-    )
-    story.append(tbl)
-    story.append(Spacer(1, 10))
-    story.append(Paragraph("Documento generado automaticamente.", styles["Muted"]))
-
-    doc.build(story)
-    return buf.getvalue()
-
-
 @router.get("/rutas")
 def get_routes(db: Annotated[Session, Depends(get_db)]) -> Dict[str, Any]:
     """
@@ -225,6 +80,16 @@ class PendingBody(BaseModel):
     albaran_ids: List[int]
 
 
+class OptimizeRoutesBody(BaseModel):
+    # None: every delivery note in ALMACEN or RUTA
+    albaran_ids: Optional[List[int]] = None
+    # Units (sum of line quantities) a truck can carry
+    capacidad: int = 20
+    max_camiones: Optional[int] = None
+    # Warehouse postal code; defaults to the almacen_codigo_postal setting
+    origen_cp: Optional[str] = None
+
+
 class SettleTruckOut(BaseModel):
     ok: bool
     camion_id: int
@@ -289,6 +154,123 @@ def assign_route(body: AssignRouteBody, db: Annotated[Session, Depends(get_db)])
     return {"ok": True, "camion_id": body.camion_id, "n": len(delivery_notes)}
 
 
+@router.post(
+    "/rutas/optimizar",
+    responses={400: {"description": "Bad request"}, 404: {"description": "Not found"}},
+)
+def optimize_routes(
+    body: OptimizeRoutesBody, db: Annotated[Session, Depends(get_db)]
+) -> Dict[str, Any]:
+    """
+    Proposes truck assignments and visit order for ALMACEN/RUTA delivery
+    notes (capacitated VRP: savings + 2-opt, see routing_service). Stops are
+    placed by the customer's postal code; notes that cannot be located are
+    returned in 'sin_ubicacion'. Nothing is saved: the plan can be applied
+    with /ruta/asignar, one call per truck.
+    """
+    if body.capacidad <= 0:
+        raise HTTPException(status_code=400, detail="capacidad debe ser > 0")
+    if body.max_camiones is not None and body.max_camiones <= 0:
+        raise HTTPException(status_code=400, detail="max_camiones debe ser > 0")
+
+    origin_cp = codigos_postales.normalize(
+        body.origen_cp or get_cfg(db, "almacen_codigo_postal")
+    )
+    origin = codigos_postales.locate(origin_cp)
+    if origin is None:
+        raise HTTPException(
+            status_code=400, detail="Codigo postal de origen desconocido"
+        )
+
+    query = db.query(DeliveryNoteDB, CustomerDB).outerjoin(
+        CustomerDB, CustomerDB.id == DeliveryNoteDB.customer_id
+    )
+    if body.albaran_ids is not None:
+        if not body.albaran_ids:
+            raise HTTPException(status_code=400, detail=_EMPTY_IDS_ERROR)
+        rows = query.filter(DeliveryNoteDB.id.in_(body.albaran_ids)).all()
+        found_ids = {dn.id for dn, _ in rows}
+        missing = [i for i in body.albaran_ids if i not in found_ids]
+        if missing:
+            raise HTTPException(
+                status_code=404, detail=f"No existen albaranes: {missing}"
+            )
+        invalid = [dn.id for dn, _ in rows if dn.status not in ("ALMACEN", "RUTA")]
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"No se pueden planificar (no estan en ALMACEN/RUTA): {invalid}",
+            )
+    else:
+        rows = query.filter(DeliveryNoteDB.status.in_(("ALMACEN", "RUTA"))).all()
+    rows.sort(key=lambda row: row[0].id)
+
+    units = dict(
+        db.query(
+            DeliveryNoteLineDB.delivery_note_id, func.sum(DeliveryNoteLineDB.quantity)
+        )
+        .filter(DeliveryNoteLineDB.delivery_note_id.in_([dn.id for dn, _ in rows]))
+        .group_by(DeliveryNoteLineDB.delivery_note_id)
+        .all()
+    )
+
+    stops: List[Dict[str, Any]] = []
+    unlocated: List[int] = []
+    for dn, customer in rows:
+        coords = codigos_postales.locate(customer.postal_code if customer else None)
+        if coords is None:
+            unlocated.append(dn.id)
+            continue
+        stops.append(
+            {
+                "albaran_id": dn.id,
+                "cliente_id": dn.customer_id,
+                "cliente": f"{customer.name or ''} {customer.surnames or ''}".strip(),
+                "calle": " ".join(
+                    p for p in (customer.street, customer.house_number) if p
+                ),
+                "ciudad": customer.city,
+                "codigo_postal": customer.postal_code,
+                "carga": int(units.get(dn.id) or 0),
+                "lat": coords[0],
+                "lon": coords[1],
+            }
+        )
+
+    plan = routing_service.plan_routes(
+        origin,
+        [(s["lat"], s["lon"]) for s in stops],
+        [s["carga"] for s in stops],
+        body.capacidad,
+    )
+    if body.max_camiones is not None and len(plan) > body.max_camiones:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Hacen falta {len(plan)} camiones de capacidad {body.capacidad}; "
+                f"hay {body.max_camiones}"
+            ),
+        )
+
+    trucks = [
+        {
+            "camion_id": n,
+            "carga": sum(stops[k]["carga"] for k in route),
+            "distancia_km": round(km, 1),
+            "paradas": [{"orden": i, **stops[k]} for i, k in enumerate(route, 1)],
+        }
+        for n, (route, km) in enumerate(plan, 1)
+    ]
+    return {
+        "origen": {"codigo_postal": origin_cp, "lat": origin[0], "lon": origin[1]},
+        "capacidad": body.capacidad,
+        "n_camiones": len(trucks),
+        "distancia_total_km": round(sum(km for _, km in plan), 1),
+        "camiones": trucks,
+        "sin_ubicacion": unlocated,
+    }
+
+
 @router.post(
     "/ruta/quitar",
     responses={400: {"description": "Bad request"}, 404: {"description": "Not found"}},
@@ -317,25 +299,22 @@ def remove_route(body: RemoveRouteBody, db: Annotated[Session, Depends(get_db)])
     )
     truck_ids_affected = {r.truck_id for r in route_entries if r.truck_id is not None}
 
-    # For each affected truck, check if settlement movements exist and delete them
+    # Affected trucks that were already settled lose their settlement movements
     trucks_with_movements: set[int] = set()
-    for truck_id in truck_ids_affected:
-        egreso_prefix = f"Transporte camion {truck_id}"
-        ingreso_prefix = f"Ingreso ruta camion {truck_id}"
-        deleted_egreso = (
-            db.query(MovementDB)
+    if truck_ids_affected:
+        trucks_with_movements = {
+            tid
+            for (tid,) in db.query(MovementDB.truck_id)
             .filter(
-                MovementDB.type == "EGRESO",
-                MovementDB.description.like(f"{egreso_prefix}%"),
+                MovementDB.truck_id.in_(truck_ids_affected),
+                MovementDB.kind == "TRANSPORTE",
             )
-            .delete(synchronize_session=False)
-        )
+            .distinct()
+        }
         db.query(MovementDB).filter(
-            MovementDB.type == "INGRESO",
-            MovementDB.description.like(f"{ingreso_prefix}%"),
+            MovementDB.truck_id.in_(truck_ids_affected),
+            MovementDB.kind.in_(ROUTE_KINDS),
         ).delete(synchronize_session=False)
-        if deleted_egreso:
-            trucks_with_movements.add(truck_id)
 
     for a in delivery_notes:
         a.status = "ALMACEN"
@@ -380,6 +359,8 @@ def remove_route(body: RemoveRouteBody, db: Annotated[Session, Depends(get_db)])
                 ),
                 amount=float(amount_egreso),
                 type="EGRESO",
+                truck_id=truck_id,
+                kind="TRANSPORTE",
             )
         )
         db.add(
@@ -391,6 +372,8 @@ def remove_route(body: RemoveRouteBody, db: Annotated[Session, Depends(get_db)])
                 ),
                 amount=float(ingreso_amount),
                 type="INGRESO",
+                truck_id=truck_id,
+                kind="INGRESO_RUTA",
             )
         )
         db.commit()
@@ -478,12 +461,8 @@ def settle_truck(truck_id: int, db: Annotated[Session, Depends(get_db)]):
     # Always delete previous movements for this truck and recreate fresh ones.
     # This avoids reusing stale movements from old routes on the same truck.
     db.query(MovementDB).filter(
-        MovementDB.type == "EGRESO",
-        MovementDB.description.like(f"{egreso_prefix}%"),
-    ).delete(synchronize_session=False)
-    db.query(MovementDB).filter(
-        MovementDB.type == "INGRESO",
-        MovementDB.description.like(f"{ingreso_prefix}%"),
+        MovementDB.truck_id == truck_id,
+        MovementDB.kind.in_(ROUTE_KINDS),
     ).delete(synchronize_session=False)
     db.flush()
 
@@ -493,6 +472,8 @@ def settle_truck(truck_id: int, db: Annotated[Session, Depends(get_db)]):
         description=f"{egreso_prefix} (7% de {base_total:.2f} € - {pedidos_str})",
         amount=float(amount),
         type="EGRESO",
+        truck_id=truck_id,
+        kind="TRANSPORTE",
     )
     db.add(mov)
     db.flush()
@@ -511,6 +492,8 @@ def settle_truck(truck_id: int, db: Annotated[Session, Depends(get_db)]):
             ),
             amount=float(ingreso_amount),
             type="INGRESO",
+            truck_id=truck_id,
+            kind="INGRESO_RUTA",
         )
     )
     db.commit()
@@ -526,6 +509,19 @@ def settle_truck(truck_id: int, db: Annotated[Session, Depends(get_db)]):
     )
 
 
+def _route_invoice_document(
+    truck_id: int,
+    delivery_notes: List[DeliveryNoteDB],
+    customers: List[CustomerDB],
+) -> Dict[str, Any]:
+    """Plain-data description of a route invoice for pdf_render_service."""
+    return {
+        "truck_id": truck_id,
+        "albaranes": [row_values(a) for a in delivery_notes],
+        "clientes": {c.id: row_values(c) for c in customers},
+    }
+
+
 @router.get(
     "/ruta/{truck_id}/factura",
     responses={
@@ -560,9 +556,10 @@ def get_route_invoice(truck_id: int, db: Annotated[Session, Depends(get_db)]):
         if customer_ids
         else []
     )
-    customers_map = {c.id: c for c in customers}
 
-    pdf_bytes = generate_route_invoice_pdf(truck_id, delivery_notes, customers_map)
+    pdf_bytes = pdf_render_service.render(
+        "factura_ruta", **_route_invoice_document(truck_id, delivery_notes, customers)
+    )
 
     return StreamingResponse(
         BytesIO(pdf_bytes),
@@ -571,3 +568,60 @@ def get_route_invoice(truck_id: int, db: Annotated[Session, Depends(get_db)]):
             "Content-Disposition": f"attachment; filename=factura_camion_{truck_id}.pdf"
         },
     )
+
+
+@router.get(
+    "/rutas/facturas.zip",
+    responses={404: {"description": "Not found"}},
+)
+def get_all_route_invoices(db: Annotated[Session, Depends(get_db)]):
+    """
+    Route invoices of every truck with RUTA delivery notes, as one ZIP.
+    Notes and customers come from a single query; the PDFs render in
+    parallel and each one is streamed as soon as it is ready.
+    """
+    rows = (
+        db.query(DeliveryNoteDB, DeliveryNoteRouteDB.truck_id, CustomerDB)
+        .join(
+            DeliveryNoteRouteDB,
+            DeliveryNoteRouteDB.delivery_note_id == DeliveryNoteDB.id,
+        )
+        .outerjoin(CustomerDB, CustomerDB.id == DeliveryNoteDB.customer_id)
+        .filter(DeliveryNoteDB.status == "RUTA")
+        .order_by(DeliveryNoteRouteDB.truck_id.asc(), DeliveryNoteDB.id.asc())
+        .all()
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="No hay albaranes en ruta.")
+
+    notes_by_truck: Dict[int, List[DeliveryNoteDB]] = {}
+    customers_by_truck: Dict[int, Dict[int, CustomerDB]] = {}
+    for dn, truck_id, customer in rows:
+        notes_by_truck.setdefault(int(truck_id), []).append(dn)
+        if customer is not None:
+            customers_by_truck.setdefault(int(truck_id), {})[customer.id] = customer
+
+    # Built now: the session is closed by the time the body is streamed
+    documents = [
+        (
+            f"factura_camion_{truck_id}.pdf",
+            "factura_ruta",
+            _route_invoice_document(
+                truck_id,
+                notes,
+                list(customers_by_truck.get(truck_id, {}).values()),
+            ),
+        )
+        for truck_id, notes in notes_by_truck.items()
+    ]
+    pdfs = pdf_render_service.service.render_many(documents)
+
+    return StreamingResponse(
+        stream_zip(pdfs),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="facturas_rutas_{date.today().isoformat()}.zip"'
+            )
+        },
+    )
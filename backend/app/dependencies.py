@@ -5,6 +5,7 @@ from typing import Annotated
 from jose import JWTError
 from backend.app.database import get_db
 from backend.app.entidades.usuario import UserDB
+from backend.app.utils import user_cache
 from backend.app.utils.jwt_utils import verify_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -27,7 +28,11 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(UserDB).filter(UserDB.username == username).first()
+    # Detached snapshot: endpoints that modify the user must load it from db
+    user = user_cache.resolve(
+        payload,
+        lambda: db.query(UserDB).filter(UserDB.username == username).first(),
+    )
     if user is None or not user.is_active:
         raise credentials_exception
     return user
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from backend.app.database import Base
 from pydantic import BaseModel
 from datetime import date
 from typing import List, Optional, Literal
 
+from backend.app.entidades.cliente import CustomerCreate
+
 # Internal status values (stored in DB)
 # FIANZA   -> deposit/bond
 # ALMACEN  -> warehouse
@@ -37,6 +39,15 @@ class DeliveryNoteDB(Base):
         cascade="all, delete-orphan",
     )
 
+    # Keyset pagination of the listing: one index per sort key / equality filter,
+    # always ending in id so the (key, id) cursor is unique.
+    __table_args__ = (
+        Index("ix_albaranes_fecha_id", "fecha", "id"),
+        Index("ix_albaranes_total_id", "total", "id"),
+        Index("ix_albaranes_estado_fecha_id", "estado", "fecha", "id"),
+        Index("ix_albaranes_cliente_fecha_id", "cliente_id", "fecha", "id"),
+    )
+
 
 # ---- Pydantic (responses) ----
 class DeliveryNoteItem(BaseModel):
@@ -49,6 +60,21 @@ class DeliveryNoteItem(BaseModel):
         from_attributes = True
 
 
+class DeliveryNoteHeader(BaseModel):
+    """Delivery note without its lines (paginated listing)."""
+
+    id: int
+    date: date
+    description: Optional[str] = None
+    total: float
+    customer_id: int
+    status: DeliveryNoteStatus
+    fianza_pagada: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+
 class DeliveryNote(BaseModel):
     id: int
     date: date
@@ -75,3 +101,20 @@ class DeliveryNoteCreate(BaseModel):
     description: Optional[str] = None
     customer_id: int
     status: DeliveryNoteStatus = "FIANZA"
+
+
+class DeliveryNoteCreateFull(BaseModel):
+    """
+    Full payload for creating a delivery note. Accepts a new customer (object)
+    or an existing customer (customer_id). The deposit_amount field is optional:
+    if not provided, it defaults to 30% of the total.
+    """
+
+    date: date
+    description: Optional[str] = None
+    customer_id: Optional[int] = None
+    customer: Optional[CustomerCreate] = None
+    items: List[DeliveryNoteItemCreate]
+    status: DeliveryNoteStatus = "FIANZA"
+    register_deposit: bool = True
+    deposit_amount: Optional[float] = None
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+import logging
+from sqlalchemy import Column, Integer, String, event, text
 from sqlalchemy.orm import relationship
 from backend.app.database import Base
 from pydantic import BaseModel
@@ -33,6 +34,90 @@ class CustomerDB(Base):
     )
 
 
+# ----------------- Search index -----------------
+# Columns searched by GET /clientes/search (services/clientes_service.py).
+SEARCH_COLUMNS = (
+    "nombre",
+    "apellidos",
+    "dni",
+    "email",
+    "telefono1",
+    "telefono2",
+    "ciudad",
+)
+
+# PostgreSQL: pg_trgm GIN indexes over lower-cased, accent-folded expressions
+# (translate() is immutable, unaccent() is not). The search query repeats
+# these expressions verbatim so the planner can use the indexes.
+_ACCENTS = ("áàäâéèëêíìïîóòöôúùüûñç", "aaaaeeeeiiiioooouuuunc")
+
+
+def _fold(sql: str) -> str:
+    return f"translate(lower({sql}), '{_ACCENTS[0]}', '{_ACCENTS[1]}')"
+
+
+PG_SEARCH_DOCUMENT = _fold(
+    " || ' ' || ".join(f"coalesce({c}, '')" for c in SEARCH_COLUMNS)
+)
+PG_SEARCH_NAME = _fold("nombre || ' ' || apellidos")
+PG_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_busqueda_trgm ON clientes "
+    f"USING gin (({PG_SEARCH_DOCUMENT}) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_nombre_trgm ON clientes "
+    f"USING gin (({PG_SEARCH_NAME}) gin_trgm_ops)",
+)
+
+# SQLite: external-content FTS5 table kept in sync by triggers
+_cols = ", ".join(SEARCH_COLUMNS)
+_new = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+_old = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+SQLITE_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5({_cols}, "
+    "content='clientes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN "
+    f"INSERT INTO clientes_fts(rowid, {_cols}) VALUES (new.id, {_new}); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN "
+    f"INSERT INTO clientes_fts(clientes_fts, rowid, {_cols}) "
+    f"VALUES ('delete', old.id, {_old}); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE ON clientes BEGIN "
+    f"INSERT INTO clientes_fts(clientes_fts, rowid, {_cols}) "
+    f"VALUES ('delete', old.id, {_old}); "
+    f"INSERT INTO clientes_fts(rowid, {_cols}) VALUES (new.id, {_new}); END",
+    "INSERT INTO clientes_fts(clientes_fts) VALUES ('rebuild')",
+)
+
+
+@event.listens_for(CustomerDB.__table__, "after_create")
+def _create_search_index(_target, connection, **_kw) -> None:
+    """create_all() also creates the search index (Alembic: migration cl13nt3s5rch)."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'")
+        ).first()
+        if not exists:
+            for ddl in SQLITE_SEARCH_DDL:
+                connection.execute(text(ddl))
+    elif dialect == "postgresql":
+        # Without privileges for CREATE EXTENSION the search uses plain LIKE
+        try:
+            with connection.begin_nested():
+                for ddl in PG_SEARCH_DDL:
+                    connection.execute(text(ddl))
+        except Exception as e:
+            logging.getLogger("clientes").warning(
+                "[clientes] Índices pg_trgm no creados (%s); búsqueda con LIKE.", e
+            )
+
+
+@event.listens_for(CustomerDB.__table__, "before_drop")
+def _drop_search_index(_target, connection, **_kw) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS clientes_fts"))
+
+
 # ----------------- Pydantic -----------------
 class Customer(BaseModel):
     id: int
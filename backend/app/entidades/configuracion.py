@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
 from backend.app.database import Base
 from pydantic import BaseModel
 from typing import Optional
@@ -10,6 +12,14 @@ class ConfigDB(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String, unique=True, nullable=False, index=True)
     value = Column(Text, nullable=True)
+    # Lets other processes spot changes with a single max() (see config_cache)
+    updated_at = Column(
+        "actualizado",
+        DateTime,
+        nullable=True,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
 
 
 class ConfigItem(BaseModel):
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, Text
+
+from backend.app.database import Base
+
+OUTBOX_STATUSES = ("PENDIENTE", "ENVIANDO", "ENVIADO", "FALLIDO")
+
+
+class EmailOutboxDB(Base):
+    """
+    Outgoing email waiting to be delivered by utils/email_outbox.py.
+
+    PENDIENTE → ENVIANDO (claimed by a worker until `bloqueado_hasta`) →
+    ENVIADO, or back to PENDIENTE with a later `proximo_intento` on a
+    temporary failure. FALLIDO is the dead letter: permanent rejection or
+    EMAIL_MAX_ATTEMPTS exhausted.
+    """
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_estado_proximo", "estado", "proximo_intento"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column("destinatario", String(320), nullable=False)
+    subject = Column("asunto", String(500), nullable=False)
+    html_body = Column("cuerpo_html", Text, nullable=False)
+    # Cleared once the message is sent so delivered PDFs do not pile up
+    attachment = Column("adjunto", LargeBinary, nullable=True)
+    attachment_name = Column("adjunto_nombre", String(255), nullable=True)
+
+    status = Column("estado", String(20), nullable=False, default="PENDIENTE")
+    attempts = Column("intentos", Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        "proximo_intento", DateTime, nullable=False, default=datetime.utcnow
+    )
+    locked_by = Column("bloqueado_por", String(64), nullable=True)
+    locked_until = Column("bloqueado_hasta", DateTime, nullable=True)
+    last_error = Column("ultimo_error", Text, nullable=True)
+    created_at = Column("creado", DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column("enviado", DateTime, nullable=True)
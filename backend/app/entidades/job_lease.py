@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, String
+from backend.app.database import Base
+
+
+class JobLeaseDB(Base):
+    """
+    One row per scheduled job that must run on a single process. Managed by
+    utils/job_lease.py: a worker owns the job until `expira`.
+    """
+
+    __tablename__ = "job_leases"
+
+    name = Column("nombre", String(100), primary_key=True)
+    owner = Column("propietario", String(200), nullable=False)
+    expires_at = Column("expira", DateTime, nullable=False)
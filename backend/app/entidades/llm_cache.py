@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, String, Text
+from backend.app.database import Base
+
+
+class LLMCacheDB(Base):
+    """
+    Cached Groq responses, keyed by the SHA-256 of (model, temperature, messages).
+    Managed by utils/llm_cache.py: entries expire after LLM_CACHE_TTL and the
+    least recently used ones are evicted beyond LLM_CACHE_MAX_ENTRIES.
+    """
+
+    __tablename__ = "llm_cache"
+
+    key = Column("clave", String(64), primary_key=True)
+    model = Column("modelo", String(100), nullable=False)
+    response = Column("respuesta", Text, nullable=False)
+    created_at = Column("creado", DateTime, nullable=False)
+    last_used = Column("ultimo_uso", DateTime, nullable=False, index=True)
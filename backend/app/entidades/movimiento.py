@@ -1,11 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from backend.app.database import Base
 from pydantic import BaseModel
 from datetime import date
-from typing import Literal
+from typing import Literal, Optional
 
 MovementType = Literal["INGRESO", "EGRESO"]
 
+# What a system-generated movement stands for (NULL for manual movements)
+# FIANZA           -> deposit of a delivery note (albaran_id)
+# COBRO            -> outstanding amount charged on delivery (albaran_id)
+# COBRO_TRANSPORTE -> transport fee charged for a delivery note (albaran_id)
+# TRANSPORTE       -> 7% carrier commission of a truck route (camion_id)
+# INGRESO_RUTA     -> store income of a settled truck route (camion_id)
+MovementKind = Literal[
+    "FIANZA", "COBRO", "COBRO_TRANSPORTE", "TRANSPORTE", "INGRESO_RUTA"
+]
+ROUTE_KINDS = ("TRANSPORTE", "INGRESO_RUTA")
+
 
 class MovementDB(Base):
     __tablename__ = "movimientos"
@@ -16,6 +27,21 @@ class MovementDB(Base):
     amount = Column("cantidad", Float)
     type = Column("tipo", String, nullable=False, default="INGRESO")
 
+    # Structured links, so lookups do not have to match the description text
+    delivery_note_id = Column(
+        "albaran_id",
+        Integer,
+        ForeignKey("albaranes.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    truck_id = Column("camion_id", Integer, nullable=True)
+    kind = Column("clase", String(20), nullable=True)
+
+    __table_args__ = (
+        Index("ix_movimientos_albaran_clase", "albaran_id", "clase"),
+        Index("ix_movimientos_camion_clase", "camion_id", "clase"),
+    )
+
 
 class Movement(BaseModel):
     id: int
@@ -23,6 +49,9 @@ class Movement(BaseModel):
     description: str
     amount: float
     type: MovementType
+    delivery_note_id: Optional[int] = None
+    truck_id: Optional[int] = None
+    kind: Optional[MovementKind] = None
 
     class Config:
         from_attributes = True
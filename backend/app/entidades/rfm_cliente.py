@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer
+from backend.app.database import Base
+
+
+class RFMSnapshotDB(Base):
+    """
+    Per-customer RFM aggregates (last order date, number of orders, total spent).
+    Optional snapshot: kept in sync by services/rfm_service.py in the same
+    transaction that writes the delivery notes, and read by the RFM scoring
+    when RFM_SNAPSHOT is enabled. Scores are not stored: recency depends on the
+    reference date and scoring all customers is a vectorized step.
+    """
+
+    __tablename__ = "rfm_clientes"
+
+    customer_id = Column(
+        "cliente_id",
+        Integer,
+        ForeignKey("clientes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    last_date = Column("ultima_fecha", Date, nullable=False)
+    frequency = Column("frecuencia", Integer, nullable=False, default=0)
+    monetary = Column("monetario", Float, nullable=False, default=0.0)
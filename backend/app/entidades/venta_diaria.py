@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Float, Integer
+from backend.app.database import Base
+
+
+class DailySalesDB(Base):
+    """
+    Daily sales rollup (one row per day with delivery notes).
+    Kept in sync by services/ventas_diarias_service.py in the same transaction
+    that writes the delivery notes, so analytics never scan 'albaranes'.
+    """
+
+    __tablename__ = "ventas_diarias"
+
+    day = Column("dia", Date, primary_key=True)
+    orders = Column("pedidos", Integer, nullable=False, default=0)
+    revenue = Column("ingresos", Float, nullable=False, default=0.0)
+    customers = Column("clientes", Integer, nullable=False, default=0)
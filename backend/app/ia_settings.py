@@ -0,0 +1,4 @@
+GROQ_API_KEY = ""
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+REQUEST_TIMEOUT = 60
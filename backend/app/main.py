@@ -19,9 +19,12 @@ from backend.app.api import (
     transportes,
     stripe_payments,
     incidencias,
+    dashboard,
+    emails,
 )
 from backend.app.api import configuracion
-from backend.app.utils.resumen_semanal import job_resumen_semanal
+from backend.app.utils import email_outbox, resumen_semanal
+from backend.app.services import pdf_jobs_service, pdf_render_service, rfm_service
 from backend.app.database import Base, engine, SessionLocal
 from backend.app.seed import _wipe, seed
 
@@ -44,13 +47,22 @@ async def lifespan(app: FastAPI):
                 "Database reset requested via RESET_DATABASE env; database wiped before seeding."
             )
         seed(db)
+    pdf_jobs_service.sweep_stale()
 
     scheduler = BackgroundScheduler(timezone="Europe/Madrid")
-    scheduler.add_job(job_resumen_semanal, CronTrigger(minute="*"))
+    if rfm_service.USE_SNAPSHOT:
+        scheduler.add_job(rfm_service.job_rfm_snapshot, CronTrigger(hour=3, minute=0))
     scheduler.start()
+    resumen_semanal.schedule(scheduler)
+
+    outbox_workers = email_outbox.OutboxWorkerPool()
+    outbox_workers.start()
+    pdf_render_service.service.start()
 
     yield
 
+    pdf_render_service.service.shutdown()
+    outbox_workers.stop()
     scheduler.shutdown(wait=False)
 
 
@@ -90,6 +102,8 @@ app.include_router(transportes.router, prefix="/api")
 app.include_router(stripe_payments.router)
 app.include_router(configuracion.router, prefix="/api")
 app.include_router(incidencias.router, prefix="/api")
+app.include_router(dashboard.router, prefix="/api")
+app.include_router(emails.router, prefix="/api")
 
 
 @app.get("/health")
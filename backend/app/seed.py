@@ -19,6 +19,9 @@ from backend.app.entidades.configuracion import ConfigDB
 from backend.app.entidades.incidencia import IncidenciaDB
 from backend.app.entidades.usuario import UserDB
 from backend.app.entidades.stripe_checkout import StripeCheckoutDB
+from backend.app.entidades.venta_diaria import DailySalesDB
+from backend.app.entidades.rfm_cliente import RFMSnapshotDB
+from backend.app.services import rfm_service, ventas_diarias_service
 from passlib.context import CryptContext
 
 _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -1488,6 +1491,8 @@ def _wipe(db: Session):
     db.query(IncidenciaDB).delete()
     db.query(DeliveryNoteLineDB).delete()
     db.query(DeliveryNoteDB).delete()
+    db.query(DailySalesDB).delete()
+    db.query(RFMSnapshotDB).delete()
     db.query(MovementDB).delete()
     db.query(StripeCheckoutDB).delete()
     db.query(ConfigDB).delete()
@@ -1669,6 +1674,8 @@ def _albaran_movements(
             description=f"Fianza albarán #{alb.id} — {cli.name} {cli.surnames}",
             amount=fianza,
             type="INGRESO",
+            delivery_note_id=alb.id,
+            kind="FIANZA",
         )
     ]
     if estado in ("RUTA", "ENTREGADO"):
@@ -1679,6 +1686,8 @@ def _albaran_movements(
                 description=f"Cobro transporte albarán #{alb.id}",
                 amount=round(random.uniform(35.0, 120.0), 2),
                 type="INGRESO",
+                delivery_note_id=alb.id,
+                kind="COBRO_TRANSPORTE",
             )
         )
     if estado == "ENTREGADO" and pendiente > 0:
@@ -1689,6 +1698,8 @@ def _albaran_movements(
                 description=f"Cobro pendiente albarán #{alb.id} — {cli.name} {cli.surnames}",
                 amount=pendiente,
                 type="INGRESO",
+                delivery_note_id=alb.id,
+                kind="COBRO",
             )
         )
     return movs
@@ -2050,6 +2061,9 @@ def seed(db: Session):
     _insert_orders(db, clients)
     _insert_stripe(db)
     _insert_delivery_routes(db)
+    # Demo orders are inserted directly, bypassing the API: build the rollups.
+    ventas_diarias_service.rebuild(db)
+    rfm_service.rebuild(db)
     log.info(
         "Seed completado: %d proveedores, %d productos, "
         "150 clientes, 400 albaranes, movimientos, pagos Stripe, rutas e incidencias de demostración generados.",
@@ -0,0 +1,170 @@
+"""
+Background generation of the AI narrative reports, separated from the HTTP layer.
+
+start_report() registers a report and returns its id immediately; a small
+thread pool streams the text from Groq (stream=true) into the report, and
+subscribers receive the tokens as Server-Sent Events through sse_events().
+Identical prompts within REPORT_TTL reuse the same report. If Groq is not
+available before the first token, the report is filled with the fallback
+text instead.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+
+from backend.app.utils.groq_llm import groq_chat_stream
+
+log = logging.getLogger("ai_report")
+
+REPORT_TTL = float(os.getenv("AI_REPORT_TTL", "900"))
+MAX_REPORTS = 200
+KEEPALIVE_SECONDS = 15.0
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AI_REPORT_WORKERS", "4")),
+    thread_name_prefix="ai-report",
+)
+
+
+class Report:
+    def __init__(self, report_id: str, key: str):
+        self.id = report_id
+        self.key = key
+        self.created = time.monotonic()
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def status(self) -> str:
+        if not self.done:
+            return "running"
+        return "error" if self.error else "done"
+
+    def expired(self, now: float) -> bool:
+        return now - self.created > REPORT_TTL
+
+    def _notify(self) -> None:
+        for loop, event in list(self._subscribers):
+            loop.call_soon_threadsafe(event.set)
+
+    def append(self, chunk: str) -> None:
+        with self._lock:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.error = error
+            self.done = True
+            self._notify()
+
+    def to_dict(self) -> dict:
+        return {"report_id": self.id, "status": self.status, "text": self.text}
+
+
+_reports: "OrderedDict[str, Report]" = OrderedDict()
+_by_key: dict[str, str] = {}
+_registry_lock = threading.Lock()
+
+
+def _prune(now: float) -> None:
+    while _reports:
+        oldest = next(iter(_reports.values()))
+        if not (oldest.expired(now) or len(_reports) > MAX_REPORTS):
+            break
+        _reports.popitem(last=False)
+        if _by_key.get(oldest.key) == oldest.id:
+            del _by_key[oldest.key]
+
+
+def _generate(
+    report: Report, messages: list[dict], fallback: Callable[[], str]
+) -> None:
+    try:
+        for token in groq_chat_stream(messages, temperature=0.2):
+            report.append(token)
+        report.finish()
+    except Exception as e:
+        if report.chunks:
+            log.warning("[ai_report] Stream interrumpido (%s).", e)
+            report.finish(error=str(e))
+            return
+        log.warning("IA no disponible (%s). Usando informe básico.", e)
+        report.append(fallback())
+        report.finish()
+
+
+def start_report(messages: list[dict], fallback: Callable[[], str]) -> Report:
+    """Returns the report for these messages, starting its generation if needed."""
+    key = hashlib.sha256(
+        json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    now = time.monotonic()
+    with _registry_lock:
+        _prune(now)
+        existing = _reports.get(_by_key.get(key, ""))
+        if existing is not None and existing.error is None:
+            return existing
+        report = Report(uuid.uuid4().hex, key)
+        _reports[report.id] = report
+        _by_key[key] = report.id
+    _executor.submit(_generate, report, messages, fallback)
+    return report
+
+
+def get_report(report_id: str) -> Optional[Report]:
+    with _registry_lock:
+        report = _reports.get(report_id)
+    if report is None or report.expired(time.monotonic()):
+        return None
+    return report
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_events(report: Report) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a report: the tokens generated so far, then each new
+    one as it arrives ("token"), and a final "done" event with the full text.
+    Waits on an asyncio.Event set by the worker thread, so no thread is held.
+    """
+    event = asyncio.Event()
+    subscriber = (asyncio.get_running_loop(), event)
+    with report._lock:
+        report._subscribers.add(subscriber)
+    sent = 0
+    try:
+        while True:
+            event.clear()
+            chunks, done = report.chunks[sent:], report.done
+            for chunk in chunks:
+                yield _sse("token", {"text": chunk})
+            sent += len(chunks)
+            if done and sent == len(report.chunks):
+                yield _sse("done", report.to_dict())
+                return
+            try:
+                await asyncio.wait_for(event.wait(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        with report._lock:
+            report._subscribers.discard(subscriber)
@@ -0,0 +1,491 @@
+"""
+Delivery-note pricing, paginated listing and bulk import, separated from the
+HTTP layer.
+
+price_lines() turns the items of an order into line rows using a
+{product_id: price} map; both POST /albaranes/post and the bulk import use it.
+
+list_page() backs GET /albaranes/list: keyset (cursor) pagination over
+(sort key, id), so every page costs the same whatever its position; each sort
+and equality filter is backed by one of the composite indexes declared on
+DeliveryNoteDB.
+
+import_stream() backs POST /albaranes/bulk. The body is parsed as it arrives
+(NDJSON: one order per line; CSV: one line item per row, consecutive rows with
+the same `ref` form one order) and orders are imported in chunks of
+BULK_CHUNK_SIZE. Each chunk validates the rows, resolves its customers with one
+query per key (id, DNI, email) using the same DNI/email upsert rules as a
+single creation, checks products against a price map loaded once per import,
+inserts notes, lines and deposit movements with one bulk statement each and
+commits. Invalid rows are reported and skipped without aborting the import.
+"""
+
+import base64
+import codecs
+import csv
+import json
+import logging
+import os
+from datetime import date
+from typing import AsyncIterator, Literal, NamedTuple, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+
+from backend.app.entidades.albaran import (
+    DeliveryNote,
+    DeliveryNoteCreateFull,
+    DeliveryNoteDB,
+    DeliveryNoteHeader,
+    DeliveryNoteItemCreate,
+    DeliveryNoteStatus,
+)
+from backend.app.entidades.cliente import CustomerCreate, CustomerDB
+from backend.app.entidades.linea_albaran import DeliveryNoteLineDB
+from backend.app.entidades.movimiento import MovementDB
+from backend.app.entidades.producto import ProductDB
+from backend.app.services import rfm_service, ventas_diarias_service
+
+log = logging.getLogger("albaranes")
+
+BULK_CHUNK_SIZE = int(os.getenv("ALBARANES_BULK_CHUNK_SIZE", "500"))
+DEPOSIT_RATE = 0.30
+
+ImportFormat = Literal["ndjson", "csv"]
+ListingSort = Literal["-date", "date", "-total", "total", "-id", "id"]
+
+_SORT_COLUMNS = {
+    "date": DeliveryNoteDB.date,
+    "total": DeliveryNoteDB.total,
+    "id": DeliveryNoteDB.id,
+}
+
+_ORDER_FIELDS = ("date", "description", "status", "deposit_amount", "register_deposit")
+_CUSTOMER_FIELDS = tuple(CustomerCreate.model_fields)
+
+
+def price_lines(
+    items: list[DeliveryNoteItemCreate], prices: dict[int, float]
+) -> tuple[list[dict], float]:
+    """
+    Line rows (without delivery_note_id) and total price of an order. Items
+    without unit_price take the product price; unknown products raise 404.
+    """
+    rows = []
+    total = 0.0
+    for it in items:
+        if it.product_id not in prices:
+            raise HTTPException(404, f"Producto {it.product_id} no existe")
+        unit_price = (
+            it.unit_price if it.unit_price is not None else prices[it.product_id]
+        )
+        rows.append(
+            {
+                "product_id": it.product_id,
+                "quantity": it.quantity,
+                "unit_price": unit_price,
+            }
+        )
+        total += unit_price * it.quantity
+    return rows, round(total, 2)
+
+
+def deposit_for(payload: DeliveryNoteCreateFull, total: float) -> float:
+    if payload.deposit_amount is not None:
+        return float(payload.deposit_amount)
+    return round(total * DEPOSIT_RATE, 2)
+
+
+# ---------- Listing ----------
+def _encode_cursor(field: str, note: DeliveryNoteDB) -> str:
+    key = getattr(note, field)
+    raw = json.dumps([key.isoformat() if isinstance(key, date) else key, note.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, field: str) -> tuple:
+    try:
+        key, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if field == "date":
+            key = date.fromisoformat(key)
+        elif field == "total":
+            key = float(key)
+        else:
+            key = int(key)
+        return key, int(note_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Cursor no válido")
+
+
+def list_page(
+    db: Session,
+    *,
+    statuses: Optional[list[DeliveryNoteStatus]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    customer_id: Optional[int] = None,
+    total_min: Optional[float] = None,
+    total_max: Optional[float] = None,
+    sort: ListingSort = "-date",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_items: bool = False,
+) -> dict:
+    """
+    One page of delivery notes and the cursor of the next one (None at the end).
+    Lines are only returned with include_items, loaded with one selectinload.
+    """
+    q = db.query(DeliveryNoteDB)
+    if statuses:
+        q = q.filter(DeliveryNoteDB.status.in_(statuses))
+    if date_from is not None:
+        q = q.filter(DeliveryNoteDB.date >= date_from)
+    if date_to is not None:
+        q = q.filter(DeliveryNoteDB.date <= date_to)
+    if customer_id is not None:
+        q = q.filter(DeliveryNoteDB.customer_id == customer_id)
+    if total_min is not None:
+        q = q.filter(DeliveryNoteDB.total >= total_min)
+    if total_max is not None:
+        q = q.filter(DeliveryNoteDB.total <= total_max)
+
+    field = sort.lstrip("-")
+    descending = sort.startswith("-")
+    column = _SORT_COLUMNS[field]
+    keys = (column,) if field == "id" else (column, DeliveryNoteDB.id)
+    if cursor:
+        key, note_id = _decode_cursor(cursor, field)
+        after = (key,) if field == "id" else (key, note_id)
+        position = tuple_(*keys) if len(keys) > 1 else keys[0]
+        value = tuple_(*after) if len(after) > 1 else after[0]
+        q = q.filter(position < value if descending else position > value)
+    q = q.order_by(*(k.desc() if descending else k.asc() for k in keys))
+    if include_items:
+        q = q.options(selectinload(DeliveryNoteDB.items))
+
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    model = DeliveryNote if include_items else DeliveryNoteHeader
+    return {
+        "results": [model.model_validate(r) for r in rows],
+        "next_cursor": _encode_cursor(field, rows[-1]) if has_more else None,
+        "limit": limit,
+    }
+
+
+# ---------- Parsing ----------
+class Record(NamedTuple):
+    row: int  # line of the body where the order starts (1-based)
+    ref: Optional[str]
+    data: Optional[dict]
+    error: Optional[str] = None
+
+
+class _NdjsonParser:
+    def __init__(self):
+        self.line = 0
+
+    def feed(self, line: str) -> list[Record]:
+        self.line += 1
+        if not line.strip():
+            return []
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            return [Record(self.line, None, None, f"JSON inválido: {e.msg}")]
+        if not isinstance(data, dict):
+            return [Record(self.line, None, None, "Se esperaba un objeto JSON")]
+        ref = data.pop("ref", None)
+        return [Record(self.line, None if ref is None else str(ref), data)]
+
+    def close(self) -> list[Record]:
+        return []
+
+
+class _CsvParser:
+    """
+    Header row plus one row per line item. Order columns (date, description,
+    status, deposit_amount, register_deposit, customer_id and the customer
+    fields) are read from the first row of each order.
+    """
+
+    def __init__(self):
+        self.line = 0
+        self.header: Optional[list[str]] = None
+        self._buffer = ""
+        self._start = 0
+        self._order: Optional[Record] = None
+
+    def feed(self, line: str) -> list[Record]:
+        self.line += 1
+        if not self._buffer:
+            self._start = self.line
+        self._buffer = f"{self._buffer}\n{line}" if self._buffer else line
+        if self._buffer.count('"') % 2:  # quoted field continues on the next line
+            return []
+        text, self._buffer = self._buffer, ""
+        if not text.strip():
+            return []
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = [h.strip().lower() for h in values]
+            return []
+        row = {k: v.strip() for k, v in zip(self.header, values) if v and v.strip()}
+        ref = row.get("ref")
+        out = []
+        if self._order is not None and (ref is None or ref != self._order.ref):
+            out.append(self._order)
+            self._order = None
+        item = {
+            "product_id": row.get("product_id"),
+            "quantity": row.get("quantity", 1),
+            "unit_price": row.get("unit_price"),
+        }
+        if self._order is None:
+            data = {k: row[k] for k in _ORDER_FIELDS if k in row}
+            if "customer_id" in row:
+                data["customer_id"] = row["customer_id"]
+            else:
+                customer = {k: row[k] for k in _CUSTOMER_FIELDS if k in row}
+                if customer:
+                    data["customer"] = customer
+            data["items"] = []
+            self._order = Record(self._start, ref, data)
+        self._order.data["items"].append(item)
+        if ref is None:
+            out.append(self._order)
+            self._order = None
+        return out
+
+    def close(self) -> list[Record]:
+        out = []
+        if self._buffer:
+            out.append(Record(self._start, None, None, "Comillas sin cerrar"))
+            self._buffer = ""
+        if self._order is not None:
+            out.append(self._order)
+            self._order = None
+        return out
+
+
+# ---------- Import ----------
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+class BulkImporter:
+    """Imports chunks of parsed records and accumulates the report."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.prices = dict(db.query(ProductDB.id, ProductDB.price).all())
+        self.received = 0
+        self.created: list[int] = []
+        self.errors: list[dict] = []
+
+    def _fail(self, record: Record, message: str) -> None:
+        self.errors.append({"row": record.row, "ref": record.ref, "error": message})
+
+    def _validate(
+        self, records: list[Record]
+    ) -> list[tuple[Record, DeliveryNoteCreateFull, list[dict], float]]:
+        valid = []
+        for record in records:
+            self.received += 1
+            if record.error:
+                self._fail(record, record.error)
+                continue
+            try:
+                payload = DeliveryNoteCreateFull.model_validate(record.data)
+            except ValidationError as e:
+                self._fail(record, _validation_message(e))
+                continue
+            if not payload.customer_id and not payload.customer:
+                self._fail(record, "Debes indicar cliente_id o datos de cliente")
+                continue
+            try:
+                rows, total = price_lines(payload.items, self.prices)
+            except HTTPException as e:
+                self._fail(record, e.detail)
+                continue
+            valid.append((record, payload, rows, total))
+        return valid
+
+    def _resolve_customers(
+        self, payloads: list[DeliveryNoteCreateFull]
+    ) -> list[Optional[int]]:
+        """
+        Customer id of every payload (None if customer_id does not exist).
+        Inline customers follow upsert_customer: match by DNI, then by email,
+        update the non-null fields; otherwise create it (once per chunk).
+        """
+        db = self.db
+        ids = {p.customer_id for p in payloads if p.customer_id}
+        existing_ids = (
+            {i for (i,) in db.query(CustomerDB.id).filter(CustomerDB.id.in_(ids))}
+            if ids
+            else set()
+        )
+        inline = [p.customer for p in payloads if not p.customer_id]
+        dnis = {c.dni for c in inline if c.dni}
+        emails = {c.email for c in inline if c.email}
+        by_dni: dict[str, CustomerDB] = {}
+        by_email: dict[str, CustomerDB] = {}
+        if dnis:
+            for c in db.query(CustomerDB).filter(CustomerDB.dni.in_(dnis)):
+                by_dni[c.dni] = c
+        if emails:
+            for c in (
+                db.query(CustomerDB)
+                .filter(CustomerDB.email.in_(emails))
+                .order_by(CustomerDB.id)
+            ):
+                by_email.setdefault(c.email, c)
+
+        resolved: list[CustomerDB | int | None] = []
+        for p in payloads:
+            if p.customer_id:
+                resolved.append(
+                    p.customer_id if p.customer_id in existing_ids else None
+                )
+                continue
+            data = p.customer.model_dump()
+            c = (by_dni.get(p.customer.dni) if p.customer.dni else None) or (
+                by_email.get(p.customer.email) if p.customer.email else None
+            )
+            if c is None:
+                c = CustomerDB(**data)
+                db.add(c)
+            else:
+                for k, v in data.items():
+                    if v is not None:
+                        setattr(c, k, v)
+            if c.dni:
+                by_dni[c.dni] = c
+            if c.email:
+                by_email.setdefault(c.email, c)
+            resolved.append(c)
+        db.flush()
+        return [c.id if isinstance(c, CustomerDB) else c for c in resolved]
+
+    def import_chunk(self, records: list[Record]) -> None:
+        valid = self._validate(records)
+        if not valid:
+            return
+        db = self.db
+        try:
+            customer_ids = self._resolve_customers([v[1] for v in valid])
+            notes, lines, deposits = [], [], []
+            for (record, payload, rows, total), customer_id in zip(valid, customer_ids):
+                if customer_id is None:
+                    self._fail(record, "Cliente no encontrado")
+                    continue
+                deposit = deposit_for(payload, total)
+                notes.append(
+                    (
+                        {
+                            "date": payload.date,
+                            "description": payload.description or "",
+                            "customer_id": customer_id,
+                            "total": total,
+                            "status": payload.status or "FIANZA",
+                            "fianza_pagada": deposit
+                            if payload.register_deposit
+                            else 0.0,
+                        },
+                        rows,
+                        deposit,
+                    )
+                )
+            if not notes:
+                db.commit()
+                return
+            note_ids = db.scalars(
+                insert(DeliveryNoteDB).returning(
+                    DeliveryNoteDB.id, sort_by_parameter_order=True
+                ),
+                [n[0] for n in notes],
+            ).all()
+            for note_id, (note, rows, deposit) in zip(note_ids, notes):
+                lines.extend({**row, "delivery_note_id": note_id} for row in rows)
+                deposits.append(
+                    {
+                        "date": note["date"],
+                        "description": f"Fianza albaran #{note_id}",
+                        "amount": deposit,
+                        "type": "INGRESO",
+                        "delivery_note_id": note_id,
+                        "kind": "FIANZA",
+                    }
+                )
+            if lines:
+                db.execute(insert(DeliveryNoteLineDB), lines)
+            db.execute(insert(MovementDB), deposits)
+            ventas_diarias_service.refresh_days(db, {n[0]["date"] for n in notes})
+            rfm_service.refresh_customers(db, {n[0]["customer_id"] for n in notes})
+            db.commit()
+            self.created.extend(note_ids)
+        except SQLAlchemyError as e:
+            db.rollback()
+            log.exception("[bulk] Error importando bloque: %s", e)
+            failed = {record.row for record, *_ in valid}
+            self.errors = [err for err in self.errors if err["row"] not in failed]
+            for record, *_ in valid:
+                self._fail(record, f"Error de base de datos: {e.__class__.__name__}")
+
+    def report(self) -> dict:
+        return {
+            "received": self.received,
+            "created": len(self.created),
+            "failed": len(self.errors),
+            "delivery_note_ids": self.created,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+        }
+
+
+async def import_stream(
+    db: Session, body: AsyncIterator[bytes], fmt: ImportFormat
+) -> dict:
+    """
+    Parses the request body chunk by chunk and imports every BULK_CHUNK_SIZE
+    orders in a worker thread, so the event loop is never blocked by the DB.
+    """
+    importer = await run_in_threadpool(BulkImporter, db)
+    parser = _CsvParser() if fmt == "csv" else _NdjsonParser()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    batch: list[Record] = []
+
+    async def flush(final: bool = False) -> None:
+        nonlocal batch
+        while len(batch) >= BULK_CHUNK_SIZE or (final and batch):
+            chunk, batch = batch[:BULK_CHUNK_SIZE], batch[BULK_CHUNK_SIZE:]
+            await run_in_threadpool(importer.import_chunk, chunk)
+
+    async for data in body:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            batch.extend(parser.feed(line.rstrip("\r")))
+        await flush()
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        batch.extend(parser.feed(pending.rstrip("\r")))
+    batch.extend(parser.close())
+    await flush(final=True)
+    report = importer.report()
+    log.info(
+        "[bulk] Importación %s: %d recibidos, %d creados, %d errores",
+        fmt,
+        report["received"],
+        report["created"],
+        report["failed"],
+    )
+    return report
@@ -0,0 +1,157 @@
+"""
+Market basket engine (co-purchased product pairs), vectorized with NumPy.
+
+The input is the (delivery note, product) incidence list. Pair supports are
+the off-diagonal entries of X^T X, where X is the sparse basket x product
+incidence matrix. The product is computed in sparse (COO) form: entries are
+sorted by basket and every entry is paired with the k-th following entry of
+the same basket, one vectorized step per k. Products below min_support are
+pruned before pairing (a pair can never be more frequent than its items), so
+the work is proportional to the co-occurrences that can actually qualify.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+SORT_KEYS = ("support", "confidence", "lift")
+# Up to this many possible pairs the counts go to a dense bincount instead of a sort
+_DENSE_PAIRS = 1 << 22
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def _count(codes: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct codes and how many times each appears."""
+    if size <= _DENSE_PAIRS:
+        counts = np.bincount(codes, minlength=size)
+        distinct = np.flatnonzero(counts)
+        return distinct, counts[distinct]
+    codes = np.sort(codes)
+    starts = (
+        np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else codes
+    )
+    return codes[starts], np.diff(np.r_[starts, len(codes)])
+
+
+def _incidence(
+    note_ids: np.ndarray, product_ids: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct products and the deduplicated (basket, column) entries, sorted."""
+    keep = product_ids >= 0
+    note_ids, product_ids = note_ids[keep], product_ids[keep]
+    _, basket = np.unique(note_ids, return_inverse=True)
+    products, col = np.unique(product_ids, return_inverse=True)
+    # One (basket, product) code per entry: a product bought twice in a note counts once
+    n_products = max(1, len(products))
+    codes = _sorted_unique(basket.astype(np.int64) * n_products + col)
+    return products, codes // n_products, codes % n_products
+
+
+def pair_supports(
+    note_ids: Sequence[int],
+    product_ids: Sequence[int],
+    min_support: int = 1,
+) -> dict:
+    """
+    Returns the arrays that describe every pair with support >= min_support:
+    a_id, b_id (a_id < b_id), support, plus the item supports of a and b and
+    the number of baskets. Rows with a negative product id are ignored (notes
+    without lines come from an outer join).
+    """
+    products, basket, col = _incidence(
+        np.asarray(note_ids, dtype=np.int64),
+        np.asarray(product_ids, dtype=np.int64),
+    )
+    n_baskets = int(basket[-1]) + 1 if len(basket) else 0
+    item_support = np.bincount(col, minlength=len(products))
+
+    frequent = item_support[col] >= min_support
+    basket, col = basket[frequent], col[frequent]
+
+    # Position of each entry inside its basket and number of entries after it
+    n = len(basket)
+    starts = np.flatnonzero(np.r_[True, basket[1:] != basket[:-1]]) if n else basket
+    sizes = np.diff(np.r_[starts, n])
+    remaining = np.repeat(sizes, sizes) - (np.arange(n) - np.repeat(starts, sizes) + 1)
+
+    chunks = []
+    idx = np.flatnonzero(remaining >= 1)
+    k = 1
+    while len(idx):
+        # Entries are sorted by product inside the basket, so col[idx] < col[idx + k]
+        chunks.append(col[idx] * len(products) + col[idx + k])
+        k += 1
+        idx = idx[remaining[idx] >= k]
+
+    pair_codes, support = _count(
+        np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64),
+        len(products) ** 2,
+    )
+    ok = support >= min_support
+    pair_codes, support = pair_codes[ok], support[ok]
+    a, b = pair_codes // max(1, len(products)), pair_codes % max(1, len(products))
+    return {
+        "a_id": products[a],
+        "b_id": products[b],
+        "support": support,
+        "support_a": item_support[a],
+        "support_b": item_support[b],
+        "n_baskets": n_baskets,
+    }
+
+
+def basket_pairs(
+    note_ids: Sequence[int],
+    product_ids: Sequence[int],
+    min_support: int = 2,
+    limit: int = 10,
+    sort_by: str = "support",
+) -> list[dict]:
+    """
+    Top-k co-purchased pairs. For each pair A < B:
+      support        notes that contain both products
+      confidence     P(B | A) = support / support(A)   (A -> B)
+      confidence_ba  P(A | B) = support / support(B)   (B -> A)
+      lift           confidence / P(B), the same in both directions
+    Ordered by sort_by ("support", "confidence" or "lift"), ties broken by
+    the remaining keys, all descending.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by debe ser uno de {SORT_KEYS}")
+    p = pair_supports(note_ids, product_ids, min_support)
+    support = p["support"].astype(np.float64)
+    if not len(support) or limit <= 0:
+        return []
+    conf_ab = support / p["support_a"]
+    conf_ba = support / p["support_b"]
+    lift = conf_ab / (p["support_b"] / p["n_baskets"])
+
+    keys = {"support": support, "confidence": conf_ab, "lift": lift}
+    primary = keys[sort_by]
+    if len(primary) > limit:
+        # Top-k preselection by the primary key (keeping ties), then exact sort
+        kth = np.partition(primary, len(primary) - limit)[len(primary) - limit]
+        sel = np.flatnonzero(primary >= kth)
+    else:
+        sel = np.arange(len(primary))
+    secondary = [keys[k][sel] for k in SORT_KEYS if k != sort_by]
+    order = sel[np.lexsort([-s for s in reversed(secondary)] + [-primary[sel]])]
+    order = order[:limit]
+
+    return [
+        {
+            "a_id": int(p["a_id"][i]),
+            "a_name": None,
+            "b_id": int(p["b_id"][i]),
+            "b_name": None,
+            "support": int(p["support"][i]),
+            "confidence": float(conf_ab[i]),
+            "confidence_ba": float(conf_ba[i]),
+            "lift": float(lift[i]),
+        }
+        for i in order
+    ]
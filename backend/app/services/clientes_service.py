@@ -1,9 +1,22 @@
 """Business logic for customers, separated from the HTTP layer."""
 
+from sqlalchemy import func, or_, text
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from backend.app.entidades.cliente import CustomerCreate, CustomerDB
+from backend.app.entidades.albaran import DeliveryNoteDB
+from backend.app.entidades.cliente import (
+    PG_SEARCH_DOCUMENT,
+    PG_SEARCH_NAME,
+    CustomerCreate,
+    CustomerDB,
+)
+from backend.app.services import rfm_service, ventas_diarias_service
+from backend.app.utils.text_search import normalize, tokenize
+
+# Search strategy per engine: "trgm" (PostgreSQL + pg_trgm), "fts" (SQLite
+# FTS5) or "like" (plain scan when neither index is available)
+_search_backends: dict = {}
 
 
 def upsert_customer(payload: CustomerCreate, db: Session) -> CustomerDB:
@@ -51,6 +64,124 @@ def update_customer(
 
 def delete_customer(customer_id: int, db: Session) -> dict:
     db_customer = get_customer_or_404(customer_id, db)
+    # The customer's delivery notes are deleted in cascade: refresh their days.
+    days = [
+        d
+        for (d,) in db.query(DeliveryNoteDB.date)
+        .filter(DeliveryNoteDB.customer_id == customer_id)
+        .distinct()
+    ]
     db.delete(db_customer)
+    ventas_diarias_service.refresh_days(db, days)
+    rfm_service.refresh_customers(db, [customer_id])
     db.commit()
     return {"message": f"Cliente con ID {customer_id} eliminado correctamente"}
+
+
+# ---------- Search ----------
+def _search_backend(db: Session) -> str:
+    bind = db.get_bind()
+    backend = _search_backends.get(bind)
+    if backend is not None:
+        return backend
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        found = db.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first()
+        backend = "trgm" if found else "like"
+    elif dialect == "sqlite":
+        found = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'")
+        ).first()
+        # The FTS table is created with the schema: do not cache its absence
+        if not found:
+            return "like"
+        backend = "fts"
+    else:
+        backend = "like"
+    _search_backends[bind] = backend
+    return backend
+
+
+def _search_trgm(db: Session, q: str, terms: list[str], limit: int):
+    params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+    matches = " AND ".join(
+        f"{PG_SEARCH_DOCUMENT} LIKE :t{i}" for i in range(len(terms))
+    )
+    sql = text(
+        f"""
+        SELECT clientes.* FROM clientes
+        WHERE ({matches}) OR :q <% {PG_SEARCH_NAME}
+        ORDER BY (lower(dni) = :q OR lower(email) = :q) DESC,
+                 {PG_SEARCH_NAME} LIKE :prefix DESC,
+                 word_similarity(:q, {PG_SEARCH_NAME}) DESC,
+                 apellidos, nombre, id
+        LIMIT :limit
+        """
+    )
+    return (
+        db.query(CustomerDB)
+        .from_statement(sql)
+        .params(q=q, prefix=f"{q}%", limit=limit, **params)
+        .all()
+    )
+
+
+def _search_fts(db: Session, q: str, terms: list[str], limit: int):
+    # Every term as a prefix query; weights favour name, surnames and DNI
+    sql = text(
+        """
+        SELECT clientes.* FROM clientes_fts
+        JOIN clientes ON clientes.id = clientes_fts.rowid
+        WHERE clientes_fts MATCH :match
+        ORDER BY (lower(clientes.dni) = :q OR lower(clientes.email) = :q) DESC,
+                 bm25(clientes_fts, 10.0, 8.0, 10.0, 5.0, 3.0, 3.0, 1.0),
+                 clientes.apellidos, clientes.nombre, clientes.id
+        LIMIT :limit
+        """
+    )
+    match = " ".join(f'"{term}"*' for term in terms)
+    return (
+        db.query(CustomerDB)
+        .from_statement(sql)
+        .params(match=match, q=q, limit=limit)
+        .all()
+    )
+
+
+def _search_like(db: Session, terms: list[str], limit: int):
+    columns = (
+        CustomerDB.name,
+        CustomerDB.surnames,
+        CustomerDB.dni,
+        CustomerDB.email,
+        CustomerDB.phone1,
+        CustomerDB.phone2,
+        CustomerDB.city,
+    )
+    query = db.query(CustomerDB)
+    for term in terms:
+        query = query.filter(or_(*(func.lower(c).like(f"%{term}%") for c in columns)))
+    return (
+        query.order_by(CustomerDB.surnames, CustomerDB.name, CustomerDB.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def search_customers(q: str, limit: int, db: Session) -> list[CustomerDB]:
+    """
+    Ranked search over name, surnames, DNI, email, phones and city: pg_trgm on
+    PostgreSQL, FTS5 on SQLite. Exact DNI/email first, then the best matches.
+    """
+    qn = normalize(q).strip()
+    terms = tokenize(qn)
+    if not terms:
+        return []
+    backend = _search_backend(db)
+    if backend == "trgm":
+        return _search_trgm(db, qn, terms, limit)
+    if backend == "fts":
+        return _search_fts(db, qn, terms, limit)
+    return _search_like(db, terms, limit)
@@ -0,0 +1,154 @@
+"""
+Dashboard KPIs computed with a handful of SQL aggregates, separated from the
+HTTP layer.
+
+summary() replaces downloading movements, delivery notes, customers and
+incidents in full to count them in the browser. Results are kept in a short
+TTL cache (DASHBOARD_CACHE_TTL seconds) keyed by the period and the analytics
+data version, so a write to delivery notes or customers is visible on the next
+request and movements/incidents at most TTL seconds later.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+
+from backend.app.entidades.albaran import DeliveryNoteDB
+from backend.app.entidades.cliente import CustomerDB
+from backend.app.entidades.incidencia import IncidenciaDB
+from backend.app.entidades.movimiento import MovementDB
+from backend.app.utils import analytics_cache
+from backend.app.utils.ttl_cache import TTLCache
+
+STATUSES = ("FIANZA", "ALMACEN", "RUTA", "ENTREGADO", "INCIDENCIA")
+
+cache = TTLCache(maxsize=32, ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "30")))
+
+
+def month_range(day: date) -> tuple[date, date]:
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def default_periods(
+    dfrom: Optional[date], dto: Optional[date]
+) -> tuple[tuple[date, date], tuple[date, date]]:
+    """
+    (period, previous period). Without dates: the current calendar month and
+    the previous one; otherwise the given range and the range of the same
+    length right before it. A range that ends before it starts, once the
+    defaults are applied, is a 400.
+    """
+    if dfrom is None and dto is None:
+        current = month_range(date.today())
+        return current, month_range(current[0] - timedelta(days=1))
+    dto = dto or date.today()
+    dfrom = dfrom or dto.replace(day=1)
+    if dfrom > dto:
+        raise HTTPException(400, "date_from no puede ser posterior a date_to")
+    days = (dto - dfrom).days + 1
+    prev_to = dfrom - timedelta(days=1)
+    return (dfrom, dto), (prev_to - timedelta(days=days - 1), prev_to)
+
+
+def _between(column, period: tuple[date, date]):
+    return column.between(period[0], period[1])
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0.0)), 0.0)
+
+
+def _compute(
+    db: Session, period: tuple[date, date], previous: tuple[date, date]
+) -> dict:
+    income = MovementDB.type == "INGRESO"
+    expense = MovementDB.type == "EGRESO"
+    amount = MovementDB.amount
+    mov = db.query(
+        _sum_if(income, amount).label("income_total"),
+        _sum_if(expense, amount).label("expense_total"),
+        _sum_if(income & _between(MovementDB.date, period), amount).label("income"),
+        _sum_if(expense & _between(MovementDB.date, period), amount).label("expense"),
+        _sum_if(income & _between(MovementDB.date, previous), amount).label(
+            "prev_income"
+        ),
+        _sum_if(expense & _between(MovementDB.date, previous), amount).label(
+            "prev_expense"
+        ),
+    ).one()
+
+    by_status = dict.fromkeys(STATUSES, 0)
+    notes_period = notes_previous = 0
+    for status, count, in_period, in_previous in (
+        db.query(
+            DeliveryNoteDB.status,
+            func.count(DeliveryNoteDB.id),
+            _sum_if(_between(DeliveryNoteDB.date, period), 1),
+            _sum_if(_between(DeliveryNoteDB.date, previous), 1),
+        )
+        .group_by(DeliveryNoteDB.status)
+        .all()
+    ):
+        by_status[status] = by_status.get(status, 0) + int(count)
+        notes_period += int(in_period)
+        notes_previous += int(in_previous)
+
+    # New customer = first delivery note inside the period (customers have no
+    # creation date)
+    first_order = (
+        db.query(func.min(DeliveryNoteDB.date).label("first"))
+        .filter(DeliveryNoteDB.customer_id.isnot(None))
+        .group_by(DeliveryNoteDB.customer_id)
+        .subquery()
+    )
+    new_customers, customers_total, open_incidents = db.query(
+        db.query(func.count())
+        .select_from(first_order)
+        .filter(first_order.c.first.between(period[0], period[1]))
+        .scalar_subquery(),
+        db.query(func.count(CustomerDB.id)).scalar_subquery(),
+        db.query(func.count(IncidenciaDB.id)).scalar_subquery(),
+    ).one()
+
+    def money(value) -> float:
+        return round(float(value or 0.0), 2)
+
+    return {
+        "range": {"from": period[0].isoformat(), "to": period[1].isoformat()},
+        "previous_range": {
+            "from": previous[0].isoformat(),
+            "to": previous[1].isoformat(),
+        },
+        "balance": money(mov.income_total - mov.expense_total),
+        "period": {
+            "income": money(mov.income),
+            "expense": money(mov.expense),
+            "net": money(mov.income - mov.expense),
+            "delivery_notes": notes_period,
+            "new_customers": int(new_customers or 0),
+        },
+        "previous": {
+            "income": money(mov.prev_income),
+            "expense": money(mov.prev_expense),
+            "delivery_notes": notes_previous,
+        },
+        "delivery_notes_by_status": by_status,
+        "warehouse": by_status["ALMACEN"],
+        "in_route": by_status["RUTA"],
+        "open_incidents": int(open_incidents or 0),
+        "customers_total": int(customers_total or 0),
+    }
+
+
+def summary(
+    db: Session, dfrom: Optional[date] = None, dto: Optional[date] = None
+) -> dict:
+    period, previous = default_periods(dfrom, dto)
+    key = (period, previous, analytics_cache.data_version())
+    return cache.get_or_compute(key, lambda: _compute(db, period, previous))
@@ -0,0 +1,89 @@
+"""
+Holt's double exponential smoothing for many series at once, vectorized with NumPy.
+
+All series share the same time axis (one row per series, oldest value first).
+The recursion runs once over time, carrying an (n_series, n_grid) array of
+levels and trends: every (alpha, beta) pair of the grid is evaluated for every
+series in the same pass, and each series keeps the pair with the lowest
+one-step-ahead SSE. Intervals are the usual 80% band ±1.28 × RMSE × √h.
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+GRID = np.round(np.arange(0.05, 1.0, 0.05), 2)
+Z_80 = 1.28
+
+
+class HoltResult(NamedTuple):
+    forecast: np.ndarray  # (n_series, n_ahead)
+    lower_80: np.ndarray
+    upper_80: np.ndarray
+    alpha: np.ndarray  # (n_series,)
+    beta: np.ndarray
+    rmse: np.ndarray
+
+
+def holt_batch(
+    series: Sequence[Sequence[float]] | np.ndarray,
+    n_ahead: int,
+    alphas: Optional[Sequence[float]] = None,
+    betas: Optional[Sequence[float]] = None,
+) -> HoltResult:
+    """
+    Forecasts n_ahead steps for every row of `series`. `alphas`/`betas` are the
+    candidate values (defaults: GRID); pass a single value each to use fixed
+    parameters. Negative observations are clipped to 0, and so are forecasts
+    and lower bounds.
+    """
+    y = np.clip(np.atleast_2d(np.asarray(series, dtype=np.float64)), 0.0, None)
+    n_series, n = y.shape
+    a_grid, b_grid = np.meshgrid(
+        np.asarray(GRID if alphas is None else alphas, dtype=np.float64),
+        np.asarray(GRID if betas is None else betas, dtype=np.float64),
+        indexing="ij",
+    )
+    a_grid, b_grid = a_grid.ravel(), b_grid.ravel()
+    horizons = np.arange(1, max(0, n_ahead) + 1)
+
+    if n == 0 or n_series == 0:
+        empty = np.zeros((n_series, len(horizons)))
+        zeros = np.zeros(n_series)
+        return HoltResult(empty, empty, empty, zeros, zeros, zeros)
+    if n == 1:
+        flat = np.repeat(y[:, :1], len(horizons), axis=1)
+        best_a = np.full(n_series, a_grid[0])
+        best_b = np.full(n_series, b_grid[0])
+        return HoltResult(flat, flat, flat, best_a, best_b, np.zeros(n_series))
+
+    # Level = first value, trend = average first difference; shape (series, grid)
+    level = np.repeat(y[:, :1], len(a_grid), axis=1)
+    trend = np.repeat(((y[:, -1] - y[:, 0]) / (n - 1))[:, None], len(a_grid), axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, n):
+        obs = y[:, t : t + 1]
+        one_step = level + trend
+        sse += (obs - one_step) ** 2
+        prev_level = level
+        level = a_grid * obs + (1 - a_grid) * one_step
+        trend = b_grid * (level - prev_level) + (1 - b_grid) * trend
+
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(n_series)
+    level, trend = level[rows, best], trend[rows, best]
+    if n >= 3:
+        rmse = np.sqrt(sse[rows, best] / (n - 1))
+    else:
+        rmse = np.abs(y[:, -1] - y[:, 0])
+
+    forecast = np.clip(level[:, None] + horizons * trend[:, None], 0.0, None)
+    width = Z_80 * rmse[:, None] * np.sqrt(horizons)
+    return HoltResult(
+        forecast,
+        np.clip(forecast - width, 0.0, None),
+        forecast + width,
+        a_grid[best],
+        b_grid[best],
+        rmse,
+    )
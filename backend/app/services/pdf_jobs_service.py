@@ -0,0 +1,145 @@
+"""
+Background PDF export jobs, separated from the HTTP layer.
+
+submit() registers a job and hands the render function to a small worker
+pool; the render function reports progress through a callback and returns the
+PDF bytes, which are stored on disk (PDF_JOBS_DIR) and can be downloaded until
+PDF_JOBS_TTL expires; files left over by an earlier process are removed at
+startup by sweep_stale(). Submitting a key that already has a queued or running
+job returns that job instead of starting another one.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Hashable, Optional
+
+log = logging.getLogger("pdf_jobs")
+
+JOBS_DIR = Path(
+    os.getenv("PDF_JOBS_DIR", os.path.join(tempfile.gettempdir(), "furnigest_pdf_jobs"))
+)
+JOBS_TTL = float(os.getenv("PDF_JOBS_TTL", "3600"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PDF_JOBS_WORKERS", "2")),
+    thread_name_prefix="pdf-job",
+)
+
+Progress = Callable[[int, str], None]
+
+
+class PdfJob:
+    def __init__(self, key: Hashable, filename: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.filename = filename
+        self.status = "queued"
+        self.progress = 0
+        self.stage = "queued"
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    @property
+    def path(self) -> Path:
+        return JOBS_DIR / f"{self.id}.pdf"
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def expired(self, now: float) -> bool:
+        return self.finished is not None and now - self.finished > JOBS_TTL
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "filename": self.filename,
+            "error": self.error,
+            "expires_in": (
+                max(0, int(self.finished + JOBS_TTL - time.time()))
+                if self.finished is not None and self.status == "done"
+                else None
+            ),
+        }
+
+
+_jobs: dict[str, PdfJob] = {}
+_lock = threading.Lock()
+
+
+def _prune(now: float) -> None:
+    for job_id in [j.id for j in _jobs.values() if j.expired(now)]:
+        job = _jobs.pop(job_id)
+        job.path.unlink(missing_ok=True)
+
+
+def _run(job: PdfJob, render: Callable[[Progress], bytes]) -> None:
+    def progress(pct: int, stage: str) -> None:
+        job.progress, job.stage = pct, stage
+
+    job.status = "running"
+    try:
+        data = render(progress)
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = job.path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, job.path)
+    except Exception as exc:
+        log.exception("[pdf_jobs] Error generando %s: %s", job.filename, exc)
+        job.finished = time.time()
+        job.status, job.stage, job.error = "error", "error", str(exc)
+    else:
+        # finished goes first: a poll that sees "done" also gets expires_in
+        job.progress, job.stage = 100, "done"
+        job.finished = time.time()
+        job.status = "done"
+
+
+def sweep_stale() -> int:
+    """
+    Deletes job files older than JOBS_TTL left by earlier processes, whose
+    in-memory registry is gone. Returns how many were removed.
+    """
+    cutoff = time.time() - JOBS_TTL
+    removed = 0
+    for path in [*JOBS_DIR.glob("*.pdf"), *JOBS_DIR.glob("*.tmp")]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        log.info("[pdf_jobs] %d PDFs caducados eliminados de %s", removed, JOBS_DIR)
+    return removed
+
+
+def submit(
+    key: Hashable, filename: str, render: Callable[[Progress], bytes]
+) -> tuple[PdfJob, bool]:
+    """Returns (job, created). An active job with the same key is reused."""
+    with _lock:
+        _prune(time.time())
+        for job in _jobs.values():
+            if job.key == key and job.active:
+                return job, False
+        job = PdfJob(key, filename)
+        _jobs[job.id] = job
+    _executor.submit(_run, job, render)
+    return job, True
+
+
+def get(job_id: str) -> Optional[PdfJob]:
+    with _lock:
+        _prune(time.time())
+        return _jobs.get(job_id)
@@ -0,0 +1,258 @@
+"""
+ReportLab rendering in a pool of worker processes.
+
+Building a PDF is pure-Python CPU work: on the API threadpool it holds the GIL
+and every other request waits while it runs. render() instead ships a plain,
+picklable description of the document (dicts, lists, dates, bytes; never ORM
+rows or sessions) to a ProcessPoolExecutor and blocks only the calling thread.
+
+Workers are spawned at startup and warmed up (ReportLab modules, the sample
+stylesheet and standard font metrics), so the first real render does not pay
+for them. At most PDF_RENDER_MAX_PENDING renders are queued or running; a
+caller that cannot get a slot within PDF_RENDER_QUEUE_WAIT seconds gets a 503
+with Retry-After instead of piling up more work. Background callers pass
+block=True and wait for a slot instead.
+
+PDF_RENDER_WORKERS=0 renders inline in the calling thread (used by the tests).
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Optional
+
+from fastapi import HTTPException
+
+from backend.app.utils.albaran_pdf import generate_delivery_note_pdf
+from backend.app.utils.factura_ruta_pdf import generate_route_invoice_pdf
+from backend.app.utils.tendencias_pdf import generar_pdf_tendencias
+
+log = logging.getLogger("pdf_render")
+
+WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", str(max(1, WORKERS) * 4)))
+QUEUE_WAIT_SECONDS = float(os.getenv("PDF_RENDER_QUEUE_WAIT", "2"))
+TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT", "120"))
+RETRY_AFTER_SECONDS = 5
+
+
+class RenderQueueFull(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Generador de PDF saturado, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+
+def _ns(values: Optional[dict]) -> Optional[SimpleNamespace]:
+    return SimpleNamespace(**values) if values is not None else None
+
+
+# ── Renderers (run in the worker processes) ──────────────────────────────────
+def _render_albaran(
+    albaran: dict,
+    cliente: Optional[dict],
+    lineas: list,
+    tienda_nombre: str = "FurniGest",
+    logo_bytes: Optional[bytes] = None,
+) -> bytes:
+    return generate_delivery_note_pdf(
+        _ns(albaran),
+        _ns(cliente),
+        lineas,
+        tienda_nombre=tienda_nombre,
+        logo_bytes=logo_bytes,
+    )
+
+
+def _render_tendencias(**kwargs) -> bytes:
+    return generar_pdf_tendencias(**kwargs).getvalue()
+
+
+def _render_factura_ruta(truck_id: int, albaranes: list, clientes: dict) -> bytes:
+    return generate_route_invoice_pdf(
+        truck_id,
+        [_ns(a) for a in albaranes],
+        {int(cid): _ns(c) for cid, c in clientes.items()},
+    )
+
+
+RENDERERS = {
+    "albaran": _render_albaran,
+    "tendencias": _render_tendencias,
+    "factura_ruta": _render_factura_ruta,
+}
+
+
+def render_document(kind: str, document: dict) -> bytes:
+    return RENDERERS[kind](**document)
+
+
+def _warm_up() -> None:
+    """Worker initializer: loads styles and font metrics with a throwaway render."""
+    render_document(
+        "factura_ruta",
+        {"truck_id": 0, "albaranes": [], "clientes": {}},
+    )
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+# ── Pool ─────────────────────────────────────────────────────────────────────
+class RenderService:
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.rendered = 0
+        self.rejected = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: no copy of the API's threads, locks or DB connections
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+        # The pool spawns lazily; one task per worker starts them all now
+        for _ in range(self.workers):
+            executor.submit(_ready)
+        return executor
+
+    def start(self) -> None:
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._executor = self._new_executor()
+        log.info("[pdf_render] %d procesos de render arrancados", self.workers)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return
+            log.error("[pdf_render] Un proceso de render murió; se recrea el pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    def submit(self, kind: str, document: dict, block: bool = False) -> Future:
+        """Queues one render; without workers it runs now and the future is done."""
+        if kind not in RENDERERS:
+            raise ValueError(f"Tipo de documento desconocido: {kind}")
+        executor = self._executor
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(render_document(kind, document))
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                self.rendered += 1
+            return future
+
+        if not self._slots.acquire(timeout=None if block else QUEUE_WAIT_SECONDS):
+            self.rejected += 1
+            log.warning("[pdf_render] Cola llena, se rechaza un PDF %s", kind)
+            raise RenderQueueFull()
+        with self._lock:
+            self._pending += 1
+        try:
+            try:
+                future = executor.submit(render_document, kind, document)
+            except BrokenProcessPool:
+                self._restart(executor)
+                future = self._executor.submit(render_document, kind, document)
+        except BaseException:
+            self._done(None)
+            raise
+        # The slot is held until the worker finishes, even if nobody waits
+        future.add_done_callback(self._done)
+        return future
+
+    def _result(self, future: Future) -> bytes:
+        try:
+            return future.result(timeout=TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            if self._executor is not None:
+                self._restart(self._executor)
+            raise
+
+    def render(self, kind: str, document: dict, block: bool = False) -> bytes:
+        return self._result(self.submit(kind, document, block))
+
+    def render_many(
+        self, documents: Iterable[tuple], window: Optional[int] = None
+    ) -> Iterator[tuple]:
+        """
+        Renders (key, kind, document) items in parallel and yields (key, pdf)
+        in completion order. The first item is submitted right away, so a
+        saturated pool raises RenderQueueFull before anything is yielded; the
+        rest wait for a slot. At most `window` renders (default: one per
+        worker) are in flight, so finished PDFs never pile up in memory.
+        """
+        items = iter(documents)
+        in_flight: dict[Future, object] = {}
+        first = next(items, None)
+        if first is not None:
+            key, kind, document = first
+            in_flight[self.submit(kind, document)] = key
+        return self._completed(items, in_flight, window or max(1, self.workers))
+
+    def _completed(
+        self, items: Iterator[tuple], in_flight: dict, window: int
+    ) -> Iterator[tuple]:
+        try:
+            while True:
+                for key, kind, document in islice(items, window - len(in_flight)):
+                    in_flight[self.submit(kind, document, block=True)] = key
+                if not in_flight:
+                    return
+                done, _ = wait(
+                    in_flight, timeout=TIMEOUT_SECONDS, return_when=FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError("Render de PDF sin respuesta")
+                for future in done:
+                    yield in_flight.pop(future), self._result(future)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _done(self, future: Optional[Future]) -> None:
+        ok = future is not None and not future.cancelled() and not future.exception()
+        with self._lock:
+            self._pending -= 1
+            self.rendered += ok
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+        }
+
+
+service = RenderService()
+
+
+def render(kind: str, block: bool = False, **document) -> bytes:
+    """Renders a document of `kind` ("albaran", "tendencias", "factura_ruta")."""
+    return service.render(kind, document, block=block)
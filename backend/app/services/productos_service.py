@@ -1,17 +1,22 @@
 """Business logic for products, separated from the HTTP layer."""
 
-import unicodedata
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 
 from backend.app.entidades.producto import ProductCreate, ProductDB
+from backend.app.utils.product_index import index
 
 
-def _norm(s: str) -> str:
-    s = s or ""
-    nfkd = unicodedata.normalize("NFD", s)
-    return "".join(ch for ch in nfkd if not unicodedata.combining(ch)).lower()
+def _index(product: ProductDB) -> None:
+    supplier = product.supplier
+    index.upsert(
+        product.id,
+        product.name,
+        product.description,
+        product.supplier_id,
+        supplier.name if supplier is not None else None,
+    )
 
 
 def get_product_or_404(product_id: int, db: Session) -> ProductDB:
@@ -26,6 +31,7 @@ def create_product(payload: ProductCreate, db: Session) -> ProductDB:
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    _index(db_product)
     return db_product
 
 
@@ -35,6 +41,7 @@ def update_product(product_id: int, payload: ProductCreate, db: Session) -> Prod
         setattr(product, key, value)
     db.commit()
     db.refresh(product)
+    _index(product)
     return product
 
 
@@ -43,6 +50,7 @@ def delete_product(product_id: int, db: Session) -> dict:
     try:
         db.delete(product)
         db.commit()
+        index.remove(product_id)
         return {"message": f"Producto {product_id} eliminado"}
     except IntegrityError:
         db.rollback()
@@ -53,6 +61,10 @@ def delete_product(product_id: int, db: Session) -> dict:
 
 
 def search_products(q: str, limit: int, db: Session) -> list[ProductDB]:
-    qn = _norm(q)
-    products = db.query(ProductDB).all()
-    return [p for p in products if qn in _norm(p.name)][:limit]
+    """Accent-insensitive search over name, description and supplier, best match first."""
+    index.ensure(db)
+    ids = index.search(q, limit)
+    if not ids:
+        return []
+    found = {p.id: p for p in db.query(ProductDB).filter(ProductDB.id.in_(ids))}
+    return [found[i] for i in ids if i in found]
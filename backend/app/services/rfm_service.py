@@ -0,0 +1,223 @@
+"""
+RFM customer segmentation (recency, frequency, monetary), vectorized with NumPy.
+
+The per-customer aggregates come from one grouped query over 'albaranes' or,
+when RFM_SNAPSHOT is enabled, from the rfm_clientes snapshot table. Quartile
+cut points are computed once and every customer is scored in one batch with
+np.searchsorted; segments are assigned with np.select from an ordered list of
+rules (the first matching rule wins).
+
+The snapshot is maintained like the daily sales rollup: every write that
+changes the delivery notes of a customer must call refresh_customers() before
+committing. rebuild() recomputes the whole table and can be run as
+
+    python -m backend.app.services.rfm_service
+"""
+
+import logging
+import os
+from datetime import date
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend.app.entidades.albaran import DeliveryNoteDB
+from backend.app.entidades.rfm_cliente import RFMSnapshotDB
+
+log = logging.getLogger("rfm")
+
+USE_SNAPSHOT = os.getenv("RFM_SNAPSHOT", "false").lower() in ("1", "true", "yes")
+
+
+class SegmentRule(NamedTuple):
+    """Segment assigned when the R, F and M scores (1-4) fall in the given ranges."""
+
+    segment: str
+    r: tuple[int, int] = (1, 4)
+    f: tuple[int, int] = (1, 4)
+    m: tuple[int, int] = (1, 4)
+
+
+DEFAULT_RULES: tuple[SegmentRule, ...] = (
+    SegmentRule("VIP", r=(3, 4), f=(4, 4), m=(4, 4)),
+    SegmentRule("En crecimiento", f=(3, 4), m=(3, 4)),
+    SegmentRule("En riesgo", r=(1, 1), f=(1, 2)),
+)
+DEFAULT_SEGMENT = "Ocasional"
+
+
+# ---------- Aggregates ----------
+def _aggregate_query(db: Session):
+    return db.query(
+        DeliveryNoteDB.customer_id.label("customer_id"),
+        func.max(DeliveryNoteDB.date).label("last_date"),
+        func.count(DeliveryNoteDB.id).label("frequency"),
+        func.coalesce(func.sum(DeliveryNoteDB.total), 0.0).label("monetary"),
+    ).filter(DeliveryNoteDB.customer_id.isnot(None))
+
+
+def _aggregates(db: Session, ref_date: date, use_snapshot: bool) -> list:
+    if use_snapshot:
+        # The snapshot covers every delivery note: only valid if none is after ref_date
+        latest = db.query(func.max(RFMSnapshotDB.last_date)).scalar()
+        if latest is not None and latest <= ref_date:
+            return db.query(
+                RFMSnapshotDB.customer_id,
+                RFMSnapshotDB.last_date,
+                RFMSnapshotDB.frequency,
+                RFMSnapshotDB.monetary,
+            ).all()
+    return (
+        _aggregate_query(db)
+        .filter(DeliveryNoteDB.date <= ref_date)
+        .group_by(DeliveryNoteDB.customer_id)
+        .all()
+    )
+
+
+def refresh_customers(db: Session, customer_ids: Iterable[Optional[int]]) -> None:
+    """
+    Recomputes the snapshot rows of the given customers.
+    Does not commit: the caller commits together with its own changes.
+    """
+    affected = {c for c in customer_ids if c is not None}
+    if not affected:
+        return
+    # Pending ORM changes must be visible to the aggregate (autoflush=False)
+    db.flush()
+    rows = [
+        r._asdict()
+        for r in _aggregate_query(db)
+        .filter(DeliveryNoteDB.customer_id.in_(affected))
+        .group_by(DeliveryNoteDB.customer_id)
+    ]
+    db.query(RFMSnapshotDB).filter(RFMSnapshotDB.customer_id.in_(affected)).delete(
+        synchronize_session=False
+    )
+    if rows:
+        db.execute(insert(RFMSnapshotDB), rows)
+
+
+def rebuild(db: Session) -> int:
+    """Rebuilds the whole snapshot and returns the number of customers stored."""
+    rows = [
+        r._asdict() for r in _aggregate_query(db).group_by(DeliveryNoteDB.customer_id)
+    ]
+    db.query(RFMSnapshotDB).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(RFMSnapshotDB), rows)
+    db.commit()
+    log.info("[rfm] Snapshot reconstruido: %d clientes", len(rows))
+    return len(rows)
+
+
+# ---------- Scoring ----------
+def _quartiles(values: np.ndarray) -> np.ndarray:
+    if len(values) >= 4:
+        return np.quantile(values, [0.25, 0.5, 0.75])
+    return np.array([values.min(), np.median(values), values.max()])
+
+
+def _in_range(scores: np.ndarray, bounds: tuple[int, int]) -> np.ndarray:
+    return (scores >= bounds[0]) & (scores <= bounds[1])
+
+
+def score(
+    recency: np.ndarray,
+    frequency: np.ndarray,
+    monetary: np.ndarray,
+    rules: Sequence[SegmentRule] = DEFAULT_RULES,
+    default: str = DEFAULT_SEGMENT,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scores every customer from 1 to 4 against the quartiles of the population
+    (a value equal to a cut point falls in the lower bucket) and assigns the
+    segment. Lower recency is better, so R is reversed.
+    """
+    r = 4 - np.searchsorted(_quartiles(recency), recency, side="left")
+    f = 1 + np.searchsorted(_quartiles(frequency), frequency, side="left")
+    m = 1 + np.searchsorted(_quartiles(monetary), monetary, side="left")
+    conditions = [
+        _in_range(r, rule.r) & _in_range(f, rule.f) & _in_range(m, rule.m)
+        for rule in rules
+    ]
+    segments = (
+        np.select(conditions, [rule.segment for rule in rules], default=default)
+        if conditions
+        else np.full(len(r), default)
+    )
+    return r, f, m, segments
+
+
+def rfm_segments(
+    db: Session,
+    ref_date: date,
+    rules: Sequence[SegmentRule] = DEFAULT_RULES,
+    use_snapshot: Optional[bool] = None,
+) -> dict:
+    rows = _aggregates(
+        db, ref_date, USE_SNAPSHOT if use_snapshot is None else use_snapshot
+    )
+    if not rows:
+        return {"summary": {}, "by_customer": []}
+
+    cids, last_dates, freqs, monies = zip(*rows)
+    ref = ref_date.toordinal()
+    recency = np.fromiter(
+        (ref - d.toordinal() for d in last_dates), dtype=np.int64, count=len(rows)
+    )
+    frequency = np.asarray(freqs, dtype=np.float64)
+    monetary = np.asarray(monies, dtype=np.float64)
+    r, f, m, segments = score(recency, frequency, monetary, rules)
+
+    by_customer = [
+        {
+            "cliente_id": cid,
+            "recency_days": rec,
+            "frequency": int(freq),
+            "monetary": mon,
+            "R": sr,
+            "F": sf,
+            "M": sm,
+            "segment": seg,
+        }
+        for cid, rec, freq, mon, sr, sf, sm, seg in zip(
+            cids,
+            recency.tolist(),
+            frequency.tolist(),
+            monetary.tolist(),
+            r.tolist(),
+            f.tolist(),
+            m.tolist(),
+            segments.tolist(),
+        )
+    ]
+    names, first, counts = np.unique(segments, return_index=True, return_counts=True)
+    # Segments listed in order of first appearance, as the summary always was
+    order = np.argsort(first)
+    summary = dict(zip(names[order].tolist(), counts[order].tolist()))
+    return {"summary": summary, "by_customer": by_customer}
+
+
+def job_rfm_snapshot() -> None:
+    """Daily full rebuild (APScheduler), in case a write bypassed refresh_customers()."""
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    except Exception as exc:
+        log.exception("[rfm] Error en job_rfm_snapshot: %s", exc)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from backend.app.database import Base, SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[RFMSnapshotDB.__table__])
+    with SessionLocal() as session:
+        rebuild(session)
@@ -0,0 +1,81 @@
+"""
+Daily sales rollup (table ventas_diarias), separated from the HTTP layer.
+
+Every write that changes the date, total or existence of a delivery note must
+call refresh_days() before committing, so the rollup is updated inside the
+same transaction. rebuild() recomputes the whole table from 'albaranes' and
+can be run from the command line:
+
+    python -m backend.app.services.ventas_diarias_service
+"""
+
+import logging
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend.app.entidades.albaran import DeliveryNoteDB
+from backend.app.entidades.venta_diaria import DailySalesDB
+
+log = logging.getLogger("ventas_diarias")
+
+
+def _aggregate(db: Session, days: set[date] | None = None) -> list[dict]:
+    q = db.query(
+        DeliveryNoteDB.date.label("day"),
+        func.count(DeliveryNoteDB.id).label("orders"),
+        func.coalesce(func.sum(DeliveryNoteDB.total), 0.0).label("revenue"),
+        func.count(func.distinct(DeliveryNoteDB.customer_id)).label("customers"),
+    )
+    if days is not None:
+        q = q.filter(DeliveryNoteDB.date.in_(days))
+    return [
+        {
+            "day": r.day,
+            "orders": int(r.orders),
+            "revenue": float(r.revenue or 0.0),
+            "customers": int(r.customers),
+        }
+        for r in q.group_by(DeliveryNoteDB.date).all()
+    ]
+
+
+def refresh_days(db: Session, days: Iterable[date | None]) -> None:
+    """
+    Recomputes the rollup rows of the given days from 'albaranes'.
+    Does not commit: the caller commits together with its own changes.
+    """
+    affected = {d for d in days if d is not None}
+    if not affected:
+        return
+    # Pending ORM changes (new lines, deleted notes...) must be visible to the
+    # aggregate query; the session is created with autoflush=False.
+    db.flush()
+    rows = _aggregate(db, affected)
+    db.query(DailySalesDB).filter(DailySalesDB.day.in_(affected)).delete(
+        synchronize_session=False
+    )
+    if rows:
+        db.execute(insert(DailySalesDB), rows)
+
+
+def rebuild(db: Session) -> int:
+    """Rebuilds the whole rollup table and returns the number of days stored."""
+    rows = _aggregate(db)
+    db.query(DailySalesDB).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(DailySalesDB), rows)
+    db.commit()
+    log.info("[ventas_diarias] Rollup reconstruido: %d dias", len(rows))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from backend.app.database import Base, SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[DailySalesDB.__table__])
+    with SessionLocal() as session:
+        rebuild(session)
@@ -0,0 +1,8 @@
+EMAIL_HOST = ""
+EMAIL_PORT = 587
+EMAIL_USER = ""
+EMAIL_PASSWORD = ""
+EMAIL_FROM = "test@test.com"
+EMAIL_SENDER_NAME = "Test"
+RESEND_API_KEY = ""
+RESEND_FROM = ""
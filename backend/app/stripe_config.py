@@ -0,0 +1,5 @@
+STRIPE_SECRET_KEY = ""
+STRIPE_PUBLISHABLE_KEY = ""
+STRIPE_SUCCESS_URL = ""
+STRIPE_CANCEL_URL = ""
+STRIPE_CURRENCY = "eur"
@@ -41,8 +41,21 @@ def _safe(s) -> str:
     return str(s).strip()
 
 
+def _logo_reader(
+    logo_bytes: bytes | None, logo_base64: str | None
+) -> ImageReader | None:
+    """ImageReader built once per document; None if there is no usable logo."""
+    try:
+        if logo_bytes is None and logo_base64:
+            logo_bytes = base64.b64decode(logo_base64.split(",")[-1])
+        return ImageReader(BytesIO(logo_bytes)) if logo_bytes else None
+    except Exception:
+        log.warning("[pdf] Logo no válido, se usa el nombre de la tienda")
+        return None
+
+
 def _build_header_footer(
-    canvas, doc, tienda_nombre: str, right_text: str, logo_base64: str | None = None
+    canvas, doc, tienda_nombre: str, right_text: str, logo: ImageReader | None = None
 ):
     """
     Header + footer en todas las páginas.
@@ -62,12 +75,10 @@ def _build_header_footer(
     )
 
     # Texto header (izq: tienda o logo)
-    if logo_base64:
+    if logo is not None:
         try:
-            raw = logo_base64.split(",")[-1]
-            img_reader = ImageReader(BytesIO(base64.b64decode(raw)))
             canvas.drawImage(
-                img_reader,
+                logo,
                 doc.leftMargin,
                 header_y - 6,
                 width=28 * mm,
@@ -120,11 +131,14 @@ def generate_delivery_note_pdf(
     lineas_con_nombre,
     tienda_nombre: str = "FurniGest",
     logo_base64: str | None = None,
+    logo_bytes: bytes | None = None,
 ):
     """
     PDF profesional:
     - Header con nombre de tienda ("Tienda")
     - Más separación arriba para que no se pise con el título
+    - logo_bytes (ya decodificado, ver config_cache) tiene prioridad sobre
+      logo_base64
     """
     log.info("[pdf] Generando PDF para albarán #%s", getattr(albaran, "id", "?"))
 
@@ -384,13 +398,14 @@ def generate_delivery_note_pdf(
     # Header/footer en cada página
     right_text = f"#{albaran_id} · {fecha}"
 
+    logo = _logo_reader(logo_bytes, logo_base64)
     doc.build(
         story,
         onFirstPage=lambda canv, d: _build_header_footer(
-            canv, d, tienda_nombre, right_text, logo_base64
+            canv, d, tienda_nombre, right_text, logo
         ),
         onLaterPages=lambda canv, d: _build_header_footer(
-            canv, d, tienda_nombre, right_text, logo_base64
+            canv, d, tienda_nombre, right_text, logo
         ),
     )
 
@@ -0,0 +1,83 @@
+"""
+Versioned result cache for the analytics endpoints.
+
+Entries are keyed by (name, version, *params). The version is a process-wide
+counter bumped whenever a session flushes or bulk-writes delivery notes, their
+lines, customers or the rollup tables, so a write makes every previous entry
+unreachable without scanning the cache; stale entries age out through the LRU
+and the TTL. The counter is bumped again on commit, so a result computed by
+another request between the flush and the commit (still reading the old data)
+is not served afterwards.
+
+Size and TTL can be tuned with ANALYTICS_CACHE_SIZE / ANALYTICS_CACHE_TTL.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Hashable
+
+
+from backend.app.entidades.albaran import DeliveryNoteDB
+from backend.app.entidades.cliente import CustomerDB
+from backend.app.entidades.linea_albaran import DeliveryNoteLineDB
+from backend.app.entidades.rfm_cliente import RFMSnapshotDB
+from backend.app.entidades.venta_diaria import DailySalesDB
+from backend.app.utils.session_watch import watch
+from backend.app.utils.ttl_cache import TTLCache
+
+_TRACKED = (
+    DeliveryNoteDB,
+    DeliveryNoteLineDB,
+    CustomerDB,
+    DailySalesDB,
+    RFMSnapshotDB,
+)
+
+cache = TTLCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL", "300")),
+)
+
+_version = 0
+_version_lock = threading.Lock()
+
+
+def data_version() -> int:
+    return _version
+
+
+def bump_version() -> int:
+    global _version
+    with _version_lock:
+        _version += 1
+        return _version
+
+
+def cached(name: str, params: tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+    """Returns the cached result of compute() for the current data version."""
+    return cache.get_or_compute((name, data_version(), *params), compute)
+
+
+def lookup(name: str, params: tuple[Hashable, ...]) -> tuple[int, Any]:
+    """
+    Cache lookup that also returns the version it was made against, so the
+    caller can store a result computed later with store() under that version.
+    """
+    version = data_version()
+    return version, cache.get((name, version, *params))
+
+
+def store(name: str, version: int, params: tuple[Hashable, ...], value: Any) -> None:
+    cache.set((name, version, *params), value)
+
+
+def stats() -> dict:
+    return {**cache.stats(), "data_version": data_version()}
+
+
+def clear() -> None:
+    cache.clear()
+
+
+# ---------- Invalidation ----------
+watch(_TRACKED, bump_version)
@@ -0,0 +1,59 @@
+"""
+Local postal code → coordinates table for route planning.
+
+The bundled CSV (data/codigos_postales.csv) has the approximate centre of
+every province, keyed by the two-digit prefix of its postal codes, plus a
+few city districts. A full table with the same columns (codigo_postal, lat,
+lon) can be used instead through POSTAL_CODES_CSV. locate() tries the exact
+code first and falls back to the province, so every valid Spanish code gets
+a position, at worst the province centre.
+"""
+
+import csv
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+log = logging.getLogger("codigos_postales")
+
+TABLE_PATH = Path(
+    os.getenv(
+        "POSTAL_CODES_CSV",
+        Path(__file__).resolve().parent.parent / "data" / "codigos_postales.csv",
+    )
+)
+
+
+def normalize(postal_code: Optional[str]) -> Optional[str]:
+    """Five-digit code or None ("8001" → "08001")."""
+    code = (postal_code or "").strip().replace(" ", "")
+    if not code.isdigit() or not 4 <= len(code) <= 5:
+        return None
+    return code.zfill(5)
+
+
+@lru_cache(maxsize=1)
+def table() -> dict[str, tuple[float, float]]:
+    coords: dict[str, tuple[float, float]] = {}
+    with open(TABLE_PATH, encoding="utf-8", newline="") as fh:
+        for row in csv.DictReader(fh):
+            try:
+                coords[row["codigo_postal"].strip()] = (
+                    float(row["lat"]),
+                    float(row["lon"]),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+    log.info("[cp] %d códigos postales cargados de %s", len(coords), TABLE_PATH)
+    return coords
+
+
+def locate(postal_code: Optional[str]) -> Optional[tuple[float, float]]:
+    """(lat, lon) of the code, its province centre, or None if unknown."""
+    code = normalize(postal_code)
+    if code is None:
+        return None
+    coords = table()
+    return coords.get(code) or coords.get(code[:2])
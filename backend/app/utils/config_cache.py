@@ -0,0 +1,113 @@
+"""
+Process-wide snapshot of the key-value `configuracion` table.
+
+The whole table is loaded with one query; the `logo_empresa` data URL is
+base64-decoded once and kept as bytes. The snapshot is trusted for
+CONFIG_CHECK_SECONDS; after that a single (count, max(actualizado)) query
+tells whether another process changed the table, and only then is it
+reloaded. Writes made in this process (set_value, the seed, any session that
+flushes ConfigDB rows) drop the snapshot at once through session events.
+"""
+
+import base64
+import binascii
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.app.entidades.configuracion import ConfigDB
+from backend.app.utils.session_watch import watch
+
+log = logging.getLogger("config_cache")
+
+CHECK_SECONDS = float(os.getenv("CONFIG_CHECK_SECONDS", "5"))
+LOGO_KEY = "logo_empresa"
+
+
+class Snapshot(NamedTuple):
+    values: dict[str, str]
+    logo: Optional[bytes]
+    stamp: tuple
+    checked_at: float
+
+
+_snapshot: Optional[Snapshot] = None
+_version = 0
+_lock = threading.Lock()
+
+
+def _decode_logo(value: Optional[str]) -> Optional[bytes]:
+    """Bytes of a base64 logo (plain or data URL); None if empty or invalid."""
+    if not value:
+        return None
+    try:
+        raw = "".join(value.split(",")[-1].split())
+        return base64.b64decode(raw, validate=True)
+    except (binascii.Error, ValueError) as e:
+        log.warning("[config] Logo no decodificable (%s).", e)
+        return None
+
+
+def _stamp(db: Session) -> tuple:
+    count, updated = db.query(
+        func.count(ConfigDB.id), func.max(ConfigDB.updated_at)
+    ).one()
+    return count, updated
+
+
+def _load(db: Session) -> Snapshot:
+    rows = db.query(ConfigDB.key, ConfigDB.value, ConfigDB.updated_at).all()
+    values = {key: value or "" for key, value, _ in rows}
+    stamps = [updated for _, _, updated in rows if updated is not None]
+    return Snapshot(
+        values,
+        _decode_logo(values.get(LOGO_KEY)),
+        (len(rows), max(stamps) if stamps else None),
+        time.monotonic(),
+    )
+
+
+def snapshot(db: Session) -> Snapshot:
+    global _snapshot
+    current = _snapshot
+    now = time.monotonic()
+    if current is not None and now - current.checked_at < CHECK_SECONDS:
+        return current
+    version = _version
+    if current is not None and _stamp(db) == current.stamp:
+        fresh = current._replace(checked_at=now)
+    else:
+        fresh = _load(db)
+    with _lock:
+        # Not stored if a write invalidated the cache while it was being read
+        if version == _version:
+            _snapshot = fresh
+    return fresh
+
+
+def get(db: Session, key: str, default: str = "") -> str:
+    return snapshot(db).values.get(key) or default
+
+
+def values(db: Session) -> dict[str, str]:
+    return dict(snapshot(db).values)
+
+
+def logo(db: Session) -> Optional[bytes]:
+    return snapshot(db).logo
+
+
+def invalidate() -> None:
+    global _snapshot, _version
+    with _lock:
+        _snapshot = None
+        _version += 1
+
+
+# ---------- Invalidation ----------
+watch((ConfigDB,), invalidate)
@@ -0,0 +1,264 @@
+"""
+Persistent outgoing email queue (table `email_outbox`).
+
+enqueue() stores the message in the same database as the business data, so
+it survives restarts; OutboxWorkerPool threads drain it. Each worker keeps
+one persistent SmtpSession, so a burst of 500 delivery-note emails costs one
+TLS handshake and login per worker instead of one per message.
+
+Rows are claimed with a conditional UPDATE (plus FOR UPDATE SKIP LOCKED on
+PostgreSQL), so several workers and processes can drain the same table.
+A claim expires after EMAIL_LOCK_SECONDS and is picked up again if its
+worker died. Temporary failures are retried with exponential backoff
+(EMAIL_BACKOFF_SECONDS, doubling, capped at one hour). A permanent rejection
+or EMAIL_MAX_ATTEMPTS failures move the row to FALLIDO, the dead letter,
+which can be requeued from /api/emails/outbox/{id}/retry.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from backend.app.database import SessionLocal
+from backend.app.entidades.email_outbox import OUTBOX_STATUSES, EmailOutboxDB
+from backend.app.utils import emailer
+
+log = logging.getLogger("email_outbox")
+
+WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+BACKOFF_SECONDS = float(os.getenv("EMAIL_BACKOFF_SECONDS", "30"))
+MAX_BACKOFF_SECONDS = 3600.0
+LOCK_SECONDS = float(os.getenv("EMAIL_LOCK_SECONDS", "300"))
+POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+
+_wake = threading.Event()
+
+
+def wake() -> None:
+    """Tells idle workers to poll the queue now instead of after POLL_SECONDS."""
+    _wake.set()
+
+
+def enqueue(
+    db: Session,
+    to_email: str,
+    subject: str,
+    html_body: str,
+    attachment: Optional[bytes] = None,
+    attachment_name: Optional[str] = None,
+) -> EmailOutboxDB:
+    row = EmailOutboxDB(
+        to_email=to_email,
+        subject=subject,
+        html_body=html_body,
+        attachment=attachment or None,
+        attachment_name=attachment_name if attachment else None,
+        status="PENDIENTE",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(row)
+    db.commit()
+    wake()
+    log.info("[outbox] Email #%s en cola → %s", row.id, to_email)
+    return row
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retry number `attempts` (1-based)."""
+    return timedelta(
+        seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    )
+
+
+def _due(now: datetime):
+    return or_(
+        and_(
+            EmailOutboxDB.status == "PENDIENTE",
+            EmailOutboxDB.next_attempt_at <= now,
+        ),
+        # Claimed by a worker that never finished
+        and_(
+            EmailOutboxDB.status == "ENVIANDO",
+            EmailOutboxDB.locked_until < now,
+        ),
+    )
+
+
+def claim(db: Session, limit: int = BATCH_SIZE) -> list[EmailOutboxDB]:
+    """Marks up to `limit` due rows as ENVIANDO for this caller and returns them."""
+    now = datetime.utcnow()
+    ids = [
+        row_id
+        for (row_id,) in db.query(EmailOutboxDB.id)
+        .filter(_due(now))
+        .order_by(EmailOutboxDB.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ]
+    if not ids:
+        db.rollback()
+        return []
+    owner = uuid.uuid4().hex
+    db.query(EmailOutboxDB).filter(EmailOutboxDB.id.in_(ids), _due(now)).update(
+        {
+            EmailOutboxDB.status: "ENVIANDO",
+            EmailOutboxDB.locked_by: owner,
+            EmailOutboxDB.locked_until: now + timedelta(seconds=LOCK_SECONDS),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return (
+        db.query(EmailOutboxDB)
+        .filter(EmailOutboxDB.locked_by == owner)
+        .order_by(EmailOutboxDB.id)
+        .all()
+    )
+
+
+def _permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPDataError) and exc.smtp_code >= 500
+
+
+def _deliver(row: EmailOutboxDB, smtp: emailer.SmtpSession) -> None:
+    if emailer.RESEND_API_KEY:
+        emailer._send_via_resend(
+            row.to_email,
+            row.subject,
+            row.html_body,
+            row.attachment,
+            row.attachment_name or "",
+        )
+        return
+    smtp.send(
+        emailer.build_message(
+            row.to_email,
+            row.subject,
+            row.html_body,
+            row.attachment,
+            row.attachment_name or "",
+        )
+    )
+
+
+def _record(row: EmailOutboxDB, exc: Optional[Exception]) -> None:
+    now = datetime.utcnow()
+    row.attempts = (row.attempts or 0) + 1
+    row.locked_by = None
+    row.locked_until = None
+    if exc is None:
+        row.status = "ENVIADO"
+        row.sent_at = now
+        row.attachment = None
+        row.last_error = None
+        return
+    row.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+    if _permanent(exc) or row.attempts >= MAX_ATTEMPTS:
+        row.status = "FALLIDO"
+        log.error(
+            "[outbox] Email #%s a %s descartado tras %d intentos: %s",
+            row.id,
+            row.to_email,
+            row.attempts,
+            row.last_error,
+        )
+    else:
+        row.status = "PENDIENTE"
+        row.next_attempt_at = now + backoff(row.attempts)
+        log.warning(
+            "[outbox] Email #%s falló (intento %d), reintento a las %s: %s",
+            row.id,
+            row.attempts,
+            row.next_attempt_at.isoformat(timespec="seconds"),
+            row.last_error,
+        )
+
+
+def process_batch(
+    db: Session, smtp: emailer.SmtpSession, limit: int = BATCH_SIZE
+) -> int:
+    """Claims and delivers one batch; returns the number of rows handled."""
+    rows = claim(db, limit)
+    for row in rows:
+        try:
+            _deliver(row, smtp)
+        except Exception as exc:
+            _record(row, exc)
+        else:
+            _record(row, None)
+        db.commit()
+    return len(rows)
+
+
+def drain(db: Session, smtp: Optional[emailer.SmtpSession] = None) -> int:
+    """Delivers everything currently due over a single SMTP session."""
+    if smtp is None:
+        with emailer.SmtpSession() as own:
+            return drain(db, own)
+    total = 0
+    while handled := process_batch(db, smtp):
+        total += handled
+    return total
+
+
+def stats(db: Session) -> dict:
+    counts = dict.fromkeys(OUTBOX_STATUSES, 0)
+    for status, count in (
+        db.query(EmailOutboxDB.status, func.count(EmailOutboxDB.id))
+        .group_by(EmailOutboxDB.status)
+        .all()
+    ):
+        counts[status] = count
+    return counts
+
+
+class OutboxWorkerPool:
+    """EMAIL_WORKERS threads, each with its own persistent SMTP session."""
+
+    def __init__(self, size: int = WORKERS):
+        self.size = size
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.size):
+            thread = threading.Thread(
+                target=self._loop, name=f"email-outbox-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        if self.size:
+            log.info("[outbox] %d workers arrancados", self.size)
+
+    def _loop(self) -> None:
+        with emailer.SmtpSession() as smtp:
+            while not self._stop.is_set():
+                try:
+                    with SessionLocal() as db:
+                        handled = process_batch(db, smtp)
+                except Exception as exc:
+                    log.exception("[outbox] Error procesando la cola: %s", exc)
+                    handled = 0
+                if not handled:
+                    smtp.close_if_idle()
+                    _wake.wait(POLL_SECONDS)
+                    _wake.clear()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
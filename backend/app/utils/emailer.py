@@ -1,9 +1,11 @@
 # backend/app/utils/emailer.py
 import base64
 import logging
+import os
 import smtplib
 import ssl
 import re
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -23,6 +25,11 @@ from backend.app.settings_email import (
 
 log = logging.getLogger("emailer")
 
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() in ("1", "true", "yes")
+# A persistent session is recycled after this many messages or idle seconds
+SMTP_MAX_MESSAGES = int(os.getenv("EMAIL_SMTP_MAX_MESSAGES", "100"))
+SMTP_IDLE_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_SECONDS", "60"))
+
 
 def _html_to_text(html: str) -> str:
     """Fallback sencillo a texto plano (para clientes de correo que no renderizan HTML)."""
@@ -47,24 +54,46 @@ def _html_to_text(html: str) -> str:
     return text
 
 
-def send_email_simple(to_email: str, subject: str, html_body: str) -> None:
-    """Envía un email HTML sin adjunto PDF."""
-    log.info("[emailer] Email simple → to=%s subject=%s", to_email, subject)
-    if RESEND_API_KEY:
-        _send_via_resend(to_email, subject, html_body, None, "")
-        return
-
+def build_message(
+    to_email: str,
+    subject: str,
+    html_body: str,
+    pdf_bytes: bytes | None = None,
+    pdf_filename: str = "",
+) -> MIMEMultipart:
+    """MIME del email: texto + HTML y, si hay pdf_bytes, el PDF adjunto."""
     msg = MIMEMultipart("mixed")
     msg["From"] = f"{EMAIL_SENDER_NAME} <{EMAIL_FROM}>"
     msg["To"] = to_email
     msg["Subject"] = subject
     msg["Date"] = formatdate(localtime=True)
     msg["Message-ID"] = make_msgid()
+    msg["Reply-To"] = f"{EMAIL_SENDER_NAME} <{EMAIL_FROM}>"
+
+    # Parte alternativa: texto + html
     alt = MIMEMultipart("alternative")
     alt.attach(MIMEText(_html_to_text(html_body), "plain", "utf-8"))
     alt.attach(MIMEText(html_body, "html", "utf-8"))
     msg.attach(alt)
-    _send_via_smtp(msg, to_email)
+
+    # PDF adjunto
+    if pdf_bytes:
+        part = MIMEBase("application", "pdf")
+        part.set_payload(pdf_bytes)
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", f'attachment; filename="{pdf_filename}"')
+        msg.attach(part)
+        log.debug("[emailer] PDF adjunto: %s (%d bytes)", pdf_filename, len(pdf_bytes))
+    return msg
+
+
+def send_email_simple(to_email: str, subject: str, html_body: str) -> None:
+    """Envía un email HTML sin adjunto PDF."""
+    log.info("[emailer] Email simple → to=%s subject=%s", to_email, subject)
+    if RESEND_API_KEY:
+        _send_via_resend(to_email, subject, html_body, None, "")
+        return
+    _send_via_smtp(build_message(to_email, subject, html_body), to_email)
 
 
 def send_email_with_pdf(
@@ -78,38 +107,13 @@ def send_email_with_pdf(
         EMAIL_PORT,
         EMAIL_USER,
     )
-
-    msg = MIMEMultipart("mixed")
-    msg["From"] = f"{EMAIL_SENDER_NAME} <{EMAIL_FROM}>"
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg["Date"] = formatdate(localtime=True)
-    msg["Message-ID"] = make_msgid()
-    msg["Reply-To"] = f"{EMAIL_SENDER_NAME} <{EMAIL_FROM}>"
-
-    # Parte alternativa: texto + html
-    alt = MIMEMultipart("alternative")
-
-    text_body = _html_to_text(html_body)
-    alt.attach(MIMEText(text_body, "plain", "utf-8"))
-    alt.attach(MIMEText(html_body, "html", "utf-8"))
-
-    msg.attach(alt)
-
-    # PDF adjunto
-    if pdf_bytes:
-        part = MIMEBase("application", "pdf")
-        part.set_payload(pdf_bytes)
-        encoders.encode_base64(part)
-        part.add_header("Content-Disposition", f'attachment; filename="{pdf_filename}"')
-        msg.attach(part)
-        log.debug("[emailer] PDF adjunto: %s (%d bytes)", pdf_filename, len(pdf_bytes))
-    else:
+    if not pdf_bytes:
         log.warning("[emailer] pdf_bytes es None: se enviará sin adjunto")
 
     if RESEND_API_KEY:
         _send_via_resend(to_email, subject, html_body, pdf_bytes, pdf_filename)
     else:
+        msg = build_message(to_email, subject, html_body, pdf_bytes, pdf_filename)
         _send_via_smtp(msg, to_email)
 
 
@@ -159,19 +163,96 @@ def _send_via_resend(
         raise
 
 
+class SmtpSession:
+    """
+    Conexión SMTP persistente: STARTTLS y login se hacen una vez y la misma
+    sesión envía muchos mensajes. Se recicla tras SMTP_MAX_MESSAGES envíos o
+    SMTP_IDLE_SECONDS de inactividad y se reconecta una vez si el servidor la
+    ha cerrado. No es thread-safe: una por worker.
+    """
+
+    def __init__(self, host: str | None = None, port: int | None = None):
+        self.host = host or EMAIL_HOST
+        self.port = port or EMAIL_PORT
+        self.connections = 0
+        self._smtp: smtplib.SMTP | None = None
+        self._sent = 0
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        log.info("[emailer] Conectando a SMTP %s:%s ...", self.host, self.port)
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            smtp.ehlo()
+            if EMAIL_USE_TLS:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+                log.info("[emailer] TLS OK.")
+            if EMAIL_USER:
+                log.info("[emailer] Autenticando como %s ...", EMAIL_USER)
+                smtp.login(EMAIL_USER, EMAIL_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections += 1
+        self._smtp, self._sent = smtp, 0
+        return smtp
+
+    def _stale(self) -> bool:
+        return (
+            self._sent >= SMTP_MAX_MESSAGES
+            or time.monotonic() - self._last_used > SMTP_IDLE_SECONDS
+        )
+
+    def send(self, msg: MIMEMultipart) -> None:
+        if self._smtp is not None and self._stale():
+            self.close()
+        reused = self._smtp is not None
+        smtp = self._smtp or self._connect()
+        try:
+            smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            if not reused:
+                raise
+            # El servidor cerró la sesión inactiva: un reintento con otra nueva
+            self._connect().send_message(msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError):
+            # Rechazo del mensaje; la sesión sigue siendo válida
+            raise
+        except Exception:
+            self.close()
+            raise
+        finally:
+            self._last_used = time.monotonic()
+        self._sent += 1
+
+    def close_if_idle(self) -> None:
+        if self._smtp is not None and self._stale():
+            self.close()
+
+    def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def __enter__(self) -> "SmtpSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 def _send_via_smtp(msg: MIMEMultipart, to_email: str):
-    """Envía usando SMTP (Gmail por defecto). Para desarrollo local."""
-    context = ssl.create_default_context()
+    """Envía un único mensaje por SMTP (Gmail por defecto). Para desarrollo local."""
     try:
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30) as smtp:
-            log.info("[emailer] Conectando a SMTP...")
-            smtp.ehlo()
-            smtp.starttls(context=context)
-            smtp.ehlo()
-            log.info("[emailer] TLS OK. Autenticando como %s ...", EMAIL_USER)
-            smtp.login(EMAIL_USER, EMAIL_PASSWORD)
+        with SmtpSession() as smtp:
             log.info("[emailer] Enviando mensaje...")
-            smtp.send_message(msg)
+            smtp.send(msg)
             log.info("[emailer] Email enviado correctamente a %s", to_email)
     except Exception as e:
         log.exception("[emailer] Error enviando el email via SMTP: %s", e)
@@ -0,0 +1,163 @@
+"""
+Route invoice PDF for one truck: the delivery notes it carries, the carrier's
+7% commission and the store's net amount.
+
+Takes plain objects with attribute access (ORM rows or SimpleNamespace), so it
+can run in the render worker processes.
+"""
+
+from io import BytesIO
+from datetime import datetime, date
+from typing import Any, Dict, List
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+
+def _eur(n: float) -> str:
+    try:
+        return f"{float(n):.2f} €"
+    except (TypeError, ValueError):
+        return "0.00 €"
+
+
+def _fmt_date(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+
+def generate_route_invoice_pdf(
+    truck_id: int,
+    delivery_notes: List[Any],
+    customers_map: Dict[int, Any],
+) -> bytes:
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+        topMargin=26 * mm,
+        bottomMargin=18 * mm,
+        title=f"Factura Ruta Camion {truck_id}",
+        author="Tienda",
+    )
+
+    styles = getSampleStyleSheet()
+    styles.add(
+        ParagraphStyle(
+            name="H1",
+            parent=styles["Heading1"],
+            fontName="Helvetica-Bold",
+            fontSize=16,
+            leading=18,
+            textColor=colors.HexColor("#111827"),
+            spaceAfter=6,
+        )
+    )
+    styles.add(
+        ParagraphStyle(
+            name="Muted",
+            parent=styles["Normal"],
+            fontName="Helvetica",
+            fontSize=9,
+            leading=12,
+            textColor=colors.HexColor("#6B7280"),
+        )
+    )
+    styles.add(
+        ParagraphStyle(
+            name="Body",
+            parent=styles["Normal"],
+            fontName="Helvetica",
+            fontSize=10,
+            leading=14,
+            textColor=colors.HexColor("#111827"),
+        )
+    )
+
+    total = sum(float(a.total or 0) for a in delivery_notes)
+    commission = total * 0.07
+    net_revenue = total - commission
+
+    story = []
+    story.append(Spacer(1, 10))
+    story.append(Paragraph(f"Factura de ruta - Camion {truck_id}", styles["H1"]))
+    story.append(
+        Paragraph(f"Fecha de emision: {_fmt_date(date.today())}", styles["Muted"])
+    )
+    story.append(Spacer(1, 10))
+
+    summary_table = Table(
+        [
+            ["Total albaranes", _eur(total)],
+            ["Comision transportista (7%)", _eur(commission)],
+            ["Importe tienda (Total - 7%)", _eur(net_revenue)],
+        ],
+        colWidths=[90 * mm, 70 * mm],
+    )
+    summary_table.setStyle(
+        TableStyle(
+            [
+                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor("#E5E7EB")),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#F9FAFB")),
+                ("TEXTCOLOR", (0, 0), (-1, -1), colors.HexColor("#111827")),
+                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, -1), 10),
+                ("LEFTPADDING", (0, 0), (-1, -1), 10),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 10),
+                ("TOPPADDING", (0, 0), (-1, -1), 8),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+                ("LINEBELOW", (0, 0), (-1, 0), 1, colors.HexColor("#E5E7EB")),
+            ]
+        )
+    )
+    story.append(summary_table)
+    story.append(Spacer(1, 14))
+
+    data = [["Albaran", "Fecha", "Cliente", "Total"]]
+    for a in delivery_notes:
+        c = customers_map.get(a.customer_id)
+        customer_label = (
+            "-"
+            if not c
+            else f"{(c.name or '').strip()} {(c.surnames or '').strip()}".strip()
+            or f"Cliente #{a.customer_id}"
+        )
+        data.append([f"#{a.id}", _fmt_date(a.date), customer_label, _eur(a.total or 0)])
+
+    tbl = Table(data, colWidths=[22 * mm, 28 * mm, 92 * mm, 28 * mm])
+    tbl.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#111827")),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, 0), 9),
+                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor("#E5E7EB")),
+                ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
+                ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+                ("FONTSIZE", (0, 1), (-1, -1), 9),
+                ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111827")),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                ("ALIGN", (3, 1), (3, -1), "RIGHT"),
+                ("LEFTPADDING", (0, 0), (-1, -1), 8),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+                ("TOPPADDING", (0, 0), (-1, -1), 6),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ]
+        )
+    )
+    story.append(tbl)
+    story.append(Spacer(1, 10))
+    story.append(Paragraph("Documento generado automaticamente.", styles["Muted"]))
+
+    doc.build(story)
+    return buf.getvalue()
@@ -1,4 +1,31 @@
+"""
+Cliente de Groq (endpoint OpenAI-compatible /chat/completions).
+
+All calls share one keep-alive connection pool (requests.Session) and go
+through the same guards:
+  - a global semaphore that limits concurrent upstream calls,
+  - retries with exponential backoff on 429/5xx and network errors, honouring
+    Retry-After,
+  - a circuit breaker that, after repeated outages (the retryable errors
+    above; a rejected 4xx request does not count), makes calls fail at once
+    (LLMUnavailable) so callers go straight to their fallback text,
+  - per-call latency/token metrics (llm_stats()).
+
+Responses are also stored in the persistent prompt cache (utils/llm_cache.py);
+pass cache=False to always call the API.
+"""
+
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from backend.app.ia_settings import (
     GROQ_API_KEY,
@@ -6,23 +33,345 @@ from backend.app.ia_settings import (
     GROQ_MODEL,
     REQUEST_TIMEOUT,
 )
+from backend.app.utils import llm_cache
 
+log = logging.getLogger("groq")
 
-def groq_chat(messages, temperature: float = 0.2, model: str | None = None) -> str:
-    """Llamada a Groq usando el endpoint OpenAI-compatible /chat/completions."""
-    if not GROQ_API_KEY:
-        raise RuntimeError("GROQ_API_KEY no configurado")
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+QUEUE_TIMEOUT = float(os.getenv("GROQ_QUEUE_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+BREAKER_THRESHOLD = int(os.getenv("GROQ_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("GROQ_BREAKER_RESET", "30"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_sleep = time.sleep
+
+
+class LLMUnavailable(RuntimeError):
+    """The LLM cannot be called right now (circuit open or no free slot)."""
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; after `reset`
+    seconds one trial call is let through (half-open)."""
+
+    def __init__(self, threshold: int, reset: float):
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset:
+            return "half_open"
+        return "open"
 
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial):
+                raise LLMUnavailable("Circuito abierto: Groq no disponible")
+            if state == "half_open":
+                self._trial = True
+
+    def cancel(self) -> None:
+        """The call allowed by before_call() was not made."""
+        with self._lock:
+            self._trial = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(
+        self,
+        latency_ms: float,
+        ok: bool,
+        retries: int,
+        usage: Optional[dict] = None,
+    ) -> None:
+        usage = usage or {}
+        with self._lock:
+            self.calls += 1
+            self.errors += 0 if ok else 1
+            self.retries += retries
+            self.latency_ms_total += latency_ms
+            self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+            self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens += int(usage.get("completion_tokens") or 0)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "cache_hits": self.cache_hits,
+                "latency_ms_avg": (
+                    self.latency_ms_total / self.calls if self.calls else 0.0
+                ),
+                "latency_ms_max": self.latency_ms_max,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+_session = requests.Session()
+_session.mount(
+    "https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY)
+)
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+metrics = _Metrics()
+
+
+def llm_stats() -> dict:
+    return {
+        **metrics.snapshot(),
+        "circuit": breaker.state,
+        "max_concurrency": MAX_CONCURRENCY,
+        "cache": llm_cache.stats(),
+    }
+
+
+def _retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def _backoff(attempt: int, response: Optional[requests.Response]) -> float:
+    delay = _retry_after(response)
+    if delay is None:
+        delay = BACKOFF_BASE * (2**attempt) * (1 + random.random() * 0.25)
+    return min(delay, BACKOFF_MAX)
+
+
+def _post(payload: dict, stream: bool = False) -> tuple[requests.Response, int]:
+    """
+    POST /chat/completions with retries. Returns the successful response and
+    the number of retries; raises after the last attempt.
+    """
     url = f"{GROQ_BASE_URL.rstrip('/')}/chat/completions"
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json",
     }
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = _session.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=REQUEST_TIMEOUT,
+                stream=stream,
+            )
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response, attempt
+            error: Exception = requests.HTTPError(
+                f"{response.status_code} from Groq", response=response
+            )
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error = exc
+        if attempt >= MAX_RETRIES:
+            if response is not None:
+                response.raise_for_status()
+            raise error
+        delay = _backoff(attempt, response)
+        log.warning("[groq] %s; reintento %d en %.1fs", error, attempt + 1, delay)
+        if response is not None:
+            response.close()
+        _sleep(delay)
+        attempt += 1
+
+
+def _is_outage(exc: BaseException) -> bool:
+    """Errors that say Groq is unavailable, as opposed to a rejected request."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(exc, "response", None)
+    return isinstance(exc, requests.HTTPError) and (
+        response is not None and response.status_code in RETRY_STATUS
+    )
+
+
+def _release(ok: bool, outage: bool) -> None:
+    """Frees the slot; only outages count towards opening the circuit."""
+    _semaphore.release()
+    if ok:
+        breaker.success()
+    elif outage:
+        breaker.failure()
+    else:
+        breaker.cancel()
+
+
+def _acquire() -> None:
+    """Takes a concurrency slot; fails fast when the circuit is open."""
+    if not GROQ_API_KEY:
+        raise RuntimeError("GROQ_API_KEY no configurado")
+    try:
+        breaker.before_call()
+        if not _semaphore.acquire(timeout=QUEUE_TIMEOUT):
+            breaker.cancel()
+            raise LLMUnavailable("Demasiadas llamadas simultáneas a Groq")
+    except LLMUnavailable:
+        metrics.reject()
+        raise
+
+
+def _cache_key(payload: dict) -> str:
+    return llm_cache.make_key(
+        payload["model"], payload["temperature"], payload["messages"]
+    )
+
+
+def _payload(messages, temperature, model, stream=False) -> dict:
     payload = {
         "model": (model or GROQ_MODEL),
         "temperature": float(temperature or 0.2),
         "messages": messages,
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"].strip()
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def groq_chat(
+    messages, temperature: float = 0.2, model: str | None = None, cache: bool = True
+) -> str:
+    """Llamada a Groq usando el endpoint OpenAI-compatible /chat/completions."""
+    payload = _payload(messages, temperature, model)
+    key = _cache_key(payload) if cache else None
+    if key and (hit := llm_cache.get(key)) is not None:
+        metrics.cache_hit()
+        return hit
+    _acquire()
+    start = time.perf_counter()
+    retries, ok, outage, usage = 0, False, False, None
+    try:
+        r, retries = _post(payload)
+        body = r.json()
+        usage = body.get("usage")
+        answer = body["choices"][0]["message"]["content"].strip()
+        ok = True
+    except Exception as exc:
+        outage = _is_outage(exc)
+        raise
+    finally:
+        _release(ok, outage)
+        latency = (time.perf_counter() - start) * 1000
+        metrics.record(latency, ok, retries, usage)
+        log.info(
+            "[groq] chat %s %.0fms retries=%d tokens=%s",
+            "ok" if ok else "error",
+            latency,
+            retries,
+            usage,
+        )
+    if key:
+        llm_cache.put(key, payload["model"], answer)
+    return answer
+
+
+def groq_chat_stream(
+    messages, temperature: float = 0.2, model: str | None = None, cache: bool = True
+) -> Iterator[str]:
+    """
+    Same call with stream=true: yields the content deltas as they arrive
+    (Server-Sent Events "data: {...}" lines, terminated by "data: [DONE]").
+    A cached response is yielded as a single chunk; a complete stream is cached.
+    """
+    payload = _payload(messages, temperature, model, stream=True)
+    key = _cache_key(payload) if cache else None
+    if key and (hit := llm_cache.get(key)) is not None:
+        metrics.cache_hit()
+        yield hit
+        return
+    _acquire()
+    start = time.perf_counter()
+    retries, ok, outage, usage = 0, False, False, None
+    parts: list[str] = []
+    try:
+        r, retries = _post(payload, True)
+        with r:
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                choices = event.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        ok = True
+    except Exception as exc:
+        outage = _is_outage(exc)
+        raise
+    finally:
+        _release(ok, outage)
+        latency = (time.perf_counter() - start) * 1000
+        metrics.record(latency, ok, retries, usage)
+        log.info(
+            "[groq] stream %s %.0fms retries=%d tokens=%s",
+            "ok" if ok else "error",
+            latency,
+            retries,
+            usage,
+        )
+    if key:
+        llm_cache.put(key, payload["model"], "".join(parts).strip())
@@ -0,0 +1,52 @@
+"""
+DB-backed leases so that a scheduled job runs on only one of several uvicorn
+workers or replicas.
+
+acquire() takes the lease with a single conditional UPDATE (or the INSERT of
+the row the first time); the database serialises competing writers, so at
+most one of them sees a row affected. A lease is not re-entrant and expires
+on its own after `ttl` seconds if its owner dies without releasing it.
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.app.entidades.job_lease import JobLeaseDB
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire(db: Session, name: str, ttl: float, owner: str = OWNER) -> bool:
+    now = datetime.utcnow()
+    values = {
+        JobLeaseDB.owner: owner,
+        JobLeaseDB.expires_at: now + timedelta(seconds=ttl),
+    }
+    taken = (
+        db.query(JobLeaseDB)
+        .filter(JobLeaseDB.name == name, JobLeaseDB.expires_at <= now)
+        .update(values, synchronize_session=False)
+    )
+    if not taken:
+        db.add(
+            JobLeaseDB(name=name, owner=owner, expires_at=values[JobLeaseDB.expires_at])
+        )
+        try:
+            db.flush()
+        except IntegrityError:
+            # The row exists and its lease has not expired
+            db.rollback()
+            return False
+    db.commit()
+    return True
+
+
+def release(db: Session, name: str, owner: str = OWNER) -> None:
+    db.query(JobLeaseDB).filter(
+        JobLeaseDB.name == name, JobLeaseDB.owner == owner
+    ).update({JobLeaseDB.expires_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
@@ -0,0 +1,113 @@
+"""
+Persistent, content-addressed cache of Groq responses (table llm_cache).
+
+The key is the SHA-256 of (model, temperature, messages), so an identical
+prompt returns the stored text without calling the API. Entries older than
+LLM_CACHE_TTL seconds are ignored and purged; beyond LLM_CACHE_MAX_ENTRIES the
+least recently used ones are evicted. Recency is coarse: a hit only writes
+last_used when the stored value is more than LLM_CACHE_TOUCH_SECONDS old, so
+most hits are a single primary-key read (hit counts live in llm_stats()). The
+cache uses its own short session and never raises: if the table is not
+available the call simply goes upstream.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from backend.app import database
+from backend.app.entidades.llm_cache import LLMCacheDB
+
+log = logging.getLogger("llm_cache")
+
+ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+TOUCH_SECONDS = float(os.getenv("LLM_CACHE_TOUCH_SECONDS", "60"))
+
+
+def make_key(model: str, temperature: float, messages: list[dict]) -> str:
+    payload = json.dumps(
+        [model, round(float(temperature), 4), messages],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    """Stored response for the key, or None if missing or expired."""
+    if not ENABLED:
+        return None
+    now = datetime.utcnow()
+    try:
+        with database.SessionLocal() as db:
+            row = db.get(LLMCacheDB, key)
+            if row is None:
+                return None
+            if now - row.created_at > timedelta(seconds=TTL):
+                db.delete(row)
+                db.commit()
+                return None
+            response = row.response
+            if now - row.last_used > timedelta(seconds=TOUCH_SECONDS):
+                row.last_used = now
+                db.commit()
+            return response
+    except Exception as e:
+        log.warning("[llm_cache] Lectura fallida (%s).", e)
+        return None
+
+
+def put(key: str, model: str, response: str) -> None:
+    """Stores a response, then purges expired entries and evicts beyond MAX_ENTRIES."""
+    if not ENABLED or not response:
+        return
+    now = datetime.utcnow()
+    try:
+        with database.SessionLocal() as db:
+            db.merge(
+                LLMCacheDB(
+                    key=key,
+                    model=model,
+                    response=response,
+                    created_at=now,
+                    last_used=now,
+                )
+            )
+            db.query(LLMCacheDB).filter(
+                LLMCacheDB.created_at < now - timedelta(seconds=TTL)
+            ).delete(synchronize_session=False)
+            db.flush()
+            excess = db.query(LLMCacheDB).count() - MAX_ENTRIES
+            if excess > 0:
+                oldest = [
+                    k
+                    for (k,) in db.query(LLMCacheDB.key)
+                    .order_by(LLMCacheDB.last_used.asc())
+                    .limit(excess)
+                ]
+                db.query(LLMCacheDB).filter(LLMCacheDB.key.in_(oldest)).delete(
+                    synchronize_session=False
+                )
+            db.commit()
+    except Exception as e:
+        log.warning("[llm_cache] Escritura fallida (%s).", e)
+
+
+def stats() -> dict:
+    try:
+        with database.SessionLocal() as db:
+            entries = db.query(LLMCacheDB).count()
+    except Exception:
+        entries = None
+    return {
+        "enabled": ENABLED,
+        "entries": entries,
+        "ttl": TTL,
+        "max_entries": MAX_ENTRIES,
+    }
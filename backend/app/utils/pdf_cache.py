@@ -0,0 +1,166 @@
+"""
+On-disk cache of rendered PDFs keyed by a hash of their content.
+
+The key is the SHA-256 of everything that ends up on the page (the delivery
+note row, its lines, the customer fields, the store name and the logo hash)
+plus RENDER_VERSION, so any change to the data produces a new key and stale
+entries are never served; they simply age out. The same key doubles as the
+HTTP ETag.
+
+Files live in PDF_CACHE_DIR and are evicted least-recently-used once their
+total size exceeds PDF_CACHE_MAX_MB (0 disables the cache). Each process
+keeps its own LRU order and tolerates files removed by another process.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import inspect
+
+log = logging.getLogger("pdf_cache")
+
+# Bump when the PDF layout changes so old renders are not reused
+RENDER_VERSION = "1"
+
+CACHE_DIR = Path(
+    os.getenv(
+        "PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "furnigest_pdf_cache")
+    )
+)
+MAX_BYTES = int(float(os.getenv("PDF_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+
+def row_values(obj) -> Optional[dict]:
+    """Column values of an ORM object (None stays None)."""
+    if obj is None:
+        return None
+    return {
+        attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs
+    }
+
+
+def content_key(kind: str, *parts) -> str:
+    payload = json.dumps(
+        [kind, RENDER_VERSION, *parts], sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def digest(data: Optional[bytes]) -> Optional[str]:
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+class PdfCache:
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _load(self) -> None:
+        """Adopts files left by a previous run, oldest access first."""
+        self._loaded = True
+        if not self.directory.is_dir():
+            return
+        files = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_atime, path.stem, st.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                self._forget(key)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Written by another process
+                self._entries[key] = len(data)
+                self._size += len(data)
+            self._entries.move_to_end(key)
+            os.utime(path)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if self.max_bytes <= 0 or not data or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._path(key).unlink(missing_ok=True)
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+cache = PdfCache()
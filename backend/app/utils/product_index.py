@@ -0,0 +1,389 @@
+"""
+Process-local, accent-insensitive search index over the product catalogue.
+
+Every product is reduced to normalized tokens (NFD without combining marks,
+lower case, split on non-alphanumerics) of its name, description and supplier
+name. The index keeps:
+  - the products sorted by normalized name, so name prefixes are a bisect,
+  - a sorted token vocabulary (prefix lookups are a bisect as well),
+  - a trigram -> tokens inverted index for substring and fuzzy lookups,
+  - token -> product ids postings, for the name and for all fields.
+
+search() ranks exact name > name prefix > word prefix in the name > substring
+(name, description or supplier) > fuzzy (edit distance 1, 2 for words of 8+
+characters), ties by name. Terms of one or two characters only match prefixes.
+
+The index is built on the first search and updated incrementally by
+productos_service and the supplier endpoints. Writes that bypass them (seed,
+another worker process) are picked up by a background rebuild once the index
+is older than PRODUCT_INDEX_MAX_AGE seconds (0 disables it).
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.app import database
+from backend.app.entidades.producto import ProductDB
+from backend.app.entidades.proveedor import SupplierDB
+from backend.app.utils.text_search import normalize, tokenize
+
+log = logging.getLogger("product_index")
+
+MAX_AGE = float(os.getenv("PRODUCT_INDEX_MAX_AGE", "300"))
+
+
+def _trigrams(token: str) -> set[str]:
+    return {token[i : i + 3] for i in range(len(token) - 2)}
+
+
+def _within(a: str, b: str, k: int) -> bool:
+    """Levenshtein distance between a and b is at most k (banded DP)."""
+    if abs(len(a) - len(b)) > k:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [k + 1] * len(b)
+        for j in range(max(1, i - k), min(len(b), i + k) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != b[j - 1]),
+            )
+        if min(current) > k:
+            return False
+        previous = current
+    return previous[-1] <= k
+
+
+class _Doc(NamedTuple):
+    key: str
+    name: Optional[str]
+    description: Optional[str]
+    supplier_id: Optional[int]
+    name_tokens: frozenset[str]
+    tokens: frozenset[str]
+
+
+class _Catalog:
+    """The index structures; callers hold ProductIndex's lock."""
+
+    def __init__(self):
+        self.docs: dict[int, _Doc] = {}
+        self.names: list[tuple[str, int]] = []
+        self.vocab: list[str] = []
+        self.grams: dict[str, set[str]] = {}
+        self.postings: dict[str, set[int]] = {}
+        self.name_postings: dict[str, set[int]] = {}
+        self.suppliers: dict[int, str] = {}
+        self.by_supplier: dict[int, set[int]] = {}
+
+    # ---------- Updates ----------
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Bulk add of (id, name, description, supplier_id), sorting once."""
+        for row in rows:
+            self.add(*row, keep_sorted=False)
+        self.names.sort()
+        self.vocab.sort()
+
+    def add(
+        self, product_id, name, description, supplier_id, keep_sorted: bool = True
+    ) -> None:
+        put = bisect.insort if keep_sorted else list.append
+        key = normalize(name)
+        name_tokens = frozenset(tokenize(key))
+        tokens = name_tokens.union(
+            tokenize(normalize(description)),
+            tokenize(self.suppliers.get(supplier_id, "")),
+        )
+        self.docs[product_id] = _Doc(
+            key, name, description, supplier_id, name_tokens, tokens
+        )
+        put(self.names, (key, product_id))
+        self.by_supplier.setdefault(supplier_id, set()).add(product_id)
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                put(self.vocab, token)
+                for gram in _trigrams(token):
+                    self.grams.setdefault(gram, set()).add(token)
+            ids.add(product_id)
+        for token in name_tokens:
+            self.name_postings.setdefault(token, set()).add(product_id)
+
+    def remove(self, product_id: int) -> Optional[_Doc]:
+        doc = self.docs.pop(product_id, None)
+        if doc is None:
+            return None
+        _discard_sorted(self.names, (doc.key, product_id))
+        self.by_supplier.get(doc.supplier_id, set()).discard(product_id)
+        for token in doc.name_tokens:
+            _discard_posting(self.name_postings, token, product_id)
+        for token in doc.tokens:
+            if _discard_posting(self.postings, token, product_id):
+                _discard_sorted(self.vocab, token)
+                for gram in _trigrams(token):
+                    _discard_posting(self.grams, gram, token)
+        return doc
+
+    # ---------- Lookups ----------
+    def prefixed(self, prefix: str) -> list[str]:
+        i = bisect.bisect_left(self.vocab, prefix)
+        out = []
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def containing(self, fragment: str) -> list[str]:
+        """Tokens containing the fragment (only prefixes if it is that short)."""
+        if len(fragment) < 3:
+            return self.prefixed(fragment)
+        postings = sorted(
+            (self.grams.get(g, set()) for g in _trigrams(fragment)), key=len
+        )
+        candidates = postings[0].intersection(*postings[1:])
+        return [t for t in candidates if fragment in t]
+
+    def similar(self, token: str) -> list[str]:
+        """Tokens within edit distance 1 (2 for 8+ characters)."""
+        if len(token) < 4:
+            return []
+        k = 2 if len(token) >= 8 else 1
+        grams = _trigrams(token)
+        shared: dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.grams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        # An edit destroys at most three trigrams
+        needed = max(1, len(grams) - 3 * k)
+        return [t for t, n in shared.items() if n >= needed and _within(token, t, k)]
+
+    def matching(
+        self,
+        terms: list[str],
+        lookup: Callable[[str], Iterable[str]],
+        postings: dict[str, set[int]],
+    ) -> set[int]:
+        """Products where every term matches some token through lookup()."""
+        groups = []
+        for term in terms:
+            lists = [postings[t] for t in lookup(term) if t in postings]
+            if not lists:
+                return set()
+            groups.append((sum(map(len, lists)), lists))
+        groups.sort(key=lambda g: g[0])
+        result = set().union(*groups[0][1])
+        for _, lists in groups[1:]:
+            result &= lists[0] if len(lists) == 1 else set().union(*lists)
+            if not result:
+                break
+        return result
+
+    def search(self, query: str, limit: int) -> list[int]:
+        q = normalize(query).strip()
+        terms = tokenize(q)
+        if not terms or limit <= 0:
+            return []
+        ranked: list[int] = []
+        seen: set[int] = set()
+
+        def take(ids: set[int]) -> bool:
+            best = heapq.nsmallest(
+                limit - len(ranked), ids - seen, key=lambda i: (self.docs[i].key, i)
+            )
+            seen.update(best)
+            ranked.extend(best)
+            return len(ranked) >= limit
+
+        # Exact name, then names starting with the query: already in name order
+        i = bisect.bisect_left(self.names, (q, -1))
+        while i < len(self.names) and self.names[i][0].startswith(q):
+            seen.add(self.names[i][1])
+            ranked.append(self.names[i][1])
+            if len(ranked) >= limit:
+                return ranked
+            i += 1
+
+        def fuzzy(term: str) -> list[str]:
+            return self.containing(term) + self.similar(term)
+
+        tiers = (
+            (self.prefixed, self.name_postings),
+            (self.containing, self.postings),
+            (fuzzy, self.postings),
+        )
+        for lookup, postings in tiers:
+            if take(self.matching(terms, lookup, postings)):
+                break
+        return ranked
+
+
+def _discard_sorted(items: list, value) -> None:
+    i = bisect.bisect_left(items, value)
+    if i < len(items) and items[i] == value:
+        del items[i]
+
+
+def _discard_posting(postings: dict, key, value) -> bool:
+    """Removes value from postings[key]; True if the key became empty."""
+    values = postings.get(key)
+    if values is None:
+        return False
+    values.discard(value)
+    if values:
+        return False
+    del postings[key]
+    return True
+
+
+class ProductIndex:
+    """Thread-safe wrapper: lazy build, incremental updates, stale refresh."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._catalog = _Catalog()
+        self.built_at: Optional[float] = None
+        self._rebuilding = False
+        # Changes made while a background rebuild reads the table
+        self._pending: Optional[list[tuple]] = None
+
+    def __len__(self) -> int:
+        return len(self._catalog.docs)
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._catalog = _Catalog()
+            self.built_at = None
+            self._pending = None
+
+    def build(self, db: Session) -> None:
+        """Loads the whole catalogue with one query and replaces the index."""
+        started = time.perf_counter()
+        rows = (
+            db.query(
+                ProductDB.id,
+                ProductDB.name,
+                ProductDB.description,
+                ProductDB.supplier_id,
+                SupplierDB.name,
+            )
+            .outerjoin(SupplierDB, SupplierDB.id == ProductDB.supplier_id)
+            .all()
+        )
+        catalog = _Catalog()
+        for _, _, _, supplier_id, supplier in rows:
+            catalog.suppliers.setdefault(supplier_id, normalize(supplier))
+        catalog.load(row[:4] for row in rows)
+        with self._lock:
+            self._catalog, self.built_at = catalog, time.monotonic()
+            pending, self._pending = self._pending, None
+            for op, *args in pending or ():
+                getattr(self, op)(*args)
+        log.info(
+            "[product_index] %d productos indexados en %.0fms",
+            len(rows),
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def ensure(self, db: Session) -> None:
+        """Builds the index on first use and refreshes it in the background when stale."""
+        if not self.ready:
+            with self._lock:
+                if not self.ready:
+                    self.build(db)
+            return
+        if MAX_AGE > 0 and time.monotonic() - self.built_at > MAX_AGE:
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding, self._pending = True, []
+
+        def run():
+            try:
+                with database.SessionLocal() as db:
+                    self.build(db)
+            except Exception as e:
+                log.warning("[product_index] Reconstrucción fallida (%s).", e)
+                with self._lock:
+                    self._pending = None
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name="product-index", daemon=True).start()
+
+    def _track(self, *change) -> bool:
+        """Records a change for the rebuild in progress; False while not built."""
+        if self._pending is not None:
+            self._pending.append(change)
+        return self.ready
+
+    def upsert(
+        self,
+        product_id: int,
+        name: Optional[str],
+        description: Optional[str],
+        supplier_id: Optional[int],
+        supplier_name: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            if not self._track(
+                "upsert", product_id, name, description, supplier_id, supplier_name
+            ):
+                return
+            catalog = self._catalog
+            catalog.remove(product_id)
+            if supplier_id not in catalog.suppliers:
+                catalog.suppliers[supplier_id] = normalize(supplier_name)
+            catalog.add(product_id, name, description, supplier_id)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            if self._track("remove", product_id):
+                self._catalog.remove(product_id)
+
+    def rename_supplier(self, supplier_id: int, name: Optional[str]) -> None:
+        """Re-indexes the products of a supplier after its name changed."""
+        with self._lock:
+            if not self._track("rename_supplier", supplier_id, name):
+                return
+            catalog = self._catalog
+            catalog.suppliers[supplier_id] = normalize(name)
+            for product_id in list(catalog.by_supplier.get(supplier_id, ())):
+                doc = catalog.remove(product_id)
+                catalog.add(product_id, doc.name, doc.description, supplier_id)
+
+    def search(self, query: str, limit: int = 20) -> list[int]:
+        """Product ids for the query, best match first."""
+        with self._lock:
+            return self._catalog.search(query, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            catalog = self._catalog
+            return {
+                "products": len(catalog.docs),
+                "tokens": len(catalog.vocab),
+                "trigrams": len(catalog.grams),
+                "age_seconds": (
+                    round(time.monotonic() - self.built_at, 1) if self.ready else None
+                ),
+                "max_age_seconds": MAX_AGE,
+            }
+
+
+index = ProductIndex()
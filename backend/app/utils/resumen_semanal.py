@@ -1,27 +1,49 @@
 """
 resumen_semanal.py — Genera y envía el resumen periódico de actividad.
 
-El APScheduler lo invoca cada minuto. La función comprueba si la hora
-actual coincide con `resumen_hora_envio` (Europe/Madrid) y si han
-transcurrido `resumen_intervalo_dias` días desde el último envío.
+En lugar de sondear cada minuto, schedule() programa un único disparo en la
+fecha calculada por next_run_at() a partir de `resumen_hora_envio`
+(Europe/Madrid), `resumen_intervalo_dias`, `resumen_ultima_vez` y
+`resumen_fecha_inicio`. Tras cada ejecución, y cuando se escribe una clave
+`resumen_*`, reschedule() recalcula el siguiente. Un envío atrasado (proceso
+parado a esa hora) se dispara en cuanto arranca el scheduler.
+
+Con varios workers o réplicas, todos programan el disparo pero solo el que
+obtiene el lease `resumen` en la BD envía el correo; los demás ven
+`resumen_ultima_vez` actualizado y pasan al siguiente periodo. Un trabajo de
+resincronización cada RESUMEN_RESYNC_MINUTES recoge cambios de configuración
+hechos en otros procesos.
 """
 
 import logging
+import os
 import re
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from zoneinfo import ZoneInfo
 
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 
 from backend.app.database import SessionLocal
 from backend.app.entidades.movimiento import MovementDB
 from backend.app.entidades.albaran import DeliveryNoteDB
 from backend.app.entidades.configuracion import ConfigDB
+from backend.app.utils import config_cache, job_lease
 from backend.app.utils.groq_llm import groq_chat
-from backend.app.utils.emailer import send_email_simple
+from backend.app.utils.email_outbox import enqueue as enqueue_email
 
 log = logging.getLogger("resumen_semanal")
 
+TZ = ZoneInfo("Europe/Madrid")
+JOB_ID = "resumen_periodico"
+LEASE_NAME = "resumen"
+LEASE_SECONDS = float(os.getenv("RESUMEN_LEASE_SECONDS", "600"))
+RETRY_SECONDS = float(os.getenv("RESUMEN_RETRY_SECONDS", "300"))
+RESYNC_MINUTES = float(os.getenv("RESUMEN_RESYNC_MINUTES", "10"))
+
+_scheduler = None
+
 
 def _md_to_html(text: str) -> str:
     """Convert minimal markdown (bold, italic, line breaks) to inline HTML for emails."""
@@ -50,8 +72,7 @@ _DEFAULTS = {
 
 
 def _get(db: Session, key: str) -> str:
-    row = db.query(ConfigDB).filter(ConfigDB.key == key).first()
-    return row.value if row and row.value else _DEFAULTS.get(key, "")
+    return config_cache.get(db, key, _DEFAULTS.get(key, ""))
 
 
 def _set(db: Session, key: str, value: str) -> None:
@@ -63,22 +84,108 @@ def _set(db: Session, key: str, value: str) -> None:
     db.commit()
 
 
+def _parse_date(value: str) -> date | None:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _send_time(value: str) -> time:
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        return time.fromisoformat(_DEFAULTS["resumen_hora_envio"])
+
+
+def next_run_at(db: Session, now: datetime | None = None) -> datetime | None:
+    """
+    Próximo envío (Europe/Madrid), o None si no hay destinatario. Puede
+    quedar en el pasado: es un envío atrasado que hay que recuperar.
+    """
+    if not _get(db, "resumen_email_destino"):
+        return None
+    now = now or datetime.now(tz=TZ)
+    send_time = _send_time(_get(db, "resumen_hora_envio"))
+    last = _parse_date(_get(db, "resumen_ultima_vez"))
+    if last:
+        interval = max(1, int(_get(db, "resumen_intervalo_dias") or "7"))
+        day = last + timedelta(days=interval)
+    else:
+        # Primer envío: hoy si aún no ha pasado la hora, si no mañana
+        day = now.date()
+        if datetime.combine(day, send_time, tzinfo=TZ) <= now:
+            day += timedelta(days=1)
+    start = _parse_date(_get(db, "resumen_fecha_inicio"))
+    if start and start > day:
+        day = start
+    return datetime.combine(day, send_time, tzinfo=TZ)
+
+
+def reschedule(min_delay: float = 0) -> datetime | None:
+    """(Re)programa el disparo del resumen; no hace nada sin scheduler activo."""
+    scheduler = _scheduler
+    if scheduler is None or not scheduler.running:
+        return None
+    with SessionLocal() as db:
+        run_at = next_run_at(db)
+    if run_at is None:
+        if scheduler.get_job(JOB_ID):
+            scheduler.remove_job(JOB_ID)
+        log.info("[resumen] Sin email configurado — sin envío programado.")
+        return None
+    run_at = max(run_at, datetime.now(tz=TZ) + timedelta(seconds=min_delay))
+    scheduler.add_job(
+        job_resumen_semanal,
+        DateTrigger(run_date=run_at),
+        id=JOB_ID,
+        replace_existing=True,
+        misfire_grace_time=None,
+    )
+    log.info("[resumen] Próximo envío: %s", run_at.isoformat(timespec="minutes"))
+    return run_at
+
+
+def schedule(scheduler) -> None:
+    """
+    Registra la resincronización y programa el envío (recuperando uno
+    atrasado). El scheduler debe estar ya arrancado.
+    """
+    global _scheduler
+    _scheduler = scheduler
+    scheduler.add_job(
+        reschedule,
+        IntervalTrigger(minutes=RESYNC_MINUTES),
+        id=f"{JOB_ID}_resync",
+        replace_existing=True,
+    )
+    reschedule()
+
+
 def job_resumen_semanal() -> None:
-    """Entry point invocado por APScheduler (cada minuto)."""
+    """Entry point invocado por APScheduler a la hora de next_run_at()."""
     db = SessionLocal()
     try:
-        hora_envio = _get(db, "resumen_hora_envio") or "08:30"
-        now_hhmm = datetime.now(tz=ZoneInfo("Europe/Madrid")).strftime("%H:%M")
-        if now_hhmm != hora_envio:
+        if not job_lease.acquire(db, LEASE_NAME, LEASE_SECONDS):
+            log.info("[resumen] Otro proceso está enviando el resumen — omitido.")
             return
-        _run(db)
+        try:
+            # resumen_ultima_vez puede haberlo escrito otro proceso
+            config_cache.invalidate()
+            _run(db)
+        except Exception as exc:
+            db.rollback()
+            log.exception("[resumen] Error en job_resumen_semanal: %s", exc)
+        job_lease.release(db, LEASE_NAME)
     except Exception as exc:
         log.exception("[resumen] Error en job_resumen_semanal: %s", exc)
     finally:
         db.close()
+        # Sin envío (fallo, lease ocupado) no se reintenta antes de RETRY_SECONDS
+        reschedule(min_delay=RETRY_SECONDS)
 
 
-def _run(db: Session) -> None:
+def _run(db: Session, now: datetime | None = None) -> None:
     email_destino = _get(db, "resumen_email_destino")
     if not email_destino:
         log.info("[resumen] Sin email configurado — omitido.")
@@ -86,7 +193,8 @@ def _run(db: Session) -> None:
 
     intervalo = max(1, int(_get(db, "resumen_intervalo_dias") or "7"))
     last_time_str = _get(db, "resumen_ultima_vez")
-    today = date.today()
+    # Same calendar as next_run_at(), whatever the server's timezone
+    today = (now or datetime.now(tz=TZ)).astimezone(TZ).date()
 
     if last_time_str:
         try:
@@ -164,10 +272,10 @@ def _run(db: Session) -> None:
         db=db,
     )
     subject = f"Resumen {store_name} - {from_date.strftime('%d/%m')}-{today.strftime('%d/%m/%Y')}"
-    send_email_simple(email_destino, subject, html)
+    enqueue_email(db, email_destino, subject, html)
 
     _set(db, "resumen_ultima_vez", today.isoformat())
-    log.info("[resumen] Resumen enviado a %s", email_destino)
+    log.info("[resumen] Resumen en cola para %s", email_destino)
 
 
 def _next_month_label(ref: date) -> str:
@@ -0,0 +1,50 @@
+"""
+Session events that tell an in-process cache when some of its models change.
+
+watch(models, on_change) calls on_change() as soon as a session flushes or
+bulk-writes (insert(Model), query().update()/delete()) any of the models, and
+again when that session commits or rolls back: a reader that refilled the
+cache between the flush and the end of the transaction may have seen data
+that is now committed or gone.
+"""
+
+from itertools import chain, count
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_ids = count()
+
+
+def watch(models: tuple[type, ...], on_change: Callable[[], object]) -> None:
+    flag = f"watch_dirty_{next(_ids)}"
+
+    def mark_dirty(session: Session) -> None:
+        session.info[flag] = True
+        on_change()
+
+    def after_flush(session: Session, _flush_context) -> None:
+        # In after_flush new/dirty/deleted still hold the pre-flush state
+        if any(
+            isinstance(obj, models)
+            for obj in chain(session.new, session.dirty, session.deleted)
+        ):
+            mark_dirty(session)
+
+    def after_bulk_write(state) -> None:
+        # Bulk query().delete()/update() and insert(Model) bypass the flush
+        if not (state.is_insert or state.is_update or state.is_delete):
+            return
+        mapper = state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, models):
+            mark_dirty(state.session)
+
+    def after_transaction(session: Session) -> None:
+        if session.info.pop(flag, False):
+            on_change()
+
+    event.listen(Session, "after_flush", after_flush)
+    event.listen(Session, "do_orm_execute", after_bulk_write)
+    event.listen(Session, "after_commit", after_transaction)
+    event.listen(Session, "after_rollback", after_transaction)
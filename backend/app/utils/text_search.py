@@ -0,0 +1,21 @@
+"""
+Text normalization shared by the in-process search features (product index,
+customer search): accent-insensitive lower case and word tokens.
+"""
+
+import re
+import unicodedata
+from typing import Optional
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_MARKS_RE = re.compile(r"[\u0300-\u036f]")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lower case without diacritics (NFD, combining marks removed)."""
+    nfd = unicodedata.normalize("NFD", text or "")
+    return (nfd if nfd.isascii() else _MARKS_RE.sub("", nfd)).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text)
@@ -0,0 +1,106 @@
+"""
+Short-lived cache of the authenticated user for get_current_user().
+
+Entries are snapshots (id, username, role, active flag; never the password
+hash) keyed by (username, token iat, version). The version is bumped whenever
+a session flushes, bulk-writes or commits changes to usuarios, so update_me or
+any other user write makes every cached entry unreachable at once; other
+worker processes see the change after AUTH_CACHE_TTL seconds at most.
+
+With AUTH_TRUST_CLAIMS_SECONDS > 0 a token younger than that window is trusted
+on its signed claims (uid, role, active) and no lookup is made at all.
+
+Size and TTL can be tuned with AUTH_CACHE_SIZE / AUTH_CACHE_TTL (0 disables).
+"""
+
+import os
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+
+from backend.app.entidades.usuario import UserDB
+from backend.app.utils.session_watch import watch
+from backend.app.utils.ttl_cache import TTLCache
+
+TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+TRUST_CLAIMS_SECONDS = float(os.getenv("AUTH_TRUST_CLAIMS_SECONDS", "0"))
+
+cache = TTLCache(maxsize=int(os.getenv("AUTH_CACHE_SIZE", "1024")), ttl=TTL)
+
+_version = 0
+_version_lock = threading.Lock()
+
+
+class CachedUser(NamedTuple):
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    def to_user(self) -> UserDB:
+        """Detached UserDB (not bound to any session)."""
+        return UserDB(
+            id=self.id,
+            username=self.username,
+            role=self.role,
+            is_active=self.is_active,
+        )
+
+
+def invalidate() -> None:
+    global _version
+    with _version_lock:
+        _version += 1
+
+
+def clear() -> None:
+    cache.clear()
+    invalidate()
+
+
+def stats() -> dict:
+    return {
+        **cache.stats(),
+        "version": _version,
+        "trust_claims_seconds": TRUST_CLAIMS_SECONDS,
+    }
+
+
+def from_claims(payload: dict) -> Optional[UserDB]:
+    """User built from the signed claims while the token is fresh enough."""
+    if TRUST_CLAIMS_SECONDS <= 0:
+        return None
+    claims = [payload.get(k) for k in ("uid", "sub", "role", "active", "iat")]
+    if any(v is None for v in claims):
+        return None
+    uid, username, role, active, iat = claims
+    if time.time() - float(iat) > TRUST_CLAIMS_SECONDS:
+        return None
+    return CachedUser(int(uid), username, role, bool(active)).to_user()
+
+
+def resolve(payload: dict, load: Callable[[], Optional[UserDB]]) -> Optional[UserDB]:
+    """
+    User for a verified token payload: from the claims, from the cache or
+    through load() (whose result is cached). None if the user does not exist.
+    """
+    user = from_claims(payload)
+    if user is not None:
+        return user
+    # Version read before loading, so a write that lands meanwhile is not
+    # hidden by this entry
+    key = (payload.get("sub"), payload.get("iat"), _version)
+    cached = cache.get(key) if TTL > 0 else None
+    if cached is None:
+        user = load()
+        if user is None:
+            return None
+        cached = CachedUser(user.id, user.username, user.role, bool(user.is_active))
+        if TTL > 0:
+            cache.set(key, cached)
+    return cached.to_user()
+
+
+# ---------- Invalidation ----------
+watch((UserDB,), invalidate)
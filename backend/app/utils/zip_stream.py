@@ -0,0 +1,51 @@
+"""
+ZIP archives written as a stream of chunks.
+
+zipfile can write to a non-seekable file: it then emits a data descriptor
+after each member instead of seeking back to patch its header. stream_zip()
+hands it a sink that only collects bytes and yields them after every member,
+so a response can start sending while later members are still being
+produced and only one member is ever held in memory.
+"""
+
+import io
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer that is emptied after each member."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(
+    members: Iterable[tuple[str, bytes]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> Iterator[bytes]:
+    """Yields a ZIP archive of (filename, data) members chunk by chunk."""
+    sink = _Sink()
+    timestamp = datetime.now().timetuple()[:6]
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=timestamp)
+            info.compress_type = compression
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            yield sink.take()
+    # Central directory, written on close
+    yield sink.take()
@@ -1,4 +1,4 @@
-import { apiFetch, apiFetchBlob } from './http.js';
+import { apiFetch, apiFetchBlob, apiStream } from './http.js';
 
 export const getAnalyticsSummary = (dateFrom, dateTo) => {
   const params = new URLSearchParams();
@@ -7,6 +7,22 @@ export const getAnalyticsSummary = (dateFrom, dateTo) => {
   return apiFetch(`analytics/summary?${params.toString()}`);
 };
 
+/**
+ * Streams the AI report generated in the background by analytics/summary.
+ * onToken receives each text fragment; resolves with the final report.
+ */
+export const streamAnalyticsReport = async (reportId, { signal, onToken } = {}) => {
+  let final = null;
+  await apiStream(`analytics/reports/${reportId}/stream`, {
+    signal,
+    onEvent: (event, data) => {
+      if (event === 'token') onToken?.(data.text);
+      else if (event === 'done') final = data;
+    },
+  });
+  return final;
+};
+
 export const getAnalyticsCompare = (dateFrom, dateTo) => {
   const params = new URLSearchParams();
   if (dateFrom) params.set('date_from', dateFrom);
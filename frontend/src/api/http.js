@@ -36,3 +36,38 @@ export async function apiFetchBlob(path, options = {}) {
   }
   return res.blob();
 }
+
+/**
+ * Reads a Server-Sent Events response and calls onEvent(event, data) for each
+ * message (data is parsed as JSON). Resolves when the server closes the stream.
+ */
+export async function apiStream(path, { signal, onEvent } = {}) {
+  const res = await fetch(`${API_URL}${path}`, {
+    signal,
+    headers: authHeaders({ Accept: 'text/event-stream' }),
+  });
+  if (!res.ok) {
+    const text = await res.text().catch(() => '');
+    throw new Error(`${res.status} ${res.statusText}${text ? ' – ' + text : ''}`);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = 'message';
+      const data = [];
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+      }
+      if (data.length) onEvent?.(event, JSON.parse(data.join('\n')));
+    }
+  }
+}
@@ -48,6 +48,8 @@ export default function Dashboard() {
   const [monthsWindowVentas, setMonthsWindowVentas] = useState(6);
   const [chartMode, setChartMode] = useState('ALL');
 
+  // KPIs agregados en el servidor (mes actual vs. anterior)
+  const summaryQuery = useQuery({ queryKey: ['dashboard', 'summary'], queryFn: () => apiFetch('dashboard/summary'), staleTime: 30_000 });
   // Data queries â€” stale-while-revalidate, shared cache across navegaciÃ³n
   const movsQuery = useQuery({ queryKey: ['movimientos'], queryFn: () => apiFetch('movimientos/get'), staleTime: 30_000 });
   const albQuery  = useQuery({ queryKey: ['albaranes'],   queryFn: () => apiFetch('albaranes/get'),   staleTime: 30_000 });
@@ -57,11 +59,6 @@ export default function Dashboard() {
     queryFn: async () => { try { return await apiFetch('transporte/almacen'); } catch { return []; } },
     staleTime: 30_000,
   });
-  useQuery({
-    queryKey: ['rutas'],
-    queryFn: async () => { try { return await apiFetch('transporte/ruta'); } catch { return []; } },
-    staleTime: 30_000,
-  });
   const incQuery  = useQuery({
     queryKey: ['incidencias'],
     queryFn: async () => { try { return await apiFetch('incidencias/get'); } catch { return []; } },
@@ -74,8 +71,11 @@ export default function Dashboard() {
   const clientes    = cliQuery.data   ?? [];
   const incidencias = incQuery.data   ?? [];
 
-  const queries    = [movsQuery, albQuery, cliQuery];
+  const summary    = summaryQuery.data ?? {};
+
+  const queries    = [summaryQuery, movsQuery, albQuery, cliQuery];
   const loading    = queries.some(q => q.isLoading);
+  const cardsLoading = summaryQuery.isLoading;
   const refreshing = queries.some(q => q.isFetching) && !loading;
   const err        = queries.map(q => q.error?.message).find(Boolean) || null;
   const clientesMap = useMemo(() => {
@@ -84,58 +84,21 @@ export default function Dashboard() {
     return m;
   }, [clientes]);
 
-  // MÃ©tricas del mes actual
+  // MÃ©tricas del mes actual y del anterior, desde dashboard/summary
   const now = new Date();
   const currY = now.getFullYear();
   const currM = now.getMonth();
-  const prevYM = useMemo(() => {
-    const dt = new Date(currY, currM - 1, 1);
-    return { y: dt.getFullYear(), m: dt.getMonth() };
-  }, [currY, currM]);
-
-  const { ingresosMes, egresosMes } = useMemo(() => {
-    let ingresos = 0, egresos = 0;
-    for (const m of movs) {
-      const d = new Date(m.date);
-      if (d.getFullYear() === currY && d.getMonth() === currM) {
-        if (m.type === 'INGRESO') ingresos += Number(m.amount || 0);
-        else if (m.type === 'EGRESO') egresos += Number(m.amount || 0);
-      }
-    }
-    return { ingresosMes: Math.round(ingresos * 100) / 100, egresosMes: Math.round(egresos * 100) / 100 };
-  }, [movs, currY, currM]);
-
-  const { ingresosPrev, egresosPrev } = useMemo(() => {
-    let ingresos = 0, egresos = 0;
-    for (const m of movs) {
-      const d = new Date(m.date);
-      if (d.getFullYear() === prevYM.y && d.getMonth() === prevYM.m) {
-        if (m.type === 'INGRESO') ingresos += Number(m.amount || 0);
-        else if (m.type === 'EGRESO') egresos += Number(m.amount || 0);
-      }
-    }
-    return { ingresosPrev: Math.round(ingresos * 100) / 100, egresosPrev: Math.round(egresos * 100) / 100 };
-  }, [movs, prevYM]);
-
-  const ventasMes = useMemo(() => {
-    let n = 0;
-    for (const a of albaranes) {
-      const d = new Date(a.date);
-      if (d.getFullYear() === currY && d.getMonth() === currM) n += 1;
-    }
-    return n;
-  }, [albaranes, currY, currM]);
 
-  const ventasPrev = useMemo(() => {
-    let n = 0;
-    for (const a of albaranes) {
-      const d = new Date(a.date);
-      if (d.getFullYear() === prevYM.y && d.getMonth() === prevYM.m) n += 1;
-    }
-    return n;
-  }, [albaranes, prevYM]);
+  const period      = summary.period ?? {};
+  const previous    = summary.previous ?? {};
+  const ingresosMes  = Number(period.income ?? 0);
+  const egresosMes   = Number(period.expense ?? 0);
+  const ingresosPrev = Number(previous.income ?? 0);
+  const egresosPrev  = Number(previous.expense ?? 0);
+  const ventasMes    = Number(period.delivery_notes ?? 0);
+  const ventasPrev   = Number(previous.delivery_notes ?? 0);
 
-  const pedidosAlmacen = almacen.length;
+  const pedidosAlmacen = Number(summary.warehouse ?? 0);
 
   // Serie ingresos/egresos (con filtros ING/EGR)
   const lineSeries = useMemo(() => {
@@ -203,20 +166,16 @@ export default function Dashboard() {
   }, [albaranes, currY, currM, monthsWindowVentas, i18n.language]);
 
   // Pie de estados de albaranes
+  const byStatus = summary.delivery_notes_by_status;
   const pieData = useMemo(() => {
-    const counts = { FIANZA: 0, ALMACEN: 0, RUTA: 0, ENTREGADO: 0 };
-    for (const a of albaranes) {
-      const e = (a.status || 'FIANZA').toUpperCase();
-      if (counts[e] === undefined) counts[e] = 0;
-      counts[e] += 1;
-    }
+    const counts = byStatus ?? {};
     const labels = [t('dashboard.stateFianza'), t('dashboard.stateAlmacen'), t('dashboard.stateRuta'), t('dashboard.stateEntregado')];
     const data = [counts.FIANZA || 0, counts.ALMACEN || 0, counts.RUTA || 0, counts.ENTREGADO || 0];
     const backgroundColor = isDark
       ? ['#4ade80', '#fb923c', '#60a5fa', '#94a3b8']
       : ['#d7e8cf', '#f3e3c8', '#cbd5e1', '#e2e8f0'];
     return { labels, datasets: [{ data, backgroundColor }] };
-  }, [albaranes, i18n.language, isDark]);
+  }, [byStatus, i18n.language, isDark]);
 
   // Ãšltimos 8 movimientos
   const ultimosMovs = useMemo(() => {
@@ -294,7 +253,7 @@ export default function Dashboard() {
 
       {/* Tarjetas */}
       <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-4">
-        {loading ? (
+        {cardsLoading ? (
           <>
             <SkeletonCard />
             <SkeletonCard />
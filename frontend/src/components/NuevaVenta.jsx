@@ -182,7 +182,7 @@ export default function NuevaVenta() {
 
       try {
         let data = [];
-        const trySearch = await fetch(`${API_URL}clientes/search?q=${encodeURIComponent(clientQuery)}`);
+        const trySearch = await fetch(`${API_URL}clientes/search?q=${encodeURIComponent(clientQuery)}&limit=8`);
         if (trySearch.ok) {
           data = await trySearch.json();
         } else {
@@ -257,17 +257,11 @@ export default function NuevaVenta() {
           setActiveIdx(-1);
           return;
         }
+        // The backend already ranks (exact > prefix > substring > fuzzy) and also
+        // matches description and supplier, so keep its order as is
         const data = await res.json();
-        const normalize = (s = '') => s.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
-        const nq = normalize(query);
-        const scored = data
-          .map((p) => ({ p, score: normalize(p.name).indexOf(nq) }))
-          .filter((x) => x.score >= 0)
-          .sort((a, b) => a.score - b.score)
-          .map((x) => x.p);
-
-        setSugerencias(scored);
-        setActiveIdx(scored.length ? 0 : -1);
+        setSugerencias(data);
+        setActiveIdx(data.length ? 0 : -1);
       } catch (err) {
         console.warn('Product search error:', err);
         setSugerencias([]);
@@ -15,6 +15,7 @@ import {
 } from "chart.js";
 import { Bar, Line } from "react-chartjs-2";
 import { API_URL } from '../config.js';
+import { streamAnalyticsReport } from '../api/analytics.js';
 import i18n from '../i18n.js';
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, BarElement, Title, Tooltip, Legend);
@@ -112,7 +113,16 @@ export default function TendenciasPage() {
           signal: controller.signal,
         });
         if (!res.ok) throw new Error(`${res.status} ${res.statusText} – ${await res.text()}`);
-        setSummary(await res.json());
+        const data = await res.json();
+        // Las métricas se pintan ya; el informe IA llega después por streaming
+        setSummary(data);
+        if (!data.ai_report && data.report_id) {
+          streamAnalyticsReport(data.report_id, {
+            signal: controller.signal,
+            onToken: (text) =>
+              setSummary((prev) => (prev ? { ...prev, ai_report: (prev.ai_report || "") + text } : prev)),
+          }).catch(() => {});
+        }
 
         try {
           sileo.success({
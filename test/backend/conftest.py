@@ -30,6 +30,16 @@ def _enable_foreign_keys(dbapi_connection, _):
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # â”€â”€ Parchear el mÃ³dulo database ANTES de importar la app â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€
+import os  # noqa: E402
+import tempfile  # noqa: E402
+
+# Sin workers del outbox: los tests vacían la cola explícitamente
+os.environ.setdefault("EMAIL_WORKERS", "0")
+# PDFs renderizados en el propio hilo, sin procesos de render
+os.environ.setdefault("PDF_RENDER_WORKERS", "0")
+# Caché de PDFs en un directorio propio de la sesión de tests
+os.environ.setdefault("PDF_CACHE_DIR", tempfile.mkdtemp(prefix="furnigest_test_pdf_"))
+
 import backend.app.database as _db_module  # noqa: E402
 _db_module.engine = engine
 _db_module.SessionLocal = TestingSessionLocal
@@ -50,10 +60,21 @@ import backend.app.entidades.producto       # noqa: F401
 import backend.app.entidades.proveedor      # noqa: F401
 import backend.app.entidades.stripe_checkout  # noqa: F401
 import backend.app.entidades.usuario        # noqa: F401
+import backend.app.entidades.venta_diaria   # noqa: F401
+import backend.app.entidades.rfm_cliente    # noqa: F401
+import backend.app.entidades.llm_cache      # noqa: F401
+import backend.app.entidades.job_lease      # noqa: F401
+import backend.app.entidades.email_outbox   # noqa: F401
 
 from backend.app.entidades.usuario import UserDB
 from backend.app.dependencies import get_current_user
 from backend.app.utils.jwt_utils import create_access_token
+from backend.app.utils import analytics_cache
+from backend.app.services import dashboard_service
+from backend.app.utils.product_index import index as product_index
+from backend.app.utils import user_cache
+from backend.app.utils import config_cache
+from backend.app.utils import pdf_cache
 
 
 # â”€â”€ Override de get_db â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€
@@ -72,6 +93,13 @@ def setup_db():
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    # Las tablas se recrean vacías: la caché de analíticas no debe sobrevivir al test
+    analytics_cache.clear()
+    dashboard_service.cache.clear()
+    product_index.clear()
+    user_cache.clear()
+    config_cache.invalidate()
+    pdf_cache.cache.clear()
 
 
 @pytest.fixture()
@@ -9,8 +9,8 @@ def mock_email_y_pdf():
     """Neutraliza el envÃƒÂ­o de email y la generaciÃƒÂ³n de PDF en TODOS los tests
     de este mÃƒÂ³dulo.  AsÃƒÂ­ no se realizan conexiones SMTP ni se intenta renderizar
     un PDF durante la ejecuciÃƒÂ³n de la suite."""
-    with patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None), \
-         patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b""), \
+    with patch("backend.app.api.albaranes.enqueue_email", return_value=None), \
+         patch("backend.app.services.pdf_render_service.render", return_value=b""), \
          patch("backend.app.api.albaranes.render", return_value="<html></html>"):
         yield
 
@@ -89,6 +89,163 @@ class TestCrearAlbaran:
         assert fianzas[0]["amount"] == 2.0
 
 
+class TestCreacionEnUnaTransaccion:
+    """Benchmark de round trips: crear un albarán cuesta las mismas consultas
+    y un único commit tenga 1 o 50 líneas."""
+
+    @pytest.fixture()
+    def contador(self):
+        from sqlalchemy import event
+        from test.backend.conftest import engine
+        cuenta = {"sql": 0, "commits": 0}
+
+        def _sql(*_args):
+            cuenta["sql"] += 1
+
+        def _commit(_conn):
+            cuenta["commits"] += 1
+
+        event.listen(engine, "before_cursor_execute", _sql)
+        event.listen(engine, "commit", _commit)
+        yield cuenta
+        event.remove(engine, "before_cursor_execute", _sql)
+        event.remove(engine, "commit", _commit)
+
+    def _productos(self, client, proveedor, n):
+        return [
+            client.post("/api/productos/post", json={
+                "name": f"P{i}", "description": "", "price": 1.0 + i,
+                "supplier_id": proveedor["id"],
+            }).json()["id"]
+            for i in range(n)
+        ]
+
+    def _crear(self, client, contador, cliente_id, items):
+        contador["sql"] = contador["commits"] = 0
+        r = client.post("/api/albaranes/post", json={
+            "date": "2026-03-01", "customer_id": cliente_id, "items": items,
+        })
+        assert r.status_code == 200
+        return dict(contador), r.json()
+
+    def test_round_trips_constantes(self, client, cliente_fixture, proveedor, contador):
+        productos = self._productos(client, proveedor, 10)
+        medidas = {}
+        for n in (1, 5, 50):
+            items = [{"product_id": productos[i % 10], "quantity": 1} for i in range(n)]
+            medidas[n], body = self._crear(client, contador, cliente_fixture["id"], items)
+            assert len(body["items"]) == n
+        assert medidas[1] == medidas[5] == medidas[50]
+        assert medidas[50]["commits"] == 1
+
+    def test_precio_del_producto_por_defecto(self, client, cliente_fixture, proveedor, contador):
+        p0, p1 = self._productos(client, proveedor, 2)
+        _, body = self._crear(client, contador, cliente_fixture["id"], [
+            {"product_id": p0, "quantity": 2},
+            {"product_id": p1, "quantity": 1, "unit_price": 7.5},
+        ])
+        assert body["total"] == 9.5
+        assert body["fianza_pagada"] == 2.85
+
+    def test_producto_inexistente_no_escribe_nada(self, client, cliente_fixture, producto):
+        r = client.post("/api/albaranes/post", json={
+            "date": "2026-03-01", "customer_id": cliente_fixture["id"],
+            "items": [{"product_id": producto["id"], "quantity": 1}, {"product_id": 9999, "quantity": 1}],
+        })
+        assert r.status_code == 404
+        assert client.get("/api/albaranes/get").json() == []
+        assert client.get("/api/movimientos/get").json() == []
+
+
+class TestImportacionMasiva:
+    """POST /albaranes/bulk con NDJSON y CSV."""
+
+    def _ndjson(self, *rows):
+        import json
+        return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in rows) + "\n"
+
+    def _post(self, client, body, content_type="application/x-ndjson", **params):
+        return client.post(
+            "/api/albaranes/bulk", content=body.encode("utf-8"),
+            headers={"Content-Type": content_type}, params=params,
+        )
+
+    def test_ndjson_crea_albaranes_y_reporta_errores(self, client, cliente_fixture, producto):
+        nuevo = {"name": "Ana", "surnames": "Ruiz", "dni": "11111111B", "email": "ana@test.com"}
+        body = self._ndjson(
+            {"date": "2026-03-01", "customer_id": cliente_fixture["id"],
+             "items": [{"product_id": producto["id"], "quantity": 2}]},
+            {"date": "2026-03-02", "customer": nuevo,
+             "items": [{"product_id": producto["id"], "quantity": 1, "unit_price": 4.0}]},
+            "{no es json",
+            {"date": "2026-03-02", "customer": {**nuevo, "city": "Madrid"},
+             "items": [{"product_id": producto["id"], "quantity": 1}], "deposit_amount": 1.0},
+            {"date": "2026-03-03", "customer_id": cliente_fixture["id"],
+             "items": [{"product_id": 9999, "quantity": 1}]},
+            {"date": "2026-03-03", "customer_id": 9999,
+             "items": [{"product_id": producto["id"], "quantity": 1}]},
+            {"date": "no-fecha", "customer_id": cliente_fixture["id"], "items": []},
+            {"date": "2026-03-03", "items": [{"product_id": producto["id"], "quantity": 1}]},
+        )
+        r = self._post(client, body)
+        assert r.status_code == 200
+        rep = r.json()
+        assert rep["received"] == 8
+        assert rep["created"] == 3
+        errores = {e["row"]: e["error"] for e in rep["errors"]}
+        assert set(errores) == {3, 5, 6, 7, 8}
+        assert "JSON" in errores[3]
+        assert errores[5] == "Producto 9999 no existe"
+        assert errores[6] == "Cliente no encontrado"
+        assert errores[7].startswith("date")
+
+        albaranes = client.get("/api/albaranes/get").json()
+        assert sorted(a["id"] for a in albaranes) == sorted(rep["delivery_note_ids"])
+        assert sorted(a["total"] for a in albaranes) == [4.0, 10.0, 20.0]
+        # El cliente nuevo se crea una sola vez y se actualiza con la segunda fila
+        clientes = client.get("/api/clientes/get").json()
+        assert len(clientes) == 2
+        ana = next(c for c in clientes if c["dni"] == "11111111B")
+        assert ana["city"] == "Madrid"
+        fianzas = sorted(
+            m["amount"] for m in client.get("/api/movimientos/get").json()
+            if m["description"].startswith("Fianza albaran #")
+        )
+        assert fianzas == [1.0, 1.2, 6.0]
+
+    def test_csv_agrupa_lineas_por_ref(self, client, cliente_fixture, producto):
+        body = (
+            "ref,date,customer_id,description,product_id,quantity,unit_price\n"
+            f"A1,2026-03-01,{cliente_fixture['id']},\"Sofá, 3 plazas\n(gris)\",{producto['id']},1,\n"
+            f"A1,,,,{producto['id']},2,5.5\n"
+            f",2026-03-02,{cliente_fixture['id']},,{producto['id']},1,\n"
+            f"B2,2026-03-03,{cliente_fixture['id']},,abc,1,\n"
+        )
+        r = self._post(client, body, content_type="text/csv")
+        rep = r.json()
+        assert rep["received"] == 3 and rep["created"] == 2
+        assert rep["errors"][0]["ref"] == "B2" and rep["errors"][0]["row"] == 6
+        primero = client.get(f"/api/albaranes/get/{rep['delivery_note_ids'][0]}").json()
+        assert primero["description"] == "Sofá, 3 plazas\n(gris)"
+        assert primero["total"] == 21.0
+        assert len(primero["items"]) == 2
+
+    def test_importa_por_bloques(self, client, cliente_fixture, producto, mocker):
+        from backend.app.services import albaranes_service
+        mocker.patch.object(albaranes_service, "BULK_CHUNK_SIZE", 2)
+        fila = {"date": "2026-03-01", "customer_id": cliente_fixture["id"],
+                "items": [{"product_id": producto["id"], "quantity": 1}]}
+        r = self._post(client, self._ndjson(*[fila] * 5), format="ndjson",
+                       content_type="text/plain")
+        assert r.json()["created"] == 5
+        assert len(client.get("/api/albaranes/get").json()) == 5
+        assert len(client.get("/api/movimientos/get").json()) == 5
+
+    def test_formato_no_soportado(self, client):
+        r = self._post(client, "x", content_type="application/octet-stream")
+        assert r.status_code == 415
+
+
 class TestListarAlbaranes:
     def test_listar_vacio(self, client):
         assert client.get("/api/albaranes/get").json() == []
@@ -119,6 +276,68 @@ class TestListarAlbaranes:
         assert r.json() == []
 
 
+class TestListadoPaginado:
+    """GET /albaranes/list: paginación por cursor, filtros e include=items."""
+
+    @pytest.fixture()
+    def albaranes(self, client, cliente_fixture, producto):
+        ids = []
+        for i, (fecha, cantidad, estado) in enumerate([
+            ("2026-03-01", 1, "FIANZA"), ("2026-03-01", 3, "ALMACEN"),
+            ("2026-03-02", 2, "FIANZA"), ("2026-03-03", 5, "ALMACEN"),
+            ("2026-03-03", 4, "FIANZA"), ("2026-03-04", 1, "FIANZA"),
+        ]):
+            r = client.post("/api/albaranes/post", json={
+                "date": fecha, "customer_id": cliente_fixture["id"], "status": estado,
+                "items": [{"product_id": producto["id"], "quantity": cantidad}],
+            })
+            ids.append(r.json()["id"])
+        return ids
+
+    def _todas(self, client, **params):
+        paginas, cursor = [], None
+        while True:
+            body = client.get("/api/albaranes/list", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+            paginas.append(body["results"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return paginas
+
+    def test_recorre_todas_las_paginas_sin_repetir(self, client, albaranes):
+        paginas = self._todas(client, limit=4)
+        assert [len(p) for p in paginas] == [4, 2]
+        filas = [a for p in paginas for a in p]
+        assert len({a["id"] for a in filas}) == 6
+        claves = [(a["date"], a["id"]) for a in filas]
+        assert claves == sorted(claves, reverse=True)
+        assert "items" not in filas[0]
+
+    def test_orden_por_total_con_empates(self, client, albaranes):
+        filas = [a for p in self._todas(client, sort="total", limit=2) for a in p]
+        assert [a["total"] for a in filas] == [10.0, 10.0, 20.0, 30.0, 40.0, 50.0]
+        assert filas[0]["id"] < filas[1]["id"]
+
+    def test_filtros(self, client, albaranes, cliente_fixture):
+        r = client.get("/api/albaranes/list", params={
+            "status": ["FIANZA"], "date_from": "2026-03-02", "date_to": "2026-03-03",
+            "customer_id": cliente_fixture["id"], "total_min": 15, "total_max": 45,
+        })
+        body = r.json()
+        assert [a["total"] for a in body["results"]] == [40.0, 20.0]
+        assert body["next_cursor"] is None
+        otro = client.get("/api/albaranes/list", params={"customer_id": 9999}).json()
+        assert otro["results"] == []
+
+    def test_include_items(self, client, albaranes, producto):
+        body = client.get("/api/albaranes/list", params={"include": "items", "sort": "id", "limit": 1}).json()
+        assert body["results"][0]["id"] == albaranes[0]
+        assert body["results"][0]["items"][0]["product_id"] == producto["id"]
+
+    def test_cursor_invalido(self, client, albaranes):
+        r = client.get("/api/albaranes/list", params={"cursor": "no-vale"})
+        assert r.status_code == 400
+
+
 class TestEstadoAlbaran:
     def test_cambiar_a_entregado(self, client, cliente_fixture, producto):
         aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
@@ -277,3 +496,124 @@ class TestDescargarPdfAlbaran:
         assert r.status_code == 200
         assert "Content-Disposition" in r.headers
         assert str(aid) in r.headers["Content-Disposition"]
+
+
+# ── Caché de PDFs por contenido + ETag ───────────────────────────────────────
+from backend.app.api import albaranes as albaranes_api  # noqa: E402
+from backend.app.utils import pdf_cache  # noqa: E402
+
+
+@pytest.fixture()
+def render_pdf(mocker):
+    """Renderizador falso que cuenta las llamadas."""
+    return mocker.patch(
+        "backend.app.services.pdf_render_service.render",
+        side_effect=lambda *a, **k: b"%PDF-1.4 " + str(k.get("tienda_nombre")).encode(),
+    )
+
+
+class TestPdfCacheAlbaran:
+    def test_segunda_descarga_no_renderiza(self, client, cliente_fixture, producto, render_pdf):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        r1 = client.get(f"/api/albaranes/{aid}/pdf")
+        r2 = client.get(f"/api/albaranes/{aid}/pdf")
+        assert r1.content == r2.content
+        assert r1.headers["etag"] == r2.headers["etag"]
+        assert render_pdf.call_count == 1
+
+    def test_if_none_match_devuelve_304(self, client, cliente_fixture, producto, render_pdf):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        etag = client.get(f"/api/albaranes/{aid}/pdf").headers["etag"]
+        r = client.get(f"/api/albaranes/{aid}/pdf", headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["etag"] == etag
+        assert render_pdf.call_count == 1
+
+    def test_cambio_de_cliente_invalida(self, client, cliente_fixture, producto, render_pdf):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        etag = client.get(f"/api/albaranes/{aid}/pdf").headers["etag"]
+        client.put(f"/api/clientes/put/{cliente_fixture['id']}", json={
+            "name": "Juan", "surnames": "García", "dni": "12345678A", "email": "otro@test.com",
+        })
+        r = client.get(f"/api/albaranes/{aid}/pdf", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["etag"] != etag
+        assert render_pdf.call_count == 2
+
+    def test_cambio_de_albaran_y_tienda_invalidan(self, client, cliente_fixture, producto, render_pdf):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        etags = {client.get(f"/api/albaranes/{aid}/pdf").headers["etag"]}
+        client.put(f"/api/albaranes/put/{aid}", json={"description": "Otra descripción"})
+        etags.add(client.get(f"/api/albaranes/{aid}/pdf").headers["etag"])
+        client.put("/api/config/tienda_nombre", json={"key": "tienda_nombre", "value": "Muebles Paco"})
+        r = client.get(f"/api/albaranes/{aid}/pdf")
+        etags.add(r.headers["etag"])
+        assert len(etags) == 3
+        assert r.content.endswith(b"Muebles Paco")
+
+    def test_email_reutiliza_el_pdf_descargado(self, client, cliente_fixture, producto, render_pdf):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        pdf = client.get(f"/api/albaranes/{aid}/pdf").content
+        with patch("backend.app.api.albaranes.enqueue_email") as mock_enqueue:
+            albaranes_api._send_delivery_note_email_task(aid)
+        assert render_pdf.call_count == 1
+        assert mock_enqueue.call_args.kwargs["attachment"] == pdf
+
+
+class TestPdfCacheLru:
+    def test_expulsa_lo_menos_usado_por_tamano(self, tmp_path):
+        cache = pdf_cache.PdfCache(tmp_path, max_bytes=25)
+        cache.put("a", b"x" * 10)
+        cache.put("b", b"x" * 10)
+        assert cache.get("a") is not None  # "b" pasa a ser el menos usado
+        cache.put("c", b"x" * 10)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] <= 25
+        assert sorted(p.stem for p in tmp_path.glob("*.pdf")) == ["a", "c"]
+
+    def test_adopta_ficheros_de_otra_ejecucion(self, tmp_path):
+        pdf_cache.PdfCache(tmp_path, max_bytes=100).put("k", b"%PDF")
+        assert pdf_cache.PdfCache(tmp_path, max_bytes=100).get("k") == b"%PDF"
+
+    def test_fichero_borrado_fuera_es_un_fallo(self, tmp_path):
+        cache = pdf_cache.PdfCache(tmp_path, max_bytes=100)
+        cache.put("k", b"%PDF")
+        (tmp_path / "k.pdf").unlink()
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_tamano_cero_desactiva(self, tmp_path):
+        cache = pdf_cache.PdfCache(tmp_path, max_bytes=0)
+        cache.put("k", b"%PDF")
+        assert cache.get("k") is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_clave_depende_del_contenido(self):
+        base = pdf_cache.content_key("albaran", {"id": 1}, [{"cantidad": 1}], "Tienda", None)
+        assert base == pdf_cache.content_key("albaran", {"id": 1}, [{"cantidad": 1}], "Tienda", None)
+        assert base != pdf_cache.content_key("albaran", {"id": 1}, [{"cantidad": 2}], "Tienda", None)
+        assert base != pdf_cache.content_key("albaran", {"id": 1}, [{"cantidad": 1}], "Tienda", "logo")
+
+
+class TestFianzaEnlazada:
+    def test_fianza_enlazada_al_albaran(self, client, cliente_fixture, producto):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        movs = client.get("/api/movimientos/get").json()
+        fianzas = [m for m in movs if m["delivery_note_id"] == aid]
+        assert [m["kind"] for m in fianzas] == ["FIANZA"]
+
+    def test_entregado_encuentra_la_fianza_aunque_cambie_el_concepto(self, client, cliente_fixture, producto):
+        aid = crear_albaran(client, cliente_fixture["id"], producto["id"]).json()["id"]
+        fianza = next(m for m in client.get("/api/movimientos/get").json() if m["delivery_note_id"] == aid)
+        client.put(f"/api/movimientos/put/{fianza['id']}", json={
+            "date": fianza["date"], "description": "Señal cobrada en tienda",
+            "amount": fianza["amount"], "type": "INGRESO",
+        })
+        client.patch(f"/api/albaranes/{aid}/estado", json={"status": "ENTREGADO"})
+        movs = client.get("/api/movimientos/get").json()
+        cobro = [m for m in movs if m["delivery_note_id"] == aid and m["kind"] == "COBRO"]
+        total = client.get(f"/api/albaranes/get/{aid}").json()["total"]
+        assert len(cobro) == 1
+        assert cobro[0]["amount"] == pytest.approx(total - fianza["amount"])
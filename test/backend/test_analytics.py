@@ -7,24 +7,50 @@ FIRST (Fast, Isolated, Repeatable, Self-validating, Timely): los tests
 no dependen de credenciales externas ni de disponibilidad de la red.
 """
 
+import pytest
+from datetime import date
+from unittest.mock import patch
+
 # Ruta de importacion del SUT - misma que usa analytics.py al importar groq_chat
 GROQ_PATH = "backend.app.api.analytics.groq_chat"
 GROQ_STUB  = "Informe de prueba generado por mock."
 
 
+@pytest.fixture
+def mock_email_y_pdf():
+    """Neutraliza email y PDF de albaranes en las clases que crean albaranes."""
+    with patch("backend.app.api.albaranes.enqueue_email", return_value=None), \
+         patch("backend.app.services.pdf_render_service.render", return_value=b""), \
+         patch("backend.app.api.albaranes.render", return_value="<html></html>"):
+        yield
+
+
 class TestAnalyticsSummary:
     def test_summary_sin_datos(self, client, mocker):
         # Given - stub que devuelve un informe fijo sin llamar a Groq
         mock_groq = mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
         # When
-        r = client.get("/api/analytics/summary")
+        r = client.get("/api/analytics/summary?wait_report=true")
         # Then
         assert r.status_code == 200
         body = r.json()
         assert "metrics" in body
-        assert "ai_report" in body
+        assert body["ai_report"] == GROQ_STUB
         mock_groq.assert_called_once()  # spy: se llamo exactamente 1 vez
 
+    def test_summary_no_espera_al_informe(self, client, mocker):
+        # Given - el informe se genera en segundo plano, no con groq_chat
+        mock_groq = mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
+        mock_start = mocker.patch("backend.app.api.analytics.start_ai_report", return_value="abc")
+        # When
+        r = client.get("/api/analytics/summary")
+        # Then
+        body = r.json()
+        assert body["report_id"] == "abc"
+        assert body["ai_report"] is None
+        mock_start.assert_called_once_with(body["metrics"])
+        mock_groq.assert_not_called()
+
     def test_summary_con_rango_de_fechas(self, client, mocker):
         # Given
         mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
@@ -55,34 +81,25 @@ class TestAnalyticsSummary:
         assert "rfm" in metrics
 
     def test_summary_con_albaran(self, client, mocker):
-        # Given - mockear las funciones de cálculo para devolver datos simulados sin BD
-        mock_sales = mocker.patch("backend.app.api.analytics.sales_by_day", return_value=[
-            {"date": "2026-01-15", "orders": 1, "revenue": 30.0}
-        ])
-        mock_top = mocker.patch("backend.app.api.analytics.top_products", return_value=[
-            {"product_id": 1, "name": "Producto Test", "qty": 2, "revenue": 30.0}
-        ])
-        mock_avg = mocker.patch("backend.app.api.analytics.averages", return_value={
-            "revenue": 30.0, "orders": 1, "aov": 30.0, "avg_per_customer": 30.0
-        })
-        mock_basket = mocker.patch("backend.app.api.analytics.basket_pairs", return_value=[])
-        mock_rfm = mocker.patch("backend.app.api.analytics.rfm_segments", return_value={
-            "summary": {"VIP": 1}, "by_customer": [{"cliente_id": 1, "segment": "VIP"}]
+        # Given - mockear el motor de métricas para devolver datos simulados sin BD
+        mock_bundle = mocker.patch("backend.app.api.analytics.MetricsBundle.metrics", return_value={
+            "range": {"from": "2026-01-01", "to": "2026-01-31"},
+            "sales_by_day": [{"date": "2026-01-15", "orders": 1, "revenue": 30.0}],
+            "top_products": [{"product_id": 1, "name": "Producto Test", "qty": 2, "revenue": 30.0}],
+            "averages": {"revenue": 30.0, "orders": 1, "aov": 30.0, "avg_per_customer": 30.0},
+            "basket_pairs": [],
+            "rfm": {"summary": {"VIP": 1}, "by_customer": [{"cliente_id": 1, "segment": "VIP"}]},
         })
         mock_groq = mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
         # When
-        r = client.get("/api/analytics/summary")
+        r = client.get("/api/analytics/summary?wait_report=true")
         # Then
         assert r.status_code == 200
         metrics = r.json()["metrics"]
         assert len(metrics["top_products"]) >= 1
         assert metrics["rfm"]["summary"]["VIP"] == 1
         mock_groq.assert_called_once()
-        mock_sales.assert_called_once()
-        mock_top.assert_called_once()
-        mock_avg.assert_called_once()
-        mock_basket.assert_called_once()
-        mock_rfm.assert_called_once()
+        mock_bundle.assert_called_once()
 
 
 class TestAnalyticsCompare:
@@ -124,8 +141,8 @@ class TestAnalyticsExportPdf:
     def test_export_pdf_incluye_prediccion(self, client, mocker, cliente_fixture, producto):
         """El PDF se genera correctamente cuando los datos activan el bloque de predicción."""
         mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
-        mocker.patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None)
-        mocker.patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b"")
+        mocker.patch("backend.app.api.albaranes.enqueue_email", return_value=None)
+        mocker.patch("backend.app.services.pdf_render_service.render", return_value=b"")
         mocker.patch("backend.app.api.albaranes.render", return_value="<html></html>")
         for ds in ("2026-01-10", "2026-02-18"):
             client.post("/api/albaranes/post", json={
@@ -189,8 +206,8 @@ class TestAnalyticsPredict:
 
     def test_predict_con_albaran(self, client, mocker, cliente_fixture, producto):
         # Given - create a delivery note so there is at least some revenue data
-        mocker.patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None)
-        mocker.patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b"")
+        mocker.patch("backend.app.api.albaranes.enqueue_email", return_value=None)
+        mocker.patch("backend.app.services.pdf_render_service.render", return_value=b"")
         mocker.patch("backend.app.api.albaranes.render", return_value="<html></html>")
         client.post("/api/albaranes/post", json={
             "date": "2026-01-15",
@@ -208,8 +225,8 @@ class TestAnalyticsPredict:
 
     def test_predict_holt_activo_dos_meses(self, client, mocker, cliente_fixture, producto):
         """Con albaranes en 2 meses distintos el endpoint activa Holt y cubre _holt_forecast n==2."""
-        mocker.patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None)
-        mocker.patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b"")
+        mocker.patch("backend.app.api.albaranes.enqueue_email", return_value=None)
+        mocker.patch("backend.app.services.pdf_render_service.render", return_value=b"")
         mocker.patch("backend.app.api.albaranes.render", return_value="<html></html>")
         for ds in ("2026-01-10", "2026-02-15"):
             client.post("/api/albaranes/post", json={
@@ -226,8 +243,8 @@ class TestAnalyticsPredict:
 
     def test_predict_holt_activo_tres_meses(self, client, mocker, cliente_fixture, producto):
         """Con albaranes en 3 meses el forecast usa RMSE real (n>=3), cubriendo ese bloque."""
-        mocker.patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None)
-        mocker.patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b"")
+        mocker.patch("backend.app.api.albaranes.enqueue_email", return_value=None)
+        mocker.patch("backend.app.services.pdf_render_service.render", return_value=b"")
         mocker.patch("backend.app.api.albaranes.render", return_value="<html></html>")
         for ds in ("2026-01-10", "2026-02-15", "2026-03-20"):
             client.post("/api/albaranes/post", json={
@@ -300,11 +317,6 @@ class TestAnalyticsRFMSegments:
             ]
         })
         mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
-        # Mock other functions to avoid DB calls
-        mocker.patch("backend.app.api.analytics.sales_by_day", return_value=[])
-        mocker.patch("backend.app.api.analytics.top_products", return_value=[])
-        mocker.patch("backend.app.api.analytics.averages", return_value={"revenue": 0, "orders": 0, "aov": 0, "avg_per_customer": 0})
-        mocker.patch("backend.app.api.analytics.basket_pairs", return_value=[])
 
         r = client.get("/api/analytics/summary?date_from=2026-01-01&date_to=2026-12-31")
         assert r.status_code == 200
@@ -382,4 +394,667 @@ class TestTendenciasPdfPrediccion:
             ai_report="Informe IA test.",
             prediction=pred,
         )
-        assert len(buf.getvalue()) > 0
\ No newline at end of file
+        assert len(buf.getvalue()) > 0
+
+@pytest.mark.usefixtures("mock_email_y_pdf")
+class TestVentasDiarias:
+    """El rollup ventas_diarias se mantiene en la misma transacción que los albaranes."""
+
+    @staticmethod
+    def _rollup():
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.entidades.venta_diaria import DailySalesDB
+        db = TestingSessionLocal()
+        try:
+            return {
+                r.day.isoformat(): (r.orders, r.revenue, r.customers)
+                for r in db.query(DailySalesDB).all()
+            }
+        finally:
+            db.close()
+
+    def _crear(self, client, cliente_id, producto_id, fecha, precio):
+        r = client.post("/api/albaranes/post", json={
+            "date": fecha,
+            "customer_id": cliente_id,
+            "items": [{"product_id": producto_id, "quantity": 1, "unit_price": precio}],
+        })
+        assert r.status_code == 200
+        return r.json()
+
+    def test_crear_albaranes_actualiza_rollup(self, client, cliente_fixture, producto):
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 50.0)
+        assert self._rollup() == {"2026-01-10": (2, 150.0, 1)}
+
+    def test_cambiar_fecha_mueve_el_dia(self, client, cliente_fixture, producto):
+        alb = self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        client.put(f"/api/albaranes/put/{alb['id']}", json={"date": "2026-01-12"})
+        assert self._rollup() == {"2026-01-12": (1, 100.0, 1)}
+
+    def test_reemplazar_lineas_recalcula_ingresos(self, client, cliente_fixture, producto):
+        alb = self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        client.put(f"/api/albaranes/{alb['id']}/items", json={
+            "items": [{"product_id": producto["id"], "quantity": 3, "unit_price": 20.0}],
+        })
+        assert self._rollup() == {"2026-01-10": (1, 60.0, 1)}
+
+    def test_borrar_albaran_elimina_el_dia(self, client, cliente_fixture, producto):
+        alb = self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        client.delete(f"/api/albaranes/delete/{alb['id']}")
+        assert self._rollup() == {}
+
+    def test_borrar_cliente_elimina_sus_dias(self, client, cliente_fixture, producto):
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        client.delete(f"/api/clientes/delete/{cliente_fixture['id']}")
+        assert self._rollup() == {}
+
+    def test_analytics_lee_del_rollup(self, client, cliente_fixture, producto, mocker):
+        mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-11", 40.0)
+        r = client.get("/api/analytics/summary?date_from=2026-01-01&date_to=2026-01-31")
+        metrics = r.json()["metrics"]
+        assert metrics["sales_by_day"] == [
+            {"date": "2026-01-10", "orders": 1, "revenue": 100.0},
+            {"date": "2026-01-11", "orders": 1, "revenue": 40.0},
+        ]
+        assert metrics["averages"]["orders"] == 2
+        assert metrics["averages"]["avg_per_customer"] == 140.0
+
+    def test_rebuild_reconstruye_desde_albaranes(self, client, cliente_fixture, producto):
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.entidades.venta_diaria import DailySalesDB
+        from backend.app.services.ventas_diarias_service import rebuild
+        self._crear(client, cliente_fixture["id"], producto["id"], "2026-01-10", 100.0)
+        db = TestingSessionLocal()
+        db.query(DailySalesDB).delete()
+        db.commit()
+        assert rebuild(db) == 1
+        db.close()
+        assert self._rollup() == {"2026-01-10": (1, 100.0, 1)}
+
+
+@pytest.mark.usefixtures("mock_email_y_pdf")
+class TestMetricsBundle:
+    """Motor único de métricas: varios rangos en un lote y resultados reutilizables."""
+
+    @pytest.fixture()
+    def datos(self, client, cliente_fixture, producto, proveedor):
+        otro = client.post("/api/productos/post", json={
+            "name": "Mesa", "description": "x", "price": 80.0, "supplier_id": proveedor["id"],
+        }).json()
+        for fecha in ("2026-01-10", "2026-01-20", "2026-02-05"):
+            client.post("/api/albaranes/post", json={
+                "date": fecha,
+                "customer_id": cliente_fixture["id"],
+                "items": [
+                    {"product_id": producto["id"], "quantity": 2, "unit_price": 10.0},
+                    {"product_id": otro["id"], "quantity": 1, "unit_price": 80.0},
+                ],
+            })
+        return producto, otro
+
+    def test_calcula_todas_las_metricas(self, datos):
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.api.analytics import MetricsBundle
+        producto, otro = datos
+        db = TestingSessionLocal()
+        m = MetricsBundle(db).metrics(date(2026, 1, 1), date(2026, 1, 31))
+        db.close()
+        assert m["range"] == {"from": "2026-01-01", "to": "2026-01-31"}
+        assert [d["date"] for d in m["sales_by_day"]] == ["2026-01-10", "2026-01-20"]
+        assert m["averages"] == {"orders": 2, "revenue": 200.0, "aov": 100.0, "avg_per_customer": 200.0}
+        assert m["top_products"][0] == {"product_id": otro["id"], "name": "Mesa", "qty": 2.0, "revenue": 160.0}
+        assert m["basket_pairs"][0]["support"] == 2
+        assert m["basket_pairs"][0]["a_name"] == "Producto Test"
+        assert m["rfm"]["summary"]
+
+    def test_varios_rangos_en_un_solo_lote(self, datos):
+        from sqlalchemy import event
+        from test.backend.conftest import TestingSessionLocal, engine
+        from backend.app.api.analytics import MetricsBundle
+        statements = []
+
+        def contar(*_args):
+            statements.append(1)
+
+        db = TestingSessionLocal()
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            bundle = MetricsBundle(db, [(date(2026, 1, 1), date(2026, 1, 31)), (date(2026, 2, 1), date(2026, 2, 28))])
+            enero = bundle.metrics(date(2026, 1, 1), date(2026, 1, 31))
+            febrero = bundle.metrics(date(2026, 2, 1), date(2026, 2, 28))
+            primera_tanda = len(statements)
+            assert bundle.metrics(date(2026, 1, 1), date(2026, 1, 31)) is enero
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+            db.close()
+        # rollup + líneas + nombres + 1 RFM por rango
+        assert primera_tanda == 5
+        assert len(statements) == primera_tanda
+        assert enero["averages"]["orders"] == 2
+        assert febrero["averages"]["orders"] == 1
+
+    def test_lineas_solo_de_los_rangos_pedidos(self, datos):
+        from sqlalchemy import event
+        from test.backend.conftest import TestingSessionLocal, engine
+        from backend.app.api.analytics import MetricsBundle
+        sql = []
+
+        def capturar(_conn, _cursor, statement, *_args):
+            sql.append(statement)
+
+        db = TestingSessionLocal()
+        event.listen(engine, "before_cursor_execute", capturar)
+        try:
+            bundle = MetricsBundle(db, [(date(2026, 1, 1), date(2026, 1, 15)), (date(2026, 2, 1), date(2026, 2, 28))])
+            enero = bundle.metrics(date(2026, 1, 1), date(2026, 1, 15))
+            febrero = bundle.metrics(date(2026, 2, 1), date(2026, 2, 28))
+        finally:
+            event.remove(engine, "before_cursor_execute", capturar)
+            db.close()
+        # el hueco (albarán del 20 de enero) no se lee: un BETWEEN por rango
+        lineas = next(s for s in sql if "lineas_albaran" in s and "albaranes.cliente_id" in s)
+        assert lineas.count("BETWEEN") == 2
+        assert enero["averages"]["orders"] == 1
+        assert febrero["averages"]["orders"] == 1
+
+    def test_rangos_solapados_o_contiguos_se_unen(self):
+        from backend.app.api.analytics import _merge_ranges
+        d = date
+        assert _merge_ranges([
+            (d(2026, 3, 1), d(2026, 3, 31)), (d(2026, 1, 1), d(2026, 1, 31)),
+            (d(2026, 2, 1), d(2026, 2, 10)), (d(2026, 3, 15), d(2026, 4, 5)),
+        ]) == [(d(2026, 1, 1), d(2026, 2, 10)), (d(2026, 3, 1), d(2026, 4, 5))]
+
+    def test_export_pdf_calcula_cada_periodo_una_vez(self, client, datos, mocker):
+        from backend.app.api import analytics
+        mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
+        spy = mocker.spy(analytics, "rfm_segments")
+        r = client.get("/api/analytics/export/pdf?date_from=2026-02-01&date_to=2026-02-28")
+        assert r.status_code == 200
+        # periodo actual + anterior, sin repetir el actual dentro de compare_periods
+        assert spy.call_count == 2
+
+
+@pytest.mark.usefixtures("mock_email_y_pdf")
+class TestAnalyticsCache:
+    """Caché LRU+TTL versionada: se reutiliza hasta que cambian albaranes o clientes."""
+
+    @pytest.fixture(autouse=True)
+    def _sin_groq(self, mocker):
+        mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
+
+    def _albaran(self, client, cliente, producto, fecha="2026-03-10"):
+        return client.post("/api/albaranes/post", json={
+            "date": fecha,
+            "customer_id": cliente["id"],
+            "items": [{"product_id": producto["id"], "quantity": 1, "unit_price": 10.0}],
+        }).json()
+
+    def test_segunda_peticion_es_hit(self, client, cliente_fixture, producto, mocker):
+        from backend.app.api import analytics
+        self._albaran(client, cliente_fixture, producto)
+        spy = mocker.spy(analytics, "rfm_segments")
+        url = "/api/analytics/summary?date_from=2026-03-01&date_to=2026-03-31"
+        r1 = client.get(url)
+        r2 = client.get(url)
+        assert r1.json()["metrics"] == r2.json()["metrics"]
+        assert spy.call_count == 1
+        stats = client.get("/api/analytics/cache/stats").json()
+        assert stats["hits"] >= 1
+        assert stats["misses"] >= 1
+
+    def test_nuevo_albaran_invalida(self, client, cliente_fixture, producto):
+        url = "/api/analytics/summary?date_from=2026-03-01&date_to=2026-03-31"
+        self._albaran(client, cliente_fixture, producto)
+        assert client.get(url).json()["metrics"]["averages"]["orders"] == 1
+        self._albaran(client, cliente_fixture, producto, "2026-03-11")
+        assert client.get(url).json()["metrics"]["averages"]["orders"] == 2
+
+    def test_borrar_albaran_invalida(self, client, cliente_fixture, producto):
+        url = "/api/analytics/summary?date_from=2026-03-01&date_to=2026-03-31"
+        alb = self._albaran(client, cliente_fixture, producto)
+        assert client.get(url).json()["metrics"]["averages"]["orders"] == 1
+        client.delete(f"/api/albaranes/delete/{alb['id']}")
+        assert client.get(url).json()["metrics"]["averages"]["orders"] == 0
+
+    def test_cambio_de_cliente_incrementa_version(self, client, cliente_fixture):
+        from backend.app.utils import analytics_cache
+        before = analytics_cache.data_version()
+        r = client.put(f"/api/clientes/put/{cliente_fixture['id']}", json={
+            "name": "Pedro", "surnames": "García", "dni": "12345678A", "email": "juan@test.com",
+        })
+        assert r.status_code == 200
+        assert analytics_cache.data_version() > before
+
+    def test_escritura_ajena_no_invalida(self, client, proveedor):
+        from backend.app.utils import analytics_cache
+        before = analytics_cache.data_version()
+        client.post("/api/proveedores/post", json={"name": "Otro", "contact": "1"})
+        assert analytics_cache.data_version() == before
+
+    def test_predict_cacheado(self, client, mocker):
+        from backend.app.api import analytics
+        spy = mocker.spy(analytics, "_prediction_data")
+        url = "/api/analytics/predict?date_from=2026-01-01&date_to=2026-03-31"
+        assert client.get(url).json() == client.get(url).json()
+        assert spy.call_count == 1
+
+
+class TestTTLCache:
+    def test_lru_y_expiracion(self, mocker):
+        from backend.app.utils.ttl_cache import TTLCache
+        now = mocker.patch("backend.app.utils.ttl_cache.time.monotonic", return_value=0.0)
+        c = TTLCache(maxsize=2, ttl=10)
+        c.set("a", 1)
+        c.set("b", 2)
+        assert c.get("a") == 1
+        c.set("c", 3)  # expulsa "b", el menos usado
+        assert c.get("b") is None
+        assert c.evictions == 1
+        now.return_value = 11.0
+        assert c.get("a") is None
+        assert c.stats()["hits"] == 1
+        assert c.stats()["misses"] == 2
+
+
+class TestBasketService:
+    """Motor de pares co-comprados vectorizado (matriz de incidencia)."""
+
+    # albarán -> productos: 1:{10,20,30}, 2:{10,20}, 3:{10,20}, 4:{20,30}, 5:{10} (10 repetido)
+    NOTES = [1, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6]
+    PRODS = [10, 20, 30, 10, 20, 20, 10, 20, 30, 10, 10, -1]
+
+    def test_soporte_confianza_y_lift_en_ambos_sentidos(self):
+        from backend.app.services.basket_service import basket_pairs
+        pairs = basket_pairs(self.NOTES, self.PRODS, min_support=2, limit=10)
+        assert [(p["a_id"], p["b_id"], p["support"]) for p in pairs] == [(10, 20, 3), (20, 30, 2)]
+        p = pairs[0]
+        # soporte(10)=4, soporte(20)=4, 5 cestas con productos (la 6 no tiene líneas)
+        assert p["confidence"] == pytest.approx(3 / 4)
+        assert p["confidence_ba"] == pytest.approx(3 / 4)
+        assert p["lift"] == pytest.approx((3 / 4) / (4 / 5))
+        q = pairs[1]
+        assert q["confidence"] == pytest.approx(2 / 4)
+        assert q["confidence_ba"] == pytest.approx(2 / 2)
+
+    def test_min_support_y_top_k(self):
+        from backend.app.services.basket_service import basket_pairs
+        assert len(basket_pairs(self.NOTES, self.PRODS, min_support=1, limit=10)) == 3
+        assert len(basket_pairs(self.NOTES, self.PRODS, min_support=4, limit=10)) == 0
+        top = basket_pairs(self.NOTES, self.PRODS, min_support=1, limit=1, sort_by="confidence")
+        assert [(p["a_id"], p["b_id"]) for p in top] == [(10, 20)]
+
+    def test_orden_por_lift(self):
+        from backend.app.services.basket_service import basket_pairs
+        top = basket_pairs(self.NOTES, self.PRODS, min_support=1, limit=3, sort_by="lift")
+        lifts = [p["lift"] for p in top]
+        assert lifts == sorted(lifts, reverse=True)
+
+    def test_sin_datos(self):
+        from backend.app.services.basket_service import basket_pairs
+        assert basket_pairs([], [], min_support=1) == []
+        assert basket_pairs([1, 2], [-1, 5], min_support=1) == []
+
+    def test_criterio_invalido(self):
+        from backend.app.services.basket_service import basket_pairs
+        with pytest.raises(ValueError):
+            basket_pairs(self.NOTES, self.PRODS, sort_by="precio")
+
+    def test_ruta_ordenada_equivale_a_bincount(self, mocker):
+        from backend.app.services import basket_service
+        esperado = basket_service.basket_pairs(self.NOTES, self.PRODS, min_support=1)
+        mocker.patch.object(basket_service, "_DENSE_PAIRS", 0)
+        assert basket_service.basket_pairs(self.NOTES, self.PRODS, min_support=1) == esperado
+
+
+@pytest.mark.usefixtures("mock_email_y_pdf")
+class TestRFMService:
+    """RFM vectorizado, reglas configurables y snapshot por cliente."""
+
+    def _albaran(self, client, customer_id, producto, fecha, qty=1):
+        return client.post("/api/albaranes/post", json={
+            "date": fecha,
+            "customer_id": customer_id,
+            "items": [{"product_id": producto["id"], "quantity": qty, "unit_price": 10.0}],
+        }).json()
+
+    def _snapshot(self):
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.entidades.rfm_cliente import RFMSnapshotDB
+        db = TestingSessionLocal()
+        try:
+            return {
+                r.customer_id: (r.last_date.isoformat(), r.frequency, r.monetary)
+                for r in db.query(RFMSnapshotDB).all()
+            }
+        finally:
+            db.close()
+
+    def test_puntuacion_por_cuartiles(self):
+        import numpy as np
+        from backend.app.services.rfm_service import score
+        recency = np.array([1, 10, 100, 400])
+        frequency = np.array([8.0, 4.0, 2.0, 1.0])
+        monetary = np.array([900.0, 300.0, 100.0, 10.0])
+        r, f, m, seg = score(recency, frequency, monetary)
+        assert r.tolist() == [4, 3, 2, 1]
+        assert f.tolist() == [4, 3, 2, 1]
+        assert m.tolist() == [4, 3, 2, 1]
+        assert seg.tolist() == ["VIP", "En crecimiento", "Ocasional", "En riesgo"]
+
+    def test_reglas_configurables(self):
+        import numpy as np
+        from backend.app.services.rfm_service import SegmentRule, score
+        reglas = [SegmentRule("Recientes", r=(4, 4))]
+        _, _, _, seg = score(
+            np.array([1, 10, 100, 400]), np.ones(4), np.ones(4), reglas, default="Resto"
+        )
+        assert seg.tolist() == ["Recientes", "Resto", "Resto", "Resto"]
+
+    def test_snapshot_se_mantiene_con_las_escrituras(self, client, cliente_fixture, producto):
+        cid = cliente_fixture["id"]
+        alb = self._albaran(client, cid, producto, "2026-05-01", qty=2)
+        self._albaran(client, cid, producto, "2026-06-01")
+        assert self._snapshot() == {cid: ("2026-06-01", 2, 30.0)}
+
+        client.put(f"/api/albaranes/{alb['id']}/items", json={
+            "items": [{"product_id": producto["id"], "quantity": 5, "unit_price": 10.0}],
+        })
+        assert self._snapshot() == {cid: ("2026-06-01", 2, 60.0)}
+
+        client.delete(f"/api/albaranes/delete/{alb['id']}")
+        assert self._snapshot() == {cid: ("2026-06-01", 1, 10.0)}
+
+        client.delete(f"/api/clientes/delete/{cid}")
+        assert self._snapshot() == {}
+
+    def test_snapshot_equivale_a_consulta_directa(self, client, cliente_fixture, producto):
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.services import rfm_service
+        self._albaran(client, cliente_fixture["id"], producto, "2026-05-01")
+        db = TestingSessionLocal()
+        try:
+            directo = rfm_service.rfm_segments(db, date(2026, 7, 1), use_snapshot=False)
+            snapshot = rfm_service.rfm_segments(db, date(2026, 7, 1), use_snapshot=True)
+            assert snapshot == directo
+            assert directo["by_customer"][0]["recency_days"] == 61
+            # Con albaranes posteriores a la fecha de referencia el snapshot no sirve
+            anterior = rfm_service.rfm_segments(db, date(2026, 4, 1), use_snapshot=True)
+            assert anterior == {"summary": {}, "by_customer": []}
+        finally:
+            db.close()
+
+    def test_rebuild(self, client, cliente_fixture, producto):
+        from test.backend.conftest import TestingSessionLocal
+        from backend.app.entidades.rfm_cliente import RFMSnapshotDB
+        from backend.app.services import rfm_service
+        self._albaran(client, cliente_fixture["id"], producto, "2026-05-01")
+        esperado = self._snapshot()
+        db = TestingSessionLocal()
+        db.query(RFMSnapshotDB).delete()
+        db.commit()
+        assert rfm_service.rebuild(db) == 1
+        db.close()
+        assert self._snapshot() == esperado
+
+
+class TestForecastService:
+    """Holt vectorizado: búsqueda de (alpha, beta) y previsión de muchas series."""
+
+    def test_parametros_fijos_igual_que_antes(self):
+        from backend.app.services.forecast_service import holt_batch
+        # Serie con tendencia perfecta: con cualquier (alpha, beta) la previsión sigue la recta
+        res = holt_batch([[100.0, 200.0, 300.0, 400.0]], 2, [0.3], [0.1])
+        assert res.forecast[0].tolist() == pytest.approx([500.0, 600.0])
+        assert res.rmse[0] == pytest.approx(0.0)
+
+    def test_busqueda_elige_menor_sse(self):
+        import numpy as np
+        from backend.app.services.forecast_service import GRID, holt_batch
+        serie = [10.0, 80.0, 20.0, 90.0, 30.0, 100.0, 40.0]
+        res = holt_batch([serie], 1)
+        assert res.alpha[0] in GRID and res.beta[0] in GRID
+        fijo = holt_batch([serie], 1, [0.3], [0.1])
+        assert res.rmse[0] <= fijo.rmse[0]
+        # Cada serie del lote se optimiza por separado
+        lote = holt_batch(np.array([serie, [5.0, 6.0, 7.0, 8.0, 9.0, 10.0, 11.0]]), 1)
+        assert lote.alpha[0] == res.alpha[0] and lote.beta[0] == res.beta[0]
+        assert lote.forecast[1, 0] == pytest.approx(12.0)
+
+    def test_casos_limite(self):
+        from backend.app.services.forecast_service import holt_batch
+        uno = holt_batch([[50.0]], 3)
+        assert uno.forecast[0].tolist() == [50.0, 50.0, 50.0]
+        negativos = holt_batch([[-5.0, -10.0, 0.0]], 2)
+        assert (negativos.forecast >= 0).all() and (negativos.lower_80 >= 0).all()
+        assert holt_batch([[1.0, 2.0]], 0).forecast.shape == (1, 0)
+
+
+@pytest.mark.usefixtures("mock_email_y_pdf")
+class TestPredictBatch:
+    """GET /api/analytics/predict/batch — previsiones por total, producto, proveedor y ciudad."""
+
+    def test_series_por_grupo(self, client, cliente_fixture, producto, proveedor):
+        for fecha, qty in (("2026-01-15", 1), ("2026-02-15", 2), ("2026-03-15", 3)):
+            client.post("/api/albaranes/post", json={
+                "date": fecha,
+                "customer_id": cliente_fixture["id"],
+                "items": [{"product_id": producto["id"], "quantity": qty, "unit_price": 10.0}],
+            })
+        r = client.get("/api/analytics/predict/batch?date_from=2026-01-01&date_to=2026-03-31&n_months=2")
+        assert r.status_code == 200
+        body = r.json()
+        assert body["months"][-3:] == ["2026-01", "2026-02", "2026-03"]
+        assert body["forecast_months"] == ["2026-04", "2026-05"]
+        assert set(body["groups"]) == {"total", "product", "supplier", "city"}
+        total = body["groups"]["total"][0]
+        assert total["history"][-3:] == [10.0, 20.0, 30.0]
+        assert len(total["forecast"]) == 2
+        prod = body["groups"]["product"][0]
+        assert prod["key"] == producto["id"] and prod["name"] == "Producto Test"
+        assert prod["history"] == total["history"]
+        assert body["groups"]["supplier"][0]["name"] == "Proveedor Test"
+        assert body["groups"]["city"][0]["name"] == "—"
+
+    def test_group_by_y_limit(self, client):
+        r = client.get("/api/analytics/predict/batch?group_by=product&group_by=city&limit=5")
+        assert r.status_code == 200
+        assert set(r.json()["groups"]) == {"product", "city"}
+
+    def test_group_by_invalido(self, client):
+        r = client.get("/api/analytics/predict/batch?group_by=color")
+        assert r.status_code == 400
+
+
+class TestAIReportStream:
+    """Informe IA en segundo plano y stream SSE de sus tokens."""
+
+    STREAM_PATH = "backend.app.services.ai_report_service.groq_chat_stream"
+
+    @pytest.fixture(autouse=True)
+    def _registro_limpio(self, mocker):
+        from backend.app.services import ai_report_service
+        mocker.patch.object(ai_report_service, "_reports", type(ai_report_service._reports)())
+        mocker.patch.object(ai_report_service, "_by_key", {})
+
+    def _eventos(self, texto):
+        import json
+        eventos = []
+        for bloque in texto.strip().split("\n\n"):
+            lineas = dict(linea.split(": ", 1) for linea in bloque.splitlines() if not linea.startswith(":"))
+            if lineas:
+                eventos.append((lineas["event"], json.loads(lineas["data"])))
+        return eventos
+
+    def _esperar(self, client, report_id):
+        import time
+        for _ in range(200):
+            body = client.get(f"/api/analytics/reports/{report_id}").json()
+            if body["status"] != "running":
+                return body
+            time.sleep(0.01)
+        raise AssertionError("el informe no terminó")
+
+    def test_stream_de_tokens(self, client, mocker):
+        stream = mocker.patch(self.STREAM_PATH, return_value=iter(["<p>Hola", " mundo</p>"]))
+        report_id = client.get("/api/analytics/summary").json()["report_id"]
+        r = client.get(f"/api/analytics/reports/{report_id}/stream")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        eventos = self._eventos(r.text)
+        assert [e for e, _ in eventos] == ["token", "token", "done"]
+        assert "".join(d["text"] for e, d in eventos if e == "token") == "<p>Hola mundo</p>"
+        assert eventos[-1][1]["status"] == "done"
+        stream.assert_called_once()
+
+    def test_mismo_rango_reutiliza_informe(self, client, mocker):
+        mocker.patch(self.STREAM_PATH, return_value=iter(["ok"]))
+        a = client.get("/api/analytics/summary?date_from=2026-01-01&date_to=2026-01-31").json()
+        b = client.get("/api/analytics/summary?date_from=2026-01-01&date_to=2026-01-31").json()
+        assert a["report_id"] == b["report_id"]
+
+    def test_groq_no_disponible_usa_informe_basico(self, client, mocker):
+        mocker.patch(self.STREAM_PATH, side_effect=RuntimeError("GROQ_API_KEY no configurado"))
+        report_id = client.get("/api/analytics/summary").json()["report_id"]
+        body = self._esperar(client, report_id)
+        assert body["status"] == "done"
+        assert body["text"].startswith("Informe de tendencias (básico)")
+
+    def test_corte_a_mitad_marca_error(self, client, mocker):
+        def cortado(*_a, **_k):
+            yield "parcial"
+            raise ConnectionError("reset")
+        mocker.patch(self.STREAM_PATH, side_effect=cortado)
+        report_id = client.get("/api/analytics/summary").json()["report_id"]
+        body = self._esperar(client, report_id)
+        assert body == {"report_id": report_id, "status": "error", "text": "parcial"}
+
+    def test_informe_inexistente(self, client):
+        assert client.get("/api/analytics/reports/nope").status_code == 404
+        assert client.get("/api/analytics/reports/nope/stream").status_code == 404
+
+
+class TestGroqChatStream:
+    def test_parsea_eventos_sse(self, mocker):
+        from backend.app.utils import groq_llm
+        mocker.patch.object(groq_llm, "GROQ_API_KEY", "k")
+        resp = mocker.MagicMock(status_code=200)
+        resp.__enter__.return_value = resp
+        resp.iter_lines.return_value = [
+            'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+            "",
+            'data: {"choices":[{"delta":{"content":"Hola"}}]}',
+            'data: {"choices":[{"delta":{"content":" mundo"}}]}',
+            "data: [DONE]",
+        ]
+        post = mocker.patch.object(groq_llm._session, "post", return_value=resp)
+        assert list(groq_llm.groq_chat_stream([{"role": "user", "content": "x"}])) == ["Hola", " mundo"]
+        assert post.call_args.kwargs["json"]["stream"] is True
+        assert post.call_args.kwargs["stream"] is True
+
+
+class TestExportPdfJobs:
+    """Exportación de PDF en segundo plano: trabajos, progreso y descarga."""
+
+    @pytest.fixture(autouse=True)
+    def _jobs_aislados(self, mocker, tmp_path):
+        from backend.app.services import pdf_jobs_service
+        mocker.patch.object(pdf_jobs_service, "JOBS_DIR", tmp_path)
+        mocker.patch.object(pdf_jobs_service, "_jobs", {})
+        mocker.patch(GROQ_PATH, return_value=GROQ_STUB)
+
+    def _esperar(self, client, job_id):
+        import time
+        for _ in range(500):
+            body = client.get(f"/api/analytics/export/pdf/jobs/{job_id}").json()
+            if body["status"] in ("done", "error"):
+                return body
+            time.sleep(0.01)
+        raise AssertionError("el trabajo no terminó")
+
+    def test_crear_consultar_y_descargar(self, client):
+        r = client.post("/api/analytics/export/pdf/jobs", json={
+            "date_from": "2026-01-01", "date_to": "2026-03-31", "include_compare": True,
+        })
+        assert r.status_code == 202
+        job = r.json()
+        assert job["created"] is True
+        assert job["filename"] == "tendencias_2026-01-01_a_2026-03-31.pdf"
+        body = self._esperar(client, job["job_id"])
+        assert body["status"] == "done" and body["progress"] == 100
+        assert body["expires_in"] > 0
+        for _ in range(2):  # se puede descargar varias veces
+            pdf = client.get(f"/api/analytics/export/pdf/jobs/{job['job_id']}/download")
+            assert pdf.status_code == 200
+            assert pdf.headers["content-type"] == "application/pdf"
+            assert pdf.content.startswith(b"%PDF")
+
+    def test_peticion_identica_se_une_al_trabajo_en_curso(self):
+        import threading
+        from backend.app.services import pdf_jobs_service
+        liberar = threading.Event()
+        llamadas = []
+
+        def render(progress):
+            llamadas.append(1)
+            progress(50, "render")
+            liberar.wait(5)
+            return b"%PDF-1.4"
+
+        a, creado_a = pdf_jobs_service.submit(("k", 1), "a.pdf", render)
+        b, creado_b = pdf_jobs_service.submit(("k", 1), "a.pdf", render)
+        c, creado_c = pdf_jobs_service.submit(("k", 2), "c.pdf", render)
+        liberar.set()
+        assert (creado_a, creado_b, creado_c) == (True, False, True)
+        assert a is b and c is not a
+
+    def test_descarga_antes_de_terminar_409(self, client):
+        import threading
+        from backend.app.services import pdf_jobs_service
+        liberar = threading.Event()
+        job, _ = pdf_jobs_service.submit("lento", "x.pdf", lambda p: liberar.wait(5) and b"%PDF")
+        try:
+            assert client.get(f"/api/analytics/export/pdf/jobs/{job.id}/download").status_code == 409
+        finally:
+            liberar.set()
+
+    def test_error_y_caducidad(self, mocker):
+        import time
+        from backend.app.services import pdf_jobs_service
+
+        def falla(_progress):
+            raise ValueError("boom")
+
+        job, _ = pdf_jobs_service.submit("falla", "x.pdf", falla)
+        for _ in range(500):
+            if not job.active:
+                break
+            time.sleep(0.01)
+        assert job.to_dict()["status"] == "error" and job.error == "boom"
+        mocker.patch.object(pdf_jobs_service, "JOBS_TTL", -1)
+        assert pdf_jobs_service.get(job.id) is None
+
+    def test_barrido_de_ficheros_de_otro_proceso(self, tmp_path):
+        import os
+        import time
+        from backend.app.services import pdf_jobs_service
+        viejo, nuevo = tmp_path / "viejo.pdf", tmp_path / "nuevo.pdf"
+        viejo.write_bytes(b"%PDF")
+        nuevo.write_bytes(b"%PDF")
+        antiguo = time.time() - pdf_jobs_service.JOBS_TTL - 60
+        os.utime(viejo, (antiguo, antiguo))
+        assert pdf_jobs_service.sweep_stale() == 1
+        assert not viejo.exists() and nuevo.exists()
+
+    def test_trabajo_inexistente_404(self, client):
+        assert client.get("/api/analytics/export/pdf/jobs/nope").status_code == 404
+        assert client.get("/api/analytics/export/pdf/jobs/nope/download").status_code == 404
+
+    def test_rango_invalido_400(self, client):
+        r = client.post("/api/analytics/export/pdf/jobs", json={
+            "date_from": "2026-12-31", "date_to": "2026-01-01",
+        })
+        assert r.status_code == 400
@@ -262,3 +262,106 @@ def test_require_role_deniega_rol_incorrecto():
     with pytest.raises(HTTPException) as exc:
         checker(current_user=user)
     assert exc.value.status_code == 403
+
+
+# ── Caché de usuarios autenticados (utils/user_cache.py) ─────────────────────
+from backend.app.utils import user_cache  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+
+def _consultas_usuarios(fn):
+    """Ejecuta fn() y cuenta los SELECT sobre la tabla usuarios."""
+    vistos = []
+
+    def _cuenta(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "usuarios" in statement:
+            vistos.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _cuenta)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _cuenta)
+    return len(vistos)
+
+
+def _login(raw_client, username="admin_test", password="secreto123"):
+    r = raw_client.post("/api/auth/login", data={"username": username, "password": password})
+    assert r.status_code == 200
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+class TestCacheUsuario:
+    def test_peticiones_repetidas_no_consultan_usuarios(self, raw_client, usuario_admin):
+        headers = _login(raw_client)
+
+        def peticiones():
+            for _ in range(5):
+                assert raw_client.get("/api/clientes/get", headers=headers).status_code == 200
+
+        assert _consultas_usuarios(peticiones) == 1
+        assert user_cache.stats()["hits"] >= 4
+
+    def test_put_me_invalida_la_cache(self, raw_client, usuario_admin):
+        headers = _login(raw_client)
+        assert raw_client.get("/api/auth/me", headers=headers).status_code == 200
+        r = raw_client.put(
+            "/api/auth/me",
+            json={"current_password": "secreto123", "new_username": "renombrado"},
+            headers=headers,
+        )
+        assert r.status_code == 200
+        # El token antiguo apunta a un username que ya no existe
+        assert raw_client.get("/api/auth/me", headers=headers).status_code == 401
+
+    def test_desactivar_usuario_invalida_la_cache(self, raw_client, usuario_admin, db_session):
+        headers = _login(raw_client)
+        assert raw_client.get("/api/auth/me", headers=headers).status_code == 200
+        usuario_admin.is_active = False
+        db_session.add(usuario_admin)
+        db_session.commit()
+        assert raw_client.get("/api/auth/me", headers=headers).status_code == 401
+
+    def test_el_token_incluye_iat_y_claims(self, raw_client, usuario_admin):
+        from backend.app.utils.jwt_utils import verify_access_token
+        token = _login(raw_client)["Authorization"].split()[1]
+        payload = verify_access_token(token)
+        assert payload["uid"] == usuario_admin.id
+        assert payload["active"] is True
+        assert payload["iat"] <= payload["exp"]
+
+    def test_confia_en_claims_recientes(self, raw_client, usuario_admin, mocker):
+        mocker.patch.object(user_cache, "TRUST_CLAIMS_SECONDS", 60)
+        headers = _login(raw_client)
+        assert _consultas_usuarios(
+            lambda: raw_client.get("/api/auth/me", headers=headers)
+        ) == 0
+        assert raw_client.get("/api/auth/me", headers=headers).json()["role"] == "admin"
+
+    def test_claims_caducados_consultan_la_bd(self, raw_client, usuario_admin, mocker):
+        import time
+        from jose import jwt
+        from backend.app.auth_config import JWT_ALGORITHM, JWT_SECRET_KEY
+        mocker.patch.object(user_cache, "TRUST_CLAIMS_SECONDS", 60)
+        now = int(time.time())
+        token = jwt.encode({
+            "sub": "admin_test", "role": "admin", "uid": usuario_admin.id, "active": True,
+            "iat": now - 120, "exp": now + 600,
+        }, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert _consultas_usuarios(
+            lambda: raw_client.get("/api/auth/me", headers=headers)
+        ) == 1
+
+    def test_claims_de_usuario_inactivo_devuelven_401(self, raw_client, usuario_inactivo, mocker):
+        mocker.patch.object(user_cache, "TRUST_CLAIMS_SECONDS", 60)
+        token = create_access_token({
+            "sub": "inactivo", "role": "vendedor", "uid": usuario_inactivo.id, "active": False,
+        })
+        r = raw_client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert r.status_code == 401
+
+    def test_stats(self, raw_client, usuario_admin):
+        headers = _login(raw_client)
+        body = raw_client.get("/api/auth/cache/stats", headers=headers).json()
+        assert {"hits", "misses", "version", "trust_claims_seconds"} <= body.keys()
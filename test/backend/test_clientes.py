@@ -103,3 +103,90 @@ class TestEliminarCliente:
     def test_eliminar_inexistente(self, client):
         r = client.delete("/api/clientes/delete/9999")
         assert r.status_code == 404
+
+
+def nuevo(client, name, surnames, dni, **extra):
+    r = client.post("/api/clientes/post", json={
+        "name": name, "surnames": surnames, "dni": dni,
+        "email": f"{dni.lower()}@correo.es", **extra,
+    })
+    assert r.status_code == 200
+    return r.json()
+
+
+def buscar(client, q, limit=20):
+    r = client.get("/api/clientes/search", params={"q": q, "limit": limit})
+    assert r.status_code == 200
+    return [c["surnames"] for c in r.json()]
+
+
+class TestBuscarCliente:
+    def test_por_nombre_y_apellidos_sin_tildes(self, client):
+        nuevo(client, "José", "Núñez Pérez", "11111111A")
+        nuevo(client, "Ana", "Martín", "22222222B")
+        assert buscar(client, "jose nunez") == ["Núñez Pérez"]
+        assert buscar(client, "PEREZ") == ["Núñez Pérez"]
+
+    def test_por_prefijo(self, client):
+        nuevo(client, "Marta", "Gil", "11111111A")
+        nuevo(client, "Mario", "Sanz", "22222222B")
+        assert sorted(buscar(client, "mar")) == ["Gil", "Sanz"]
+
+    def test_por_dni_email_telefono_y_ciudad(self, client):
+        nuevo(client, "Ana", "Ruiz", "12345678Z", phone1="611222333", city="Cádiz")
+        nuevo(client, "Luis", "Vega", "87654321X", city="Madrid")
+        assert buscar(client, "12345678z") == ["Ruiz"]
+        assert buscar(client, "87654321x@correo.es") == ["Vega"]
+        assert buscar(client, "611222") == ["Ruiz"]
+        assert buscar(client, "cadiz") == ["Ruiz"]
+
+    def test_dni_exacto_primero(self, client):
+        nuevo(client, "1234", "Prefijo", "12340000", city="1234")
+        nuevo(client, "Ana", "Exacta", "1234")
+        assert buscar(client, "1234") == ["Exacta", "Prefijo"]
+
+    def test_todas_las_palabras_deben_coincidir(self, client):
+        nuevo(client, "Ana", "García", "11111111A", city="Sevilla")
+        nuevo(client, "Ana", "López", "22222222B", city="Madrid")
+        assert buscar(client, "ana sevilla") == ["García"]
+
+    def test_refleja_cambios_y_borrados(self, client):
+        c = nuevo(client, "Eva", "Prieto", "11111111A")
+        client.put(f"/api/clientes/put/{c['id']}", json={"name": "Eva", "surnames": "Blanco"})
+        assert buscar(client, "prieto") == []
+        assert buscar(client, "blanco") == ["Blanco"]
+        client.delete(f"/api/clientes/delete/{c['id']}")
+        assert buscar(client, "eva") == []
+
+    def test_limite_y_sin_resultados(self, client):
+        for i in range(5):
+            nuevo(client, "Pablo", f"Apellido{i}", f"0000000{i}A")
+        assert len(buscar(client, "pablo", limit=3)) == 3
+        assert buscar(client, "zzz") == []
+        assert buscar(client, "--") == []
+
+    def test_importacion_masiva_queda_indexada(self, client):
+        from backend.app.entidades.cliente import CustomerDB
+        from sqlalchemy import insert
+        from test.backend.conftest import TestingSessionLocal
+        with TestingSessionLocal() as db:
+            db.execute(insert(CustomerDB), [
+                {"name": "Cliente", "surnames": f"Masivo{i}", "dni": f"{i:08d}M"} for i in range(50)
+            ])
+            db.commit()
+        assert buscar(client, "00000042m") == ["Masivo42"]
+
+    def test_sin_indice_usa_like(self, client, mocker):
+        from backend.app.services import clientes_service
+        mocker.patch.object(clientes_service, "_search_backend", return_value="like")
+        nuevo(client, "Ana", "Ruiz", "12345678Z", city="Madrid")
+        assert buscar(client, "ruiz madrid") == ["Ruiz"]
+
+    def test_create_all_parcial_no_crea_el_indice(self):
+        from sqlalchemy import create_engine, inspect
+        from backend.app.database import Base
+        from backend.app.entidades.usuario import UserDB
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[UserDB.__table__])
+        assert "clientes_fts" not in inspect(engine).get_table_names()
+        Base.metadata.drop_all(engine, tables=[UserDB.__table__])
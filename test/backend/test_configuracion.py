@@ -115,3 +115,108 @@ class TestWriteConfig:
         )
         assert r.status_code == 200
         assert r.json()["value"] == "2025-01-15"
+
+
+# ── Snapshot en memoria (config_cache) ───────────────────────────────────────
+import base64  # noqa: E402
+
+from sqlalchemy import event  # noqa: E402
+
+from backend.app.api.configuracion import get_value  # noqa: E402
+from backend.app.entidades.configuracion import ConfigDB  # noqa: E402
+from backend.app.utils import config_cache  # noqa: E402
+from test.backend.conftest import TestingSessionLocal, engine  # noqa: E402
+
+
+def _consultas_config(fn):
+    """Ejecuta fn() y cuenta los SELECT sobre la tabla configuracion."""
+    vistos = []
+
+    def _cuenta(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "configuracion" in statement:
+            vistos.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _cuenta)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _cuenta)
+    return len(vistos)
+
+
+class TestConfigCache:
+    def test_lecturas_repetidas_una_sola_consulta(self, client):
+        config_cache.invalidate()
+        db = TestingSessionLocal()
+        try:
+            def lecturas():
+                for _ in range(20):
+                    assert get_value(db, "tienda_nombre") == "FurniGest"
+                    assert get_value(db, "firma_email") == ""
+
+            assert _consultas_config(lecturas) == 1
+        finally:
+            db.close()
+
+    def test_put_invalida_el_snapshot(self, client):
+        assert client.get("/api/config").json()["tienda_nombre"] == "FurniGest"
+        client.put("/api/config/tienda_nombre", json={"key": "tienda_nombre", "value": "Otra"})
+        assert client.get("/api/config").json()["tienda_nombre"] == "Otra"
+
+    def test_escritura_directa_en_sesion_invalida(self, client):
+        db = TestingSessionLocal()
+        try:
+            assert get_value(db, "firma_email") == ""
+            db.add(ConfigDB(key="firma_email", value="Un saludo"))
+            db.commit()
+            assert get_value(db, "firma_email") == "Un saludo"
+        finally:
+            db.close()
+
+    def test_cambio_de_otro_proceso_tras_la_ventana(self, client, mocker):
+        db = TestingSessionLocal()
+        try:
+            assert get_value(db, "tienda_nombre") == "FurniGest"
+            # Simula otro proceso: escribe sin pasar por el ORM de esta sesión
+            with engine.begin() as conn:
+                conn.exec_driver_sql(
+                    "INSERT INTO configuracion (key, value, actualizado) "
+                    "VALUES ('tienda_nombre', 'Remota', CURRENT_TIMESTAMP)"
+                )
+            assert get_value(db, "tienda_nombre") == "FurniGest"
+            mocker.patch.object(config_cache, "CHECK_SECONDS", 0)
+            assert get_value(db, "tienda_nombre") == "Remota"
+        finally:
+            db.close()
+
+    def test_sin_cambios_solo_comprueba_la_marca(self, client, mocker):
+        mocker.patch.object(config_cache, "CHECK_SECONDS", 0)
+        db = TestingSessionLocal()
+        try:
+            get_value(db, "tienda_nombre")
+            # Una consulta de marca (count/max) por lectura, sin recargar
+            assert _consultas_config(lambda: get_value(db, "tienda_nombre")) == 1
+            assert config_cache.snapshot(db).values == {}
+        finally:
+            db.close()
+
+    def test_logo_decodificado_una_vez(self, client, mocker):
+        png = b"\x89PNG\r\n\x1a\nfake"
+        data_url = "data:image/png;base64," + base64.b64encode(png).decode()
+        client.put("/api/config/logo_empresa", json={"key": "logo_empresa", "value": data_url})
+        decode = mocker.spy(config_cache.base64, "b64decode")
+        db = TestingSessionLocal()
+        try:
+            assert config_cache.logo(db) == png
+            assert config_cache.logo(db) == png
+        finally:
+            db.close()
+        assert decode.call_count == 1
+
+    def test_logo_invalido_devuelve_none(self, client):
+        client.put("/api/config/logo_empresa", json={"key": "logo_empresa", "value": "@@no-base64@@"})
+        db = TestingSessionLocal()
+        try:
+            assert config_cache.logo(db) is None
+        finally:
+            db.close()
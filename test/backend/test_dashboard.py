@@ -0,0 +1,147 @@
+"""
+test_dashboard.py — Tests de GET /api/dashboard/summary.
+
+Cubre:
+  - Saldo, ingresos/gastos del periodo y del periodo anterior
+  - Albaranes por estado, almacén, en ruta e incidencias
+  - Clientes nuevos (primer albarán dentro del periodo)
+  - Periodo por defecto (mes en curso) y rango explícito
+  - Caché de corta duración e invalidación por escrituras
+"""
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from backend.app.services import dashboard_service
+
+
+@pytest.fixture(autouse=True)
+def mock_email_y_pdf():
+    with patch("backend.app.api.albaranes.enqueue_email", return_value=None), \
+         patch("backend.app.services.pdf_render_service.render", return_value=b""), \
+         patch("backend.app.api.albaranes.render", return_value="<html></html>"):
+        yield
+
+
+URL = "/api/dashboard/summary"
+ENERO = {"date_from": "2026-01-01", "date_to": "2026-01-31"}
+
+
+def movimiento(client, fecha, importe, tipo):
+    r = client.post("/api/movimientos/post", json={
+        "date": fecha, "description": "m", "amount": importe, "type": tipo,
+    })
+    assert r.status_code == 200
+
+
+def albaran(client, cliente_id, producto_id, fecha, estado="FIANZA"):
+    r = client.post("/api/albaranes/post", json={
+        "date": fecha,
+        "customer_id": cliente_id,
+        "items": [{"product_id": producto_id, "quantity": 1}],
+        "status": estado,
+        "register_deposit": False,
+    })
+    assert r.status_code == 200
+    return r.json()
+
+
+def otro_cliente(client, dni):
+    r = client.post("/api/clientes/post", json={
+        "name": "Otro", "surnames": "Cliente", "dni": dni,
+        "email": f"{dni}@x.com", "phone1": "600000001",
+    })
+    assert r.status_code == 200
+    return r.json()
+
+
+class TestResumen:
+    def test_bd_vacia(self, client):
+        body = client.get(URL, params=ENERO).json()
+        assert body["balance"] == 0.0
+        assert body["period"] == {
+            "income": 0.0, "expense": 0.0, "net": 0.0,
+            "delivery_notes": 0, "new_customers": 0,
+        }
+        assert body["delivery_notes_by_status"] == dict.fromkeys(dashboard_service.STATUSES, 0)
+        assert body["open_incidents"] == 0 and body["customers_total"] == 0
+
+    def test_movimientos_del_periodo_y_anterior(self, client):
+        movimiento(client, "2026-01-10", 300.0, "INGRESO")
+        movimiento(client, "2026-01-20", 100.0, "EGRESO")
+        movimiento(client, "2025-12-15", 50.0, "INGRESO")
+        movimiento(client, "2025-06-01", 20.0, "EGRESO")
+        body = client.get(URL, params=ENERO).json()
+        assert body["balance"] == 230.0
+        assert body["period"]["income"] == 300.0
+        assert body["period"]["expense"] == 100.0
+        assert body["period"]["net"] == 200.0
+        assert body["previous_range"] == {"from": "2025-12-01", "to": "2025-12-31"}
+        assert body["previous"]["income"] == 50.0
+        assert body["previous"]["expense"] == 0.0
+
+    def test_albaranes_por_estado(self, client, cliente_fixture, producto):
+        cid, pid = cliente_fixture["id"], producto["id"]
+        albaran(client, cid, pid, "2026-01-05")
+        albaran(client, cid, pid, "2026-01-06", "ALMACEN")
+        albaran(client, cid, pid, "2026-01-07", "ALMACEN")
+        albaran(client, cid, pid, "2025-12-20", "RUTA")
+        body = client.get(URL, params=ENERO).json()
+        assert body["delivery_notes_by_status"]["FIANZA"] == 1
+        assert body["warehouse"] == 2
+        assert body["in_route"] == 1
+        assert body["period"]["delivery_notes"] == 3
+        assert body["previous"]["delivery_notes"] == 1
+        assert body["customers_total"] == 1
+
+    def test_incidencias_abiertas(self, client, cliente_fixture, producto):
+        alb = albaran(client, cliente_fixture["id"], producto["id"], "2026-01-05")
+        client.patch(f"/api/albaranes/{alb['id']}/estado", json={"status": "ENTREGADO"})
+        r = client.post("/api/incidencias/post", json={"albaran_id": alb["id"], "descripcion": "Roto"})
+        assert r.status_code == 200
+        body = client.get(URL, params=ENERO).json()
+        assert body["open_incidents"] == 1
+        assert body["delivery_notes_by_status"]["INCIDENCIA"] == 1
+
+    def test_clientes_nuevos(self, client, cliente_fixture, producto):
+        nuevo = otro_cliente(client, "87654321B")
+        albaran(client, cliente_fixture["id"], producto["id"], "2025-12-10")
+        albaran(client, cliente_fixture["id"], producto["id"], "2026-01-10")
+        albaran(client, nuevo["id"], producto["id"], "2026-01-12")
+        body = client.get(URL, params=ENERO).json()
+        assert body["period"]["new_customers"] == 1
+        assert body["customers_total"] == 2
+
+    def test_periodo_por_defecto_es_el_mes_en_curso(self, client):
+        hoy = date.today()
+        body = client.get(URL).json()
+        assert body["range"]["from"] == hoy.replace(day=1).isoformat()
+        assert body["range"]["to"] >= hoy.isoformat()
+
+    def test_rango_explicito_y_anterior_de_igual_longitud(self, client):
+        body = client.get(URL, params={"date_from": "2026-01-11", "date_to": "2026-01-20"}).json()
+        assert body["range"] == {"from": "2026-01-11", "to": "2026-01-20"}
+        assert body["previous_range"] == {"from": "2026-01-01", "to": "2026-01-10"}
+
+    def test_rango_invertido(self, client):
+        r = client.get(URL, params={"date_from": "2026-02-01", "date_to": "2026-01-01"})
+        assert r.status_code == 400
+
+    def test_desde_futuro_sin_hasta(self, client):
+        futuro = date.today() + timedelta(days=10)
+        r = client.get(URL, params={"date_from": futuro.isoformat()})
+        assert r.status_code == 400
+
+
+class TestCache:
+    def test_repite_sin_consultar(self, client, mocker):
+        spy = mocker.spy(dashboard_service, "_compute")
+        client.get(URL, params=ENERO)
+        client.get(URL, params=ENERO)
+        assert spy.call_count == 1
+
+    def test_escritura_de_albaran_invalida(self, client, cliente_fixture, producto):
+        assert client.get(URL, params=ENERO).json()["period"]["delivery_notes"] == 0
+        albaran(client, cliente_fixture["id"], producto["id"], "2026-01-05")
+        assert client.get(URL, params=ENERO).json()["period"]["delivery_notes"] == 1
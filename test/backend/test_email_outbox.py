@@ -0,0 +1,292 @@
+"""
+test_email_outbox.py — Tests de la cola persistente de emails.
+
+Se prueba contra un servidor SMTP local mínimo (hilo con socketserver) que
+cuenta conexiones y mensajes recibidos:
+  - reutilización de la sesión SMTP para muchos mensajes
+  - rechazo permanente → FALLIDO (dead letter) sin cortar la sesión
+  - errores temporales → reintento con backoff y FALLIDO al agotar intentos
+  - reclamación de filas bloqueadas por un worker caído
+  - pool de workers y endpoints /api/emails/outbox
+"""
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.entidades.email_outbox import EmailOutboxDB
+from backend.app.utils import email_outbox, emailer
+from test.backend.conftest import TestingSessionLocal
+
+
+# ── Servidor SMTP de pruebas ─────────────────────────────────────────────────
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.connections += 1
+        self._reply("220 localhost ESMTP prueba")
+        in_session = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode().strip()
+            verb = cmd[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-localhost")
+                self._reply("250 8BITMIME")
+            elif verb == "MAIL":
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                if any(r in cmd for r in srv.reject):
+                    self._reply("550 Mailbox unavailable")
+                else:
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b""
+                while not data.endswith(b"\r\n.\r\n"):
+                    chunk = self.rfile.readline()
+                    if not chunk:
+                        return
+                    data += chunk
+                with srv.lock:
+                    srv.messages.append(data)
+                self._reply("250 OK queued")
+                in_session += 1
+                if srv.close_after and in_session >= srv.close_after:
+                    return  # corta la conexión sin QUIT, como un timeout del servidor
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages: list[bytes] = []
+        self.reject: set[str] = set()
+        self.close_after = 0
+
+
+@pytest.fixture()
+def smtp_server(monkeypatch):
+    srv = _SMTPServer()
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(emailer, "EMAIL_HOST", "127.0.0.1")
+    monkeypatch.setattr(emailer, "EMAIL_PORT", srv.server_address[1])
+    monkeypatch.setattr(emailer, "EMAIL_USE_TLS", False)
+    monkeypatch.setattr(emailer, "EMAIL_USER", "")
+    monkeypatch.setattr(emailer, "RESEND_API_KEY", "")
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture()
+def db():
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+
+
+def _encolar(db, n, **kwargs):
+    return [
+        email_outbox.enqueue(
+            db, kwargs.get("to", f"cliente{i}@example.com"), f"Albarán #{i}", "<p>Hola</p>",
+            attachment=kwargs.get("attachment"), attachment_name=kwargs.get("attachment_name"),
+        )
+        for i in range(n)
+    ]
+
+
+# ── Envío ────────────────────────────────────────────────────────────────────
+class TestDrain:
+    def test_muchos_mensajes_una_sola_conexion(self, db, smtp_server):
+        _encolar(db, 120, attachment=b"%PDF-1.4 fake", attachment_name="albaran.pdf")
+        assert email_outbox.drain(db) == 120
+        assert len(smtp_server.messages) == 120
+        # 120 mensajes con SMTP_MAX_MESSAGES=100: dos conexiones, no 120
+        assert smtp_server.connections == 2
+        assert email_outbox.stats(db)["ENVIADO"] == 120
+
+    def test_enviado_libera_el_adjunto(self, db, smtp_server):
+        (row,) = _encolar(db, 1, attachment=b"%PDF-1.4 fake", attachment_name="a.pdf")
+        email_outbox.drain(db)
+        db.refresh(row)
+        assert row.status == "ENVIADO"
+        assert row.attachment is None
+        assert row.sent_at is not None
+        assert row.attempts == 1
+        assert b'filename="a.pdf"' in smtp_server.messages[0]
+
+    def test_rechazo_permanente_va_a_dead_letter(self, db, smtp_server):
+        smtp_server.reject.add("malo@example.com")
+        _encolar(db, 2)
+        malo = email_outbox.enqueue(db, "malo@example.com", "x", "<p>x</p>")
+        _encolar(db, 2)
+        email_outbox.drain(db)
+        db.refresh(malo)
+        assert malo.status == "FALLIDO"
+        assert "SMTPRecipientsRefused" in malo.last_error
+        assert len(smtp_server.messages) == 4
+        # El rechazo no obliga a reconectar
+        assert smtp_server.connections == 1
+
+    def test_reconecta_si_el_servidor_cierra_la_sesion(self, db, smtp_server):
+        smtp_server.close_after = 3
+        _encolar(db, 7)
+        email_outbox.drain(db)
+        assert len(smtp_server.messages) == 7
+        assert email_outbox.stats(db)["ENVIADO"] == 7
+        assert smtp_server.connections == 3
+
+    def test_no_envia_lo_que_aun_no_toca(self, db, smtp_server):
+        (row,) = _encolar(db, 1)
+        row.next_attempt_at = datetime.utcnow() + timedelta(minutes=5)
+        db.commit()
+        assert email_outbox.drain(db) == 0
+        assert smtp_server.messages == []
+
+
+class TestReintentos:
+    def test_error_temporal_programa_reintento_con_backoff(self, db, smtp_server):
+        (row,) = _encolar(db, 1)
+        smtp = emailer.SmtpSession(port=1)  # nadie escucha: conexión rechazada
+        antes = datetime.utcnow()
+        assert email_outbox.process_batch(db, smtp) == 1
+        db.refresh(row)
+        assert row.status == "PENDIENTE"
+        assert row.attempts == 1
+        assert row.next_attempt_at >= antes + email_outbox.backoff(1)
+        assert row.last_error
+
+    def test_agota_intentos_y_pasa_a_fallido(self, db, smtp_server, monkeypatch):
+        monkeypatch.setattr(email_outbox, "MAX_ATTEMPTS", 3)
+        monkeypatch.setattr(email_outbox, "BACKOFF_SECONDS", 0)
+        (row,) = _encolar(db, 1)
+        email_outbox.drain(db, emailer.SmtpSession(port=1))
+        db.refresh(row)
+        assert row.status == "FALLIDO"
+        assert row.attempts == 3
+
+    def test_backoff_exponencial_con_tope(self):
+        assert email_outbox.backoff(1) == timedelta(seconds=email_outbox.BACKOFF_SECONDS)
+        assert email_outbox.backoff(3) == 4 * email_outbox.backoff(1)
+        assert email_outbox.backoff(50) == timedelta(seconds=email_outbox.MAX_BACKOFF_SECONDS)
+
+    def test_reclama_filas_de_un_worker_caido(self, db, smtp_server):
+        (row,) = _encolar(db, 1)
+        row.status = "ENVIANDO"
+        row.locked_by = "worker-muerto"
+        row.locked_until = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        assert email_outbox.drain(db) == 1
+        db.refresh(row)
+        assert row.status == "ENVIADO"
+
+    def test_no_reclama_filas_bloqueadas_vigentes(self, db, smtp_server):
+        (row,) = _encolar(db, 1)
+        row.status = "ENVIANDO"
+        row.locked_until = datetime.utcnow() + timedelta(minutes=5)
+        db.commit()
+        assert email_outbox.claim(db) == []
+
+
+class TestWorkerPool:
+    def test_el_pool_vacia_la_cola(self, db, smtp_server):
+        _encolar(db, 10)
+        pool = email_outbox.OutboxWorkerPool(size=1)
+        pool.start()
+        try:
+            limite = time.monotonic() + 5
+            while len(smtp_server.messages) < 10 and time.monotonic() < limite:
+                time.sleep(0.02)
+        finally:
+            pool.stop()
+        assert len(smtp_server.messages) == 10
+        assert smtp_server.connections == 1
+        assert email_outbox.stats(db)["ENVIADO"] == 10
+
+    def test_pool_sin_workers_no_arranca_hilos(self):
+        pool = email_outbox.OutboxWorkerPool(size=0)
+        pool.start()
+        assert pool._threads == []
+        pool.stop()
+
+
+# ── API ──────────────────────────────────────────────────────────────────────
+class TestOutboxApi:
+    def test_stats(self, client):
+        db = TestingSessionLocal()
+        try:
+            _encolar(db, 2)
+        finally:
+            db.close()
+        r = client.get("/api/emails/outbox/stats")
+        assert r.status_code == 200
+        assert r.json()["PENDIENTE"] == 2
+        assert r.json()["FALLIDO"] == 0
+
+    def test_listar_y_reintentar_dead_letter(self, client):
+        db = TestingSessionLocal()
+        try:
+            db.add(EmailOutboxDB(
+                to_email="x@example.com", subject="s", html_body="<p/>",
+                status="FALLIDO", attempts=6, last_error="SMTPDataError",
+                next_attempt_at=datetime.utcnow(),
+            ))
+            db.commit()
+        finally:
+            db.close()
+        failed = client.get("/api/emails/outbox/failed").json()
+        assert [f["to_email"] for f in failed] == ["x@example.com"]
+        r = client.post(f"/api/emails/outbox/{failed[0]['id']}/retry")
+        assert r.status_code == 200
+        assert r.json()["status"] == "PENDIENTE"
+        assert client.get("/api/emails/outbox/failed").json() == []
+
+    def test_reintentar_no_fallido_devuelve_409(self, client):
+        db = TestingSessionLocal()
+        try:
+            (row,) = _encolar(db, 1)
+            row_id = row.id
+        finally:
+            db.close()
+        assert client.post(f"/api/emails/outbox/{row_id}/retry").status_code == 409
+
+    def test_reintentar_inexistente_devuelve_404(self, client):
+        assert client.post("/api/emails/outbox/9999/retry").status_code == 404
+
+    def test_enviar_albaran_lo_deja_en_la_cola(self, client, cliente_fixture, producto, mocker):
+        mocker.patch("backend.app.services.pdf_render_service.render", return_value=b"%PDF")
+        mocker.patch("backend.app.api.albaranes.render", return_value="<html></html>")
+        aid = client.post("/api/albaranes/post", json={
+            "date": "2026-03-01",
+            "customer_id": cliente_fixture["id"],
+            "items": [{"product_id": producto["id"], "quantity": 1, "unit_price": 5.0}],
+            "status": "FIANZA",
+        }).json()["id"]
+        client.post(f"/api/albaranes/{aid}/send-email")
+        db = TestingSessionLocal()
+        try:
+            rows = db.query(EmailOutboxDB).all()
+        finally:
+            db.close()
+        assert any(r.attachment_name == f"albaran_{aid}.pdf" for r in rows)
@@ -0,0 +1,286 @@
+"""
+test_groq_llm.py — Tests del cliente de Groq contra un servidor local
+OpenAI-compatible (http.server en un hilo).
+
+Cubre:
+  - groq_chat(): respuesta, métricas de tokens y reintentos con Retry-After
+  - groq_chat_stream(): eventos SSE
+  - Circuit breaker: falla rápido tras errores consecutivos y se recupera
+  - Semáforo global de concurrencia
+  - Caché persistente de respuestas (tabla llm_cache): aciertos, opt-out, TTL y LRU
+  - GET /api/ai/llm/stats
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app.utils import groq_llm
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Servidor /chat/completions: responde según la cola `script` del servidor."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+        self.server.requests.append(body)
+        status, headers = self.server.script.pop(0) if self.server.script else (200, {})
+        if self.server.gate is not None:
+            self.server.gate.wait(5)
+        if status != 200:
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if body.get("stream"):
+            payload = "".join(
+                f"data: {json.dumps({'choices': [{'delta': {'content': t}}]})}\n\n"
+                for t in ("Hola", " mundo")
+            ) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            payload = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": " respuesta "}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 3},
+            })
+            content_type = "application/json"
+        data = payload.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def servidor(mocker):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    server.script, server.requests, server.gate = [], [], None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    mocker.patch.object(groq_llm, "GROQ_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    mocker.patch.object(groq_llm, "GROQ_API_KEY", "k")
+    mocker.patch.object(groq_llm, "breaker", groq_llm.CircuitBreaker(3, 30))
+    mocker.patch.object(groq_llm, "metrics", groq_llm._Metrics())
+    sleeps = []
+    mocker.patch.object(groq_llm, "_sleep", sleeps.append)
+    server.sleeps = sleeps
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+MSGS = [{"role": "user", "content": "hola"}]
+
+
+class TestGroqChat:
+    def test_respuesta_y_metricas(self, servidor):
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert servidor.requests[0]["messages"] == MSGS
+        stats = groq_llm.llm_stats()
+        assert stats["calls"] == 1 and stats["errors"] == 0
+        assert stats["prompt_tokens"] == 12 and stats["completion_tokens"] == 3
+        assert stats["circuit"] == "closed"
+
+    def test_reintenta_429_respetando_retry_after(self, servidor):
+        servidor.script = [(429, {"Retry-After": "7"}), (503, {})]
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert len(servidor.requests) == 3
+        assert servidor.sleeps[0] == 7.0
+        assert 1.0 <= servidor.sleeps[1] <= 1.25  # backoff exponencial sin cabecera
+        assert groq_llm.llm_stats()["retries"] == 2
+
+    def test_agota_reintentos(self, servidor, mocker):
+        mocker.patch.object(groq_llm, "MAX_RETRIES", 1)
+        servidor.script = [(500, {}), (500, {})]
+        with pytest.raises(Exception):
+            groq_llm.groq_chat(MSGS)
+        assert len(servidor.requests) == 2
+        assert groq_llm.llm_stats()["errors"] == 1
+
+    def test_4xx_no_se_reintenta(self, servidor):
+        servidor.script = [(400, {})]
+        with pytest.raises(Exception):
+            groq_llm.groq_chat(MSGS)
+        assert len(servidor.requests) == 1
+
+    def test_sin_api_key(self, servidor, mocker):
+        mocker.patch.object(groq_llm, "GROQ_API_KEY", "")
+        with pytest.raises(RuntimeError):
+            groq_llm.groq_chat(MSGS)
+        assert servidor.requests == []
+
+    def test_stream(self, servidor):
+        assert list(groq_llm.groq_chat_stream(MSGS)) == ["Hola", " mundo"]
+        assert servidor.requests[0]["stream"] is True
+        assert groq_llm.llm_stats()["calls"] == 1
+
+
+class TestCircuitBreaker:
+    def test_abre_tras_fallos_y_falla_rapido(self, servidor, mocker):
+        mocker.patch.object(groq_llm, "MAX_RETRIES", 0)
+        servidor.script = [(500, {})] * 3
+        for _ in range(3):
+            with pytest.raises(Exception):
+                groq_llm.groq_chat(MSGS)
+        with pytest.raises(groq_llm.LLMUnavailable):
+            groq_llm.groq_chat(MSGS)
+        assert len(servidor.requests) == 3  # la cuarta no llega al servidor
+        stats = groq_llm.llm_stats()
+        assert stats["circuit"] == "open" and stats["rejected"] == 1
+
+    def test_4xx_no_abre_el_circuito(self, servidor):
+        servidor.script = [(400, {}), (401, {}), (413, {})]
+        for _ in range(3):
+            with pytest.raises(Exception):
+                groq_llm.groq_chat(MSGS)
+        assert groq_llm.breaker.state == "closed"
+        assert groq_llm.breaker.failures == 0
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+
+    def test_4xx_en_semiabierto_libera_la_prueba(self, servidor):
+        breaker = groq_llm.breaker
+        breaker.failures, breaker.opened_at = 3, 0.0
+        servidor.script = [(400, {})]
+        with pytest.raises(Exception):
+            groq_llm.groq_chat(MSGS)
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert breaker.state == "closed"
+
+    def test_semiabierto_deja_pasar_una_prueba(self, servidor, mocker):
+        breaker = groq_llm.breaker
+        breaker.failures, breaker.opened_at = 3, 0.0  # abierto hace mucho
+        assert breaker.state == "half_open"
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert breaker.state == "closed"
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        breaker = groq_llm.CircuitBreaker(3, 30)
+        breaker.failures, breaker.opened_at = 3, 0.0
+        breaker.before_call()
+        with pytest.raises(groq_llm.LLMUnavailable):
+            breaker.before_call()  # solo una llamada de prueba a la vez
+        breaker.failure()
+        assert breaker.state == "open"
+
+    def test_endpoint_usa_fallback_con_circuito_abierto(self, client, servidor):
+        groq_llm.breaker.failures = 3
+        groq_llm.breaker.opened_at = time.monotonic()
+        r = client.post("/api/ai/chat", json={"messages": [{"role": "user", "content": "hola"}]})
+        assert r.status_code == 200
+        assert "Lo siento" in r.json()["answer"]
+        assert servidor.requests == []
+
+
+class TestConcurrencia:
+    def test_semaforo_limita_llamadas_simultaneas(self, servidor, mocker):
+        mocker.patch.object(groq_llm, "_semaphore", threading.BoundedSemaphore(1))
+        mocker.patch.object(groq_llm, "QUEUE_TIMEOUT", 0.2)
+        servidor.gate = threading.Event()
+        primera = threading.Thread(target=groq_llm.groq_chat, args=(MSGS,))
+        primera.start()
+        while not servidor.requests:
+            time.sleep(0.01)
+        with pytest.raises(groq_llm.LLMUnavailable):
+            groq_llm.groq_chat(MSGS)
+        servidor.gate.set()
+        primera.join(5)
+        assert groq_llm.breaker.state == "closed"
+        assert groq_llm.llm_stats()["rejected"] == 1
+
+
+class TestLlmCache:
+    def test_prompt_identico_no_llama_a_groq(self, servidor):
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert len(servidor.requests) == 1
+        stats = groq_llm.llm_stats()
+        assert stats["cache_hits"] == 1 and stats["calls"] == 1
+        assert stats["cache"]["entries"] == 1
+
+    def test_la_clave_incluye_temperatura_y_modelo(self, servidor):
+        groq_llm.groq_chat(MSGS)
+        groq_llm.groq_chat(MSGS, temperature=0.7)
+        groq_llm.groq_chat(MSGS, model="otro")
+        assert len(servidor.requests) == 3
+
+    def test_opt_out(self, servidor):
+        groq_llm.groq_chat(MSGS)
+        groq_llm.groq_chat(MSGS, cache=False)
+        assert len(servidor.requests) == 2
+
+    def test_acierto_con_circuito_abierto(self, servidor):
+        groq_llm.groq_chat(MSGS)
+        groq_llm.breaker.failures = 3
+        groq_llm.breaker.opened_at = time.monotonic()
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+
+    def test_errores_no_se_guardan(self, servidor):
+        servidor.script = [(400, {})]
+        with pytest.raises(Exception):
+            groq_llm.groq_chat(MSGS)
+        assert groq_llm.groq_chat(MSGS) == "respuesta"
+        assert len(servidor.requests) == 2
+
+    def test_stream_se_guarda_y_se_reutiliza(self, servidor):
+        assert list(groq_llm.groq_chat_stream(MSGS)) == ["Hola", " mundo"]
+        assert list(groq_llm.groq_chat_stream(MSGS)) == ["Hola mundo"]
+        assert len(servidor.requests) == 1
+
+    def test_expira_por_ttl(self, servidor, mocker):
+        from backend.app.utils import llm_cache
+        groq_llm.groq_chat(MSGS)
+        mocker.patch.object(llm_cache, "TTL", -1)
+        groq_llm.groq_chat(MSGS)
+        assert len(servidor.requests) == 2
+
+    def test_expulsa_la_menos_usada(self, servidor, mocker):
+        from backend.app.utils import llm_cache
+        mocker.patch.object(llm_cache, "MAX_ENTRIES", 2)
+        mocker.patch.object(llm_cache, "TOUCH_SECONDS", 0)
+        a, b, c = ([{"role": "user", "content": t}] for t in "abc")
+        groq_llm.groq_chat(a)
+        groq_llm.groq_chat(b)
+        groq_llm.groq_chat(a)  # acierto: 'a' pasa a ser la más reciente
+        groq_llm.groq_chat(c)  # expulsa 'b'
+        assert len(servidor.requests) == 3
+        groq_llm.groq_chat(a)
+        assert len(servidor.requests) == 3
+        groq_llm.groq_chat(b)
+        assert len(servidor.requests) == 4
+
+
+    def test_acierto_reciente_no_escribe(self, servidor):
+        from sqlalchemy import event
+        from test.backend.conftest import engine
+        groq_llm.groq_chat(MSGS)
+        sql = []
+
+        def capturar(_conn, _cursor, statement, *_args):
+            sql.append(statement.split()[0].upper())
+
+        event.listen(engine, "before_cursor_execute", capturar)
+        try:
+            for _ in range(3):
+                assert groq_llm.groq_chat(MSGS) == "respuesta"
+        finally:
+            event.remove(engine, "before_cursor_execute", capturar)
+        assert sql == ["SELECT"] * 3
+        assert groq_llm.llm_stats()["cache_hits"] == 3
+
+
+class TestLlmStatsEndpoint:
+    def test_devuelve_contadores(self, client, servidor):
+        groq_llm.groq_chat(MSGS)
+        body = client.get("/api/ai/llm/stats").json()
+        assert body["calls"] == 1
+        assert body["circuit"] == "closed"
+        assert "latency_ms_avg" in body
@@ -6,8 +6,8 @@ import pytest
 @pytest.fixture(autouse=True)
 def mock_email_y_pdf():
     """Neutraliza email y PDF en todos los tests de este módulo."""
-    with patch("backend.app.api.albaranes.send_email_with_pdf", return_value=None), \
-         patch("backend.app.api.albaranes.generate_delivery_note_pdf", return_value=b""), \
+    with patch("backend.app.api.albaranes.enqueue_email", return_value=None), \
+         patch("backend.app.services.pdf_render_service.render", return_value=b""), \
          patch("backend.app.api.albaranes.render", return_value="<html></html>"):
         yield
 
@@ -0,0 +1,138 @@
+"""
+test_pdf_render.py — Tests del servicio de render de PDFs en procesos.
+
+  - cada tipo de documento se renderiza a partir de datos planos
+  - el pool real (spawn) devuelve PDFs válidos y arranca con los workers calientes
+  - con la cola llena se responde 503 con Retry-After
+  - render_many en paralelo y ZIP emitido miembro a miembro
+"""
+import io
+import pickle
+import zipfile
+from datetime import date, datetime
+
+import pytest
+
+from backend.app.services import pdf_render_service
+from backend.app.services.pdf_render_service import RenderQueueFull, RenderService
+from backend.app.utils.zip_stream import stream_zip
+from test.backend.test_transportes import crear_albaran_almacen
+
+
+ALBARAN = {
+    "albaran": {"id": 7, "date": date(2026, 3, 1), "total": 100.0, "customer_id": 1},
+    "cliente": {"id": 1, "name": "Juan", "surnames": "García", "email": "j@x.com"},
+    "lineas": [{"product_name": "Mesa", "quantity": 2, "unit_price": 50.0, "subtotal": 100.0}],
+    "tienda_nombre": "Tienda Test",
+}
+FACTURA = {
+    "truck_id": 3,
+    "albaranes": [{"id": 7, "date": datetime(2026, 3, 1), "total": 100.0, "customer_id": 1}],
+    "clientes": {1: {"id": 1, "name": "Juan", "surnames": "García"}},
+}
+
+
+@pytest.fixture(scope="module")
+def pool():
+    service = RenderService(workers=1, max_pending=2)
+    service.start()
+    yield service
+    service.shutdown()
+
+
+class TestRenderInline:
+    @pytest.mark.parametrize("kind, document", [("albaran", ALBARAN), ("factura_ruta", FACTURA)])
+    def test_renderiza_desde_datos_planos(self, kind, document):
+        pickle.dumps(document)  # lo que viaja al worker debe ser serializable
+        pdf = RenderService(workers=0).render(kind, document)
+        assert pdf.startswith(b"%PDF")
+
+    def test_tipo_desconocido(self):
+        with pytest.raises(ValueError):
+            RenderService(workers=0).render("otro", {})
+
+
+class TestRenderPool:
+    def test_pool_renderiza_en_otro_proceso(self, pool):
+        pdf = pool.render("albaran", ALBARAN)
+        assert pdf.startswith(b"%PDF")
+        assert len(pdf) > 1000
+        assert pool.stats()["workers"] == 1
+
+    def test_varios_documentos(self, pool):
+        pdfs = [pool.render("factura_ruta", FACTURA, block=True) for _ in range(3)]
+        assert all(p.startswith(b"%PDF") for p in pdfs)
+
+    def test_cola_llena_devuelve_503(self, pool, monkeypatch):
+        monkeypatch.setattr(pdf_render_service, "QUEUE_WAIT_SECONDS", 0.01)
+        for _ in range(pool.max_pending):
+            pool._slots.acquire()
+        try:
+            with pytest.raises(RenderQueueFull) as exc:
+                pool.render("albaran", ALBARAN)
+        finally:
+            for _ in range(pool.max_pending):
+                pool._slots.release()
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"]
+        assert pool.stats()["rejected"] == 1
+
+
+class TestRenderApi:
+    def test_factura_ruta_saturada_devuelve_503(self, client, cliente_fixture, producto, pool, monkeypatch):
+        alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+        client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": 5})
+        monkeypatch.setattr(pdf_render_service, "service", pool)
+        assert client.get("/api/transporte/ruta/5/factura").status_code == 200
+
+        monkeypatch.setattr(pdf_render_service, "QUEUE_WAIT_SECONDS", 0.01)
+        for _ in range(pool.max_pending):
+            pool._slots.acquire()
+        try:
+            r = client.get("/api/transporte/ruta/5/factura")
+        finally:
+            for _ in range(pool.max_pending):
+                pool._slots.release()
+        assert r.status_code == 503
+        assert "Retry-After" in r.headers
+
+
+class TestRenderMany:
+    def test_renderiza_todos_en_paralelo(self, pool):
+        docs = [(i, "factura_ruta", {**FACTURA, "truck_id": i}) for i in range(5)]
+        result = dict(pool.render_many(docs, window=2))
+        assert sorted(result) == list(range(5))
+        assert all(pdf.startswith(b"%PDF") for pdf in result.values())
+
+    def test_sin_documentos(self, pool):
+        assert list(pool.render_many([])) == []
+
+    def test_pool_saturado_falla_antes_de_empezar(self, pool, monkeypatch):
+        monkeypatch.setattr(pdf_render_service, "QUEUE_WAIT_SECONDS", 0.01)
+        for _ in range(pool.max_pending):
+            pool._slots.acquire()
+        try:
+            with pytest.raises(RenderQueueFull):
+                pool.render_many([(1, "factura_ruta", FACTURA)])
+        finally:
+            for _ in range(pool.max_pending):
+                pool._slots.release()
+
+
+class TestZipStream:
+    def test_emite_cada_miembro_al_terminarlo(self):
+        producidos = []
+
+        def miembros():
+            for i in range(3):
+                producidos.append(i)
+                yield f"f{i}.pdf", b"%PDF" + bytes([i]) * 1000
+
+        chunks = []
+        for chunk in stream_zip(miembros()):
+            # Cada trozo sale antes de producir el siguiente miembro
+            chunks.append((len(producidos), chunk))
+        assert [n for n, _ in chunks] == [1, 2, 3, 3]
+        with zipfile.ZipFile(io.BytesIO(b"".join(c for _, c in chunks))) as zf:
+            assert zf.testzip() is None
+            assert zf.read("f1.pdf") == b"%PDF" + b"\x01" * 1000
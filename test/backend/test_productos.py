@@ -87,4 +87,105 @@ class TestEliminarProducto:
             "items": [{"product_id": prod["id"], "quantity": 1, "unit_price": 10.0}],
         })
         r = client.delete(f"/api/productos/delete/{prod['id']}")
-        assert r.status_code == 409
\ No newline at end of file
+        assert r.status_code == 409
+
+def nuevo(client, proveedor_id, name, description="-"):
+    r = client.post("/api/productos/post", json={
+        "name": name, "description": description, "price": 1.0, "supplier_id": proveedor_id,
+    })
+    assert r.status_code == 200
+    return r.json()
+
+
+def buscar(client, q, limit=20):
+    r = client.get("/api/productos/search", params={"q": q, "limit": limit})
+    assert r.status_code == 200
+    return [p["name"] for p in r.json()]
+
+
+class TestBuscarProducto:
+    def test_sin_tildes_ni_mayusculas(self, client, proveedor):
+        nuevo(client, proveedor["id"], "Sofá Cómodo")
+        assert buscar(client, "sofa comodo") == ["Sofá Cómodo"]
+        assert buscar(client, "SOFÁ") == ["Sofá Cómodo"]
+
+    def test_orden_exacto_prefijo_palabra_subcadena(self, client, proveedor):
+        pid = proveedor["id"]
+        nuevo(client, pid, "Aparador mesa")
+        nuevo(client, pid, "Sobremesa")
+        nuevo(client, pid, "Mesa comedor")
+        nuevo(client, pid, "Mesa")
+        nuevo(client, pid, "Silla", "Para la mesa del salón")
+        assert buscar(client, "mesa") == [
+            "Mesa", "Mesa comedor", "Aparador mesa", "Silla", "Sobremesa",
+        ]
+
+    def test_varias_palabras_en_cualquier_orden(self, client, proveedor):
+        nuevo(client, proveedor["id"], "Mesa de roble extensible")
+        nuevo(client, proveedor["id"], "Mesa de pino")
+        assert buscar(client, "roble mes") == ["Mesa de roble extensible"]
+
+    def test_busca_en_descripcion_y_proveedor(self, client, proveedor):
+        nuevo(client, proveedor["id"], "Cama", "Estructura de nogal")
+        assert buscar(client, "nogal") == ["Cama"]
+        assert buscar(client, "proveedor test") == ["Cama"]
+
+    def test_aproximada_con_errata(self, client, proveedor):
+        nuevo(client, proveedor["id"], "Armario ropero")
+        nuevo(client, proveedor["id"], "Estantería")
+        assert buscar(client, "armaro") == ["Armario ropero"]
+        assert buscar(client, "estanterai") == ["Estantería"]
+
+    def test_limite_y_sin_resultados(self, client, proveedor):
+        for i in range(5):
+            nuevo(client, proveedor["id"], f"Lámpara {i}")
+        assert len(buscar(client, "lampara", limit=3)) == 3
+        assert buscar(client, "xyz") == []
+
+    def test_se_actualiza_al_crear_editar_y_borrar(self, client, proveedor):
+        assert buscar(client, "cojin") == []  # construye el índice
+        prod = nuevo(client, proveedor["id"], "Cojín")
+        assert buscar(client, "cojin") == ["Cojín"]
+        client.put(f"/api/productos/put/{prod['id']}", json={
+            "name": "Puf", "description": "-", "price": 1.0, "supplier_id": proveedor["id"],
+        })
+        assert buscar(client, "cojin") == []
+        assert buscar(client, "puf") == ["Puf"]
+        client.delete(f"/api/productos/delete/{prod['id']}")
+        assert buscar(client, "puf") == []
+
+    def test_renombrar_y_borrar_proveedor(self, client, proveedor):
+        nuevo(client, proveedor["id"], "Cómoda")
+        assert buscar(client, "comoda") == ["Cómoda"]
+        client.put(f"/api/proveedores/put/{proveedor['id']}", json={"name": "Muebles Norte", "contact": "x"})
+        assert buscar(client, "norte") == ["Cómoda"]
+        assert buscar(client, "proveedor test") == []
+        client.delete(f"/api/proveedores/delete/{proveedor['id']}")
+        assert buscar(client, "comoda") == []
+
+    def test_no_recarga_el_catalogo_en_cada_busqueda(self, client, proveedor, mocker):
+        from backend.app.utils.product_index import index
+        nuevo(client, proveedor["id"], "Mesa")
+        spy = mocker.spy(index, "build")
+        for q in ("m", "me", "mes", "mesa"):
+            assert buscar(client, q) == ["Mesa"]
+        assert spy.call_count == 1
+
+    def test_reconstruye_en_segundo_plano_si_esta_caducado(self, client, proveedor, mocker):
+        """Los productos escritos sin pasar por el servicio aparecen tras el refresco."""
+        import time
+        from backend.app.utils import product_index
+        from backend.app.entidades.producto import ProductDB
+        from test.backend.conftest import TestingSessionLocal
+        assert buscar(client, "banco") == []
+        with TestingSessionLocal() as db:
+            db.add(ProductDB(name="Banco", description="-", price=1.0, supplier_id=proveedor["id"]))
+            db.commit()
+        mocker.patch.object(product_index, "MAX_AGE", 1)
+        product_index.index.built_at -= 5
+        buscar(client, "banco")  # sirve el índice actual y lanza la reconstrucción
+        for _ in range(100):
+            if buscar(client, "banco"):
+                break
+            time.sleep(0.02)
+        assert buscar(client, "banco") == ["Banco"]
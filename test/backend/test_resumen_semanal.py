@@ -8,15 +8,19 @@ Cubre:
   - _build_html(): construcciÃ³n del HTML del resumen
   - _run(): flujo completo con distintas condiciones
   - job_resumen_semanal(): wrapper de hilo de background
+  - next_run_at() / reschedule(): programación por eventos y recuperación
+  - job_lease: un único envío con varios workers
 """
 import pytest
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from unittest.mock import patch, MagicMock
+from zoneinfo import ZoneInfo
 
 from backend.app.entidades.configuracion import ConfigDB
 from backend.app.entidades.movimiento import MovementDB
 from backend.app.entidades.albaran import DeliveryNoteDB
 from backend.app.utils.resumen_semanal import (
+    TZ,
     _get,
     _set,
     _run,
@@ -264,29 +268,34 @@ class TestNextMonthLabel:
 
 
 # â”€â”€ _run â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€
+def _hoy():
+    """Fecha actual en Europe/Madrid, el calendario que usa _run()."""
+    return datetime.now(tz=TZ).date()
+
+
 class TestRun:
     def test_omite_si_no_hay_email(self, db):
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email:
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email:
             _run(db)
         mock_email.assert_not_called()
 
     def test_omite_si_intervalo_no_ha_transcurrido(self, db):
-        ayer = (date.today() - timedelta(days=1)).isoformat()
+        ayer = (_hoy() - timedelta(days=1)).isoformat()
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.add(ConfigDB(key="resumen_ultima_vez", value=ayer))
         db.add(ConfigDB(key="resumen_intervalo_dias", value="7"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email:
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email:
             _run(db)
         mock_email.assert_not_called()
 
     def test_ejecuta_cuando_intervalo_ha_transcurrido(self, db):
-        hace_diez = (date.today() - timedelta(days=10)).isoformat()
+        hace_diez = (_hoy() - timedelta(days=10)).isoformat()
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.add(ConfigDB(key="resumen_ultima_vez", value=hace_diez))
         db.add(ConfigDB(key="resumen_intervalo_dias", value="7"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email, \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
              patch("backend.app.utils.resumen_semanal.groq_chat", return_value="Insight generado"):
             _run(db)
         mock_email.assert_called_once()
@@ -294,7 +303,7 @@ class TestRun:
     def test_ejecuta_en_primer_envio_sin_ultima_vez(self, db):
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email, \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
              patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
             _run(db)
         mock_email.assert_called_once()
@@ -302,15 +311,29 @@ class TestRun:
     def test_actualiza_ultima_vez_tras_envio(self, db):
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple"), \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email"), \
              patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
             _run(db)
-        assert _get(db, "resumen_ultima_vez") == date.today().isoformat()
+        assert _get(db, "resumen_ultima_vez") == _hoy().isoformat()
+
+    def test_usa_la_fecha_de_madrid_y_no_la_del_servidor(self, db):
+        # 23:30 UTC del 17 = 01:30 del 18 en Madrid: ya han pasado 7 días
+        ahora = datetime(2026, 10, 17, 23, 30, tzinfo=ZoneInfo("UTC"))
+        db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
+        db.add(ConfigDB(key="resumen_ultima_vez", value="2026-10-11"))
+        db.add(ConfigDB(key="resumen_intervalo_dias", value="7"))
+        db.commit()
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
+             patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
+            _run(db, ahora)
+        mock_email.assert_called_once()
+        assert _get(db, "resumen_ultima_vez") == "2026-10-18"
+        assert next_run_at(db, ahora) > ahora
 
     def test_maneja_error_de_groq_y_sigue_enviando(self, db):
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email, \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
              patch("backend.app.utils.resumen_semanal.groq_chat", side_effect=Exception("LLM caÃ­do")):
             _run(db)
         mock_email.assert_called_once()
@@ -319,7 +342,7 @@ class TestRun:
         db.add(ConfigDB(key="resumen_email_destino", value="a@b.com"))
         db.add(ConfigDB(key="resumen_ultima_vez", value="not-a-date"))
         db.commit()
-        with patch("backend.app.utils.resumen_semanal.send_email_simple") as mock_email, \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
              patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
             _run(db)
         mock_email.assert_called_once()
@@ -330,10 +353,10 @@ class TestRun:
         db.commit()
         captured_html = {}
 
-        def capture_email(to, subject, html):
+        def capture_email(db, to, subject, html):
             captured_html["html"] = html
 
-        with patch("backend.app.utils.resumen_semanal.send_email_simple", side_effect=capture_email), \
+        with patch("backend.app.utils.resumen_semanal.enqueue_email", side_effect=capture_email), \
              patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
             _run(db)
         assert "html" in captured_html
@@ -355,3 +378,148 @@ class TestJobResumenSemanal:
     def test_captura_excepcion_de_run_sin_propagarla(self):
         with patch("backend.app.utils.resumen_semanal._run", side_effect=Exception("boom")):
             job_resumen_semanal()  # No debe lanzar
+
+
+# ── Programación por eventos (next_run_at / reschedule / lease) ──────────────
+
+from apscheduler.schedulers.background import BackgroundScheduler  # noqa: E402
+
+from backend.app.utils import job_lease, resumen_semanal  # noqa: E402
+from backend.app.utils.resumen_semanal import next_run_at  # noqa: E402
+
+
+def _config(db, **values):
+    for key, value in values.items():
+        db.add(ConfigDB(key=key, value=value))
+    db.commit()
+
+
+@pytest.fixture()
+def scheduler(monkeypatch):
+    sched = BackgroundScheduler(timezone="Europe/Madrid")
+    sched.start(paused=True)
+    monkeypatch.setattr(resumen_semanal, "_scheduler", sched)
+    yield sched
+    sched.shutdown(wait=False)
+
+
+class TestNextRunAt:
+    AHORA = datetime(2026, 10, 17, 12, 0, tzinfo=TZ)
+
+    def test_sin_email_no_programa(self, db):
+        assert next_run_at(db, self.AHORA) is None
+
+    def test_primer_envio_hoy_si_no_ha_pasado_la_hora(self, db):
+        _config(db, resumen_email_destino="a@b.com", resumen_hora_envio="18:15")
+        assert next_run_at(db, self.AHORA) == datetime(2026, 10, 17, 18, 15, tzinfo=TZ)
+
+    def test_primer_envio_manana_si_ya_paso_la_hora(self, db):
+        _config(db, resumen_email_destino="a@b.com", resumen_hora_envio="09:00")
+        assert next_run_at(db, self.AHORA) == datetime(2026, 10, 18, 9, 0, tzinfo=TZ)
+
+    def test_ultima_vez_mas_intervalo(self, db):
+        _config(
+            db,
+            resumen_email_destino="a@b.com",
+            resumen_hora_envio="09:00",
+            resumen_intervalo_dias="3",
+            resumen_ultima_vez="2026-10-16",
+        )
+        assert next_run_at(db, self.AHORA) == datetime(2026, 10, 19, 9, 0, tzinfo=TZ)
+
+    def test_envio_atrasado_queda_en_el_pasado(self, db):
+        _config(
+            db,
+            resumen_email_destino="a@b.com",
+            resumen_intervalo_dias="7",
+            resumen_ultima_vez="2026-10-01",
+        )
+        assert next_run_at(db, self.AHORA) < self.AHORA
+
+    def test_respeta_fecha_inicio(self, db):
+        _config(
+            db,
+            resumen_email_destino="a@b.com",
+            resumen_hora_envio="09:00",
+            resumen_fecha_inicio="2026-11-02",
+        )
+        assert next_run_at(db, self.AHORA) == datetime(2026, 11, 2, 9, 0, tzinfo=TZ)
+
+    def test_hora_invalida_usa_la_de_por_defecto(self, db):
+        _config(db, resumen_email_destino="a@b.com", resumen_hora_envio="tarde")
+        assert next_run_at(db, self.AHORA).time().isoformat() == "08:30:00"
+
+
+class TestReschedule:
+    def test_sin_scheduler_no_hace_nada(self, db):
+        assert resumen_semanal.reschedule() is None
+
+    def test_programa_un_unico_disparo(self, db, scheduler):
+        _config(db, resumen_email_destino="a@b.com", resumen_ultima_vez=date.today().isoformat())
+        run_at = resumen_semanal.reschedule()
+        job = scheduler.get_job(resumen_semanal.JOB_ID)
+        assert job.trigger.run_date == run_at
+        assert run_at.date() == date.today() + timedelta(days=7)
+
+    def test_recupera_envio_atrasado_al_arrancar(self, db, scheduler):
+        _config(db, resumen_email_destino="a@b.com", resumen_ultima_vez="2020-01-01")
+        antes = datetime.now(tz=TZ)
+        resumen_semanal.schedule(scheduler)
+        run_at = scheduler.get_job(resumen_semanal.JOB_ID).trigger.run_date
+        assert antes <= run_at <= datetime.now(tz=TZ)
+        assert scheduler.get_job(f"{resumen_semanal.JOB_ID}_resync") is not None
+
+    def test_min_delay_retrasa_el_reintento(self, db, scheduler):
+        _config(db, resumen_email_destino="a@b.com", resumen_ultima_vez="2020-01-01")
+        run_at = resumen_semanal.reschedule(min_delay=300)
+        assert run_at >= datetime.now(tz=TZ) + timedelta(seconds=290)
+
+    def test_quitar_email_desprograma(self, db, scheduler):
+        _config(db, resumen_email_destino="a@b.com")
+        resumen_semanal.reschedule()
+        _set(db, "resumen_email_destino", "")
+        assert resumen_semanal.reschedule() is None
+        assert scheduler.get_job(resumen_semanal.JOB_ID) is None
+
+    def test_put_config_reprograma(self, client, scheduler):
+        client.put("/api/config/resumen_email_destino", json={"key": "resumen_email_destino", "value": "a@b.com"})
+        client.put("/api/config/resumen_hora_envio", json={"key": "resumen_hora_envio", "value": "23:59"})
+        run_at = scheduler.get_job(resumen_semanal.JOB_ID).trigger.run_date
+        assert (run_at.hour, run_at.minute) == (23, 59)
+
+
+class TestLease:
+    def test_segundo_propietario_no_obtiene_el_lease(self, db):
+        assert job_lease.acquire(db, "x", 60, owner="a")
+        assert not job_lease.acquire(db, "x", 60, owner="b")
+        # No es reentrante
+        assert not job_lease.acquire(db, "x", 60, owner="a")
+
+    def test_release_libera_el_lease(self, db):
+        assert job_lease.acquire(db, "x", 60, owner="a")
+        job_lease.release(db, "x", owner="a")
+        assert job_lease.acquire(db, "x", 60, owner="b")
+
+    def test_lease_caducado_se_puede_tomar(self, db):
+        assert job_lease.acquire(db, "x", -1, owner="a")
+        assert job_lease.acquire(db, "x", 60, owner="b")
+
+    def test_job_omite_el_envio_si_el_lease_esta_ocupado(self, db):
+        assert job_lease.acquire(db, resumen_semanal.LEASE_NAME, 60, owner="otro")
+        with patch("backend.app.utils.resumen_semanal._run") as mock_run:
+            job_resumen_semanal()
+        mock_run.assert_not_called()
+
+    def test_job_libera_el_lease_tras_enviar(self, db):
+        with patch("backend.app.utils.resumen_semanal._run") as mock_run:
+            job_resumen_semanal()
+        mock_run.assert_called_once()
+        assert job_lease.acquire(db, resumen_semanal.LEASE_NAME, 60, owner="otro")
+
+    def test_dos_workers_envian_una_sola_vez(self, db):
+        _config(db, resumen_email_destino="a@b.com")
+        with patch("backend.app.utils.resumen_semanal.enqueue_email") as mock_email, \
+             patch("backend.app.utils.resumen_semanal.groq_chat", return_value=""):
+            job_resumen_semanal()
+            job_resumen_semanal()
+        mock_email.assert_called_once()
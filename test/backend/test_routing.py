@@ -0,0 +1,86 @@
+"""
+test_routing.py — Tests del planificador de rutas (savings + 2-opt) y de la
+tabla local de códigos postales.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from backend.app.services import routing_service
+from backend.app.utils import codigos_postales
+
+MADRID = (40.4168, -3.7038)
+
+
+def _puntos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(MADRID[0] + rng.normal() * 0.4, MADRID[1] + rng.normal() * 0.4) for _ in range(n)]
+
+
+class TestPlanRoutes:
+    def test_respeta_capacidad_y_visita_todo(self):
+        stops = _puntos(120)
+        demand = [1 + i % 4 for i in range(120)]
+        plan = routing_service.plan_routes(MADRID, stops, demand, capacity=25)
+        visitados = sorted(k for route, _ in plan for k in route)
+        assert visitados == list(range(120))
+        assert all(sum(demand[k] for k in route) <= 25 for route, _ in plan)
+        # Con carga total 300 y capacidad 25 bastan pocos camiones más del mínimo
+        assert 12 <= len(plan) <= 15
+
+    def test_mejor_que_un_camion_por_parada(self):
+        stops = _puntos(60, seed=1)
+        plan = routing_service.plan_routes(MADRID, stops, [1] * 60, capacity=10)
+        dist = routing_service.distance_matrix(np.array([MADRID, *stops]))
+        ida_y_vuelta = 2 * dist[0, 1:].sum()
+        assert sum(km for _, km in plan) < 0.5 * ida_y_vuelta
+
+    def test_dos_zonas_separadas_no_se_mezclan(self):
+        norte = [(43.26 + i * 0.001, -2.93) for i in range(5)]  # Bilbao
+        sur = [(37.39 + i * 0.001, -5.98) for i in range(5)]  # Sevilla
+        plan = routing_service.plan_routes(MADRID, norte + sur, [1] * 10, capacity=5)
+        rutas = sorted(sorted(route) for route, _ in plan)
+        assert rutas == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]]
+
+    def test_parada_mas_pesada_que_el_camion_va_sola(self):
+        plan = routing_service.plan_routes(MADRID, _puntos(3), [50, 1, 1], capacity=10)
+        assert [0] in [route for route, _ in plan]
+
+    def test_paradas_en_el_almacen_comparten_camion(self):
+        plan = routing_service.plan_routes(MADRID, [MADRID] * 4, [1] * 4, capacity=10)
+        assert len(plan) == 1
+
+    def test_sin_paradas(self):
+        assert routing_service.plan_routes(MADRID, [], [], capacity=10) == []
+
+    def test_trescientas_paradas_en_menos_de_un_segundo(self):
+        stops = _puntos(300, seed=2)
+        inicio = time.perf_counter()
+        plan = routing_service.plan_routes(MADRID, stops, [2] * 300, capacity=30)
+        assert time.perf_counter() - inicio < 1.0
+        assert 20 <= len(plan) <= 22
+
+
+class TestTwoOpt:
+    def test_deshace_cruces(self):
+        # Cuadrado recorrido en zigzag: 2-opt lo convierte en el perímetro
+        coords = np.array([(0, 0), (0, 1), (1, 1), (1, 0), (0, 2), (1, 2)], dtype=float)
+        dist = routing_service.distance_matrix(coords)
+        cruzada = [1, 3, 2, 5, 4]
+        mejor = routing_service.two_opt(cruzada, dist)
+        assert sorted(mejor) == sorted(cruzada)
+        assert routing_service.route_length(mejor, dist) < routing_service.route_length(cruzada, dist)
+
+
+class TestCodigosPostales:
+    @pytest.mark.parametrize("cp, esperado", [("8001", "08001"), (" 28001 ", "28001"), ("ABC", None), ("", None), (None, None)])
+    def test_normaliza(self, cp, esperado):
+        assert codigos_postales.normalize(cp) == esperado
+
+    def test_codigo_exacto_y_provincia(self):
+        assert codigos_postales.locate("28001") != codigos_postales.locate("28999")
+        assert codigos_postales.locate("28999") == codigos_postales.table()["28"]
+
+    def test_desconocido(self):
+        assert codigos_postales.locate("99000") is None
@@ -325,3 +325,130 @@ class TestFianzaPagada:
         expected_max = total - (total * 0.07)
         if fianza > 0:
             assert ingresos[0]["amount"] < expected_max
+
+
+class TestFacturasZip:
+    def test_zip_con_una_factura_por_camion(self, client, cliente_fixture, producto):
+        import io
+        import zipfile
+
+        for camion in (1, 2, 2):
+            alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+            client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": camion})
+        r = client.get("/api/transporte/rutas/facturas.zip")
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/zip"
+        assert "attachment" in r.headers["content-disposition"]
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            assert zf.testzip() is None
+            assert sorted(zf.namelist()) == ["factura_camion_1.pdf", "factura_camion_2.pdf"]
+            assert zf.read("factura_camion_2.pdf").startswith(b"%PDF")
+
+    def test_zip_sin_albaranes_en_ruta_devuelve_404(self, client, cliente_fixture, producto):
+        crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+        assert client.get("/api/transporte/rutas/facturas.zip").status_code == 404
+
+    def test_zip_una_sola_consulta(self, client, cliente_fixture, producto):
+        from sqlalchemy import event
+        from test.backend.conftest import engine
+
+        for camion in (1, 2, 3):
+            alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+            client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": camion})
+        selects = []
+
+        def contar(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            r = client.get("/api/transporte/rutas/facturas.zip")
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+        assert r.status_code == 200
+        assert len(selects) == 1
+
+
+class TestOptimizarRutas:
+    def _cliente(self, client, dni, cp):
+        r = client.post("/api/clientes/post", json={
+            "name": "Cliente", "surnames": dni, "dni": dni, "postal_code": cp, "street": "Calle Mayor",
+        })
+        assert r.status_code == 200
+        return r.json()["id"]
+
+    def test_plan_con_capacidad(self, client, producto):
+        ids = []
+        for i, cp in enumerate(["28001", "28010", "28020", "08001", "08015"]):
+            cid = self._cliente(client, f"0000000{i}X", cp)
+            ids.append(crear_albaran_almacen(client, cid, producto["id"])["id"])  # 2 uds
+        r = client.post("/api/transporte/rutas/optimizar", json={"capacidad": 6})
+        assert r.status_code == 200
+        plan = r.json()
+        assert plan["origen"]["codigo_postal"] == "28001"
+        assert sorted(p["albaran_id"] for c in plan["camiones"] for p in c["paradas"]) == sorted(ids)
+        assert all(c["carga"] <= 6 for c in plan["camiones"])
+        # 10 unidades con capacidad 6: dos camiones
+        assert plan["n_camiones"] == 2
+        for c in plan["camiones"]:
+            assert [p["orden"] for p in c["paradas"]] == list(range(1, len(c["paradas"]) + 1))
+        assert plan["sin_ubicacion"] == []
+
+    def test_sin_codigo_postal_va_a_sin_ubicacion(self, client, cliente_fixture, producto):
+        alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+        r = client.post("/api/transporte/rutas/optimizar", json={})
+        assert r.status_code == 200
+        assert r.json()["sin_ubicacion"] == [alb["id"]]
+        assert r.json()["camiones"] == []
+
+    def test_no_guarda_nada(self, client, producto):
+        cid = self._cliente(client, "00000001X", "28010")
+        crear_albaran_almacen(client, cid, producto["id"])
+        client.post("/api/transporte/rutas/optimizar", json={})
+        assert client.get("/api/transporte/rutas").json()["camiones"] == []
+
+    def test_max_camiones_insuficiente_devuelve_400(self, client, producto):
+        for i, cp in enumerate(["28001", "08001"]):
+            cid = self._cliente(client, f"0000000{i}X", cp)
+            crear_albaran_almacen(client, cid, producto["id"])
+        r = client.post("/api/transporte/rutas/optimizar", json={"capacidad": 2, "max_camiones": 1})
+        assert r.status_code == 400
+
+    def test_albaran_inexistente_devuelve_404(self, client):
+        assert client.post("/api/transporte/rutas/optimizar", json={"albaran_ids": [999]}).status_code == 404
+
+    def test_origen_desconocido_devuelve_400(self, client):
+        assert client.post("/api/transporte/rutas/optimizar", json={"origen_cp": "99999"}).status_code == 400
+
+
+class TestMovimientosEnlazados:
+    def test_liquidar_enlaza_movimientos_al_camion(self, client, cliente_fixture, producto):
+        alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+        client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": 4})
+        client.post("/api/transporte/ruta/4/liquidar")
+        movs = [m for m in client.get("/api/movimientos/get").json() if m["truck_id"] == 4]
+        assert sorted(m["kind"] for m in movs) == ["INGRESO_RUTA", "TRANSPORTE"]
+
+    def test_liquidar_camion_1_no_toca_el_camion_10(self, client, cliente_fixture, producto):
+        # El filtro antiguo LIKE 'Transporte camion 1%' también borraba el camión 10
+        for camion in (1, 10):
+            alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+            client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": camion})
+        client.post("/api/transporte/ruta/10/liquidar")
+        client.post("/api/transporte/ruta/1/liquidar")
+        movs = client.get("/api/movimientos/get").json()
+        assert len([m for m in movs if m["truck_id"] == 10]) == 2
+        assert len([m for m in movs if m["truck_id"] == 1]) == 2
+
+    def test_quitar_borra_solo_movimientos_del_camion(self, client, cliente_fixture, producto):
+        albs = []
+        for camion in (1, 10):
+            alb = crear_albaran_almacen(client, cliente_fixture["id"], producto["id"])
+            albs.append(alb["id"])
+            client.post("/api/transporte/ruta/asignar", json={"albaran_ids": [alb["id"]], "camion_id": camion})
+            client.post(f"/api/transporte/ruta/{camion}/liquidar")
+        client.post("/api/transporte/ruta/quitar", json={"albaran_ids": [albs[0]]})
+        movs = client.get("/api/movimientos/get").json()
+        assert [m for m in movs if m["truck_id"] == 1] == []
+        assert len([m for m in movs if m["truck_id"] == 10]) == 2